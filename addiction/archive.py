@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import mmap
+import os
+import struct
+
+from .deal import decode_bytes
+from .replay import Magic, Move, New, Shuffle, Time, End, Sizes, play
+
+# An archive holds the games from any number of replay logs (see replay.py)
+# in a single file that can be read without parsing it first. It is meant to
+# be memory mapped, so the games are never loaded as Python objects unless
+# they are asked for.
+#
+# The file starts with a header, followed by the records of every game, one
+# game after another, exactly as they are in the replay logs. The index is
+# at the end. It has a fixed size entry for every game, so the entry for
+# game N is at a known offset and the game can be found without reading any
+# of the games before it. The entries are little endian:
+#
+#   offset   8 bytes  Offset of the records of the game from the start of
+#                     the file. They start with the New record and end with
+#                     the End record
+#   size     4 bytes  Size of the records in bytes
+#   moves    2 bytes  Number of moves in the game, including those that were
+#                     undone
+#   result   1 byte   Lost, Won or Abandoned as in replay.py
+#   padding  1 byte
+#
+# Games that were not finished when the log ended are left out.
+
+# magic, version, entry size, number of games, offset of the index
+_Header = struct.Struct('<4sHHQQ')
+_Magic = b'ASRA'
+_Version = 1
+
+# offset, size, moves, result
+_Entry = struct.Struct('<QIHBx')
+
+# The numpy dtype of an entry in the index
+IndexDtype = [('offset', '<u8'),
+              ('size', '<u4'),
+              ('moves', '<u2'),
+              ('result', 'u1'),
+              ('padding', 'u1')]
+
+
+# Walks over the records in a buffer. For each record, the tag, the offset of
+# the record and the size of the record including the tag are returned.
+# Moves have the tag Move. If partial is true, a record that was cut short at
+# the end of the buffer is ignored instead of being an error
+#
+# memoryview, bool => generator
+def _walk(view, partial = False):
+    pos = 0
+    end = len(view)
+    while pos < end:
+        tag = view[pos]
+        if tag < New:
+            yield (Move, pos, 1)
+            pos = pos + 1
+            continue
+
+        size = Sizes.get(tag)
+        if size is None:
+            raise RuntimeError('Bad record in replay log: {}'.format(tag))
+        if pos + 1 + size > end:
+            if partial:
+                return
+            raise RuntimeError('Replay log is truncated')
+        yield (tag, pos, 1 + size)
+        pos = pos + 1 + size
+
+
+class ArchiveWriter:
+    # The index is kept in memory until the archive is closed. Each entry
+    # takes 16 bytes, so this is only 16 MB for a million games
+    #
+    # str
+    def __init__(self, filename):
+        self.file = open(filename, 'wb')
+        self.index = bytearray()
+        self.count = 0
+        self.file.write(bytes(_Header.size))
+
+    # Adds a single game. The records must start with New and end with End
+    #
+    # bytes, int, int => None
+    def add(self, records, moves, result):
+        self.index.extend(_Entry.pack(self.file.tell(),
+                                      len(records),
+                                      min(moves, 0xffff),
+                                      result))
+        self.file.write(records)
+        self.count = self.count + 1
+
+    # Adds every finished game in a replay log. The log is memory mapped and
+    # the records are copied to the archive as they are. The log may have
+    # been cut short if the game that wrote it was killed, so the last
+    # record need not be complete
+    #
+    # str => int
+    def add_log(self, filename):
+        count = self.count
+        with open(filename, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as m:
+                with memoryview(m) as view:
+                    if view[:len(Magic)] != Magic:
+                        raise RuntimeError(
+                            'Not a replay log: {}'.format(filename))
+                    self.add_records(view[len(Magic):])
+        return self.count - count
+
+    # memoryview => None
+    def add_records(self, view):
+        start = None
+        moves = 0
+        for tag, pos, size in _walk(view, True):
+            if tag == New:
+                start = pos
+                moves = 0
+            elif tag == Move:
+                moves = moves + 1
+            elif tag == End and start is not None:
+                self.add(view[start:pos + size], moves, view[pos + 1])
+                start = None
+
+    # None => None
+    def close(self):
+        offset = self.file.tell()
+        self.file.write(self.index)
+        self.file.seek(0)
+        self.file.write(_Header.pack(_Magic,
+                                     _Version,
+                                     _Entry.size,
+                                     self.count,
+                                     offset))
+        self.file.close()
+
+
+# A read-only view of an archive. Nothing is read from the file until it is
+# asked for. The memoryviews that are returned point into the mapped file, so
+# they must be released before the archive is closed.
+class Archive:
+    # str
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(),
+                                 0,
+                                 access = mmap.ACCESS_READ)
+            magic, version, entry, self.count, self.offset = \
+                _Header.unpack_from(self.map)
+        except (ValueError, struct.error):
+            self.file.close()
+            raise RuntimeError('Not a replay archive: {}'.format(filename))
+        if magic != _Magic or version != _Version or entry != _Entry.size \
+           or self.offset + self.count * _Entry.size != len(self.map):
+            self.map.close()
+            self.file.close()
+            raise RuntimeError('Not a replay archive: {}'.format(filename))
+        self.view = memoryview(self.map)
+
+    # None => Archive
+    def __enter__(self):
+        return self
+
+    # * => None
+    def __exit__(self, *args):
+        self.close()
+
+    # None => int
+    def __len__(self):
+        return self.count
+
+    # The records of every game in the archive
+    #
+    # None => generator
+    def __iter__(self):
+        for n in range(0, self.count):
+            yield self.get_records(n)
+
+    # int => (int, int, int, int)
+    def get_entry(self, n):
+        if not 0 <= n < self.count:
+            raise RuntimeError('No game {} in archive'.format(n))
+        return _Entry.unpack_from(self.map, self.offset + n * _Entry.size)
+
+    # int => int
+    def get_result(self, n):
+        return self.get_entry(n)[3]
+
+    # The records of a game as they were in the replay log. This does not
+    # copy them
+    #
+    # int => memoryview
+    def get_records(self, n):
+        offset, size, _, _ = self.get_entry(n)
+        return self.view[offset:offset + size]
+
+    # The slots of the cards that were moved in a game, in order. The moves
+    # are read straight from the mapped file
+    #
+    # int => generator
+    def moves(self, n):
+        view = self.get_records(n)
+        for tag, pos, _ in _walk(view):
+            if tag == Move:
+                yield view[pos]
+
+    # The records of a game in the same form as replay.read()
+    #
+    # int => generator
+    def records(self, n):
+        view = self.get_records(n)
+        for tag, pos, size in _walk(view):
+            if tag == Move:
+                yield (tag, view[pos])
+            elif tag in [New, Shuffle]:
+                yield (tag, decode_bytes(view[pos + 1:pos + size]))
+            elif tag == Time:
+                yield (tag, int.from_bytes(view[pos + 1:pos + size], 'big'))
+            elif tag == End:
+                yield (tag, view[pos + 1])
+            else:
+                yield (tag, None)
+
+    # Plays a game again on the given game, which should have a headless UI
+    # such as GameNull. The recorded result is returned
+    #
+    # Game, int => int
+    def replay(self, game, n):
+        for _, result in play(game, self.records(n)):
+            return result
+
+    # The whole index as a numpy array with the fields in IndexDtype. The
+    # array is memory mapped as well. This needs numpy
+    #
+    # None => numpy.memmap
+    def get_index(self):
+        import numpy as np
+        return np.memmap(self.filename,
+                         dtype = np.dtype(IndexDtype),
+                         mode = 'r',
+                         offset = self.offset,
+                         shape = (self.count,))
+
+    # None => None
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+# Builds an archive from replay logs. The number of games in it is returned
+#
+# str, [str] => int
+def pack(filename, logs):
+    writer = ArchiveWriter(filename)
+    try:
+        for log in logs:
+            writer.add_log(log)
+    except BaseException:
+        writer.file.close()
+        os.remove(filename)
+        raise
+    writer.close()
+    return writer.count
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from .board import Cards, Cols, Rows, Slots
+
+# Plays many games in lockstep. The boards are kept in a (K, 4, 13) array of
+# card ids using the same numbering as BoardState, with -1 for a gap. Every
+# step makes at most one move on every board. The rules are the same as the
+# ones in BoardState and Game.
+#
+# A move is picked from up to eight candidates on each board. The first four
+# are the successors of the cards to the left of the four gaps and the last
+# four are the Twos, which can be moved if there is a gap in the first
+# column. Candidates that cannot be moved have a source of -1.
+
+Gap = -1
+
+Twos = np.array([1, 14, 27, 40])
+Aces = np.array([0, 13, 26, 39], dtype = np.int8)
+
+# The slot that a Two in a given row goes to for every combination of gaps
+# in the first column. The gaps are a bitmask with bit i set if row i has a
+# gap in the first column.
+TwoDest = np.zeros((1 << Rows, Rows), dtype = np.intp)
+for _mask in range(0, 1 << Rows):
+    for _row in range(0, Rows):
+        for _i in range(1, Rows + 1):
+            if _mask & (1 << ((_row + _i) % Rows)):
+                TwoDest[_mask, _row] = ((_row + _i) % Rows) * Cols
+                break
+del _mask, _row, _i
+
+
+class BatchBoard:
+    # int, int
+    def __init__(self, count, seed = None):
+        self.rng = np.random.default_rng(seed)
+        deck = np.arange(Cards, dtype = np.int8).reshape(Rows, Cols)
+        self.boards = np.tile(deck, (count, 1, 1))
+        self.boards[self.boards % 13 == 0] = Gap
+        # The slot of every card and the slots of the four gaps on every
+        # board. These are kept up to date by move() and shuffle()
+        self.index = np.zeros((count, Cards), dtype = np.intp)
+        self.gaps = np.zeros((count, 4), dtype = np.intp)
+        self.shuffle(np.ones(count, dtype = bool))
+
+    # None => int
+    def __len__(self):
+        return self.boards.shape[0]
+
+    # None => np.ndarray
+    @property
+    def flat(self):
+        return self.boards.reshape(len(self), Slots)
+
+    # The length of the correct sequence in every row
+    #
+    # None => np.ndarray (K, 4)
+    def correct_lengths(self):
+        first = self.boards[:, :, 0]
+        expected = (first - first % 13)[:, :, None] \
+            + np.arange(1, Cols + 1, dtype = np.int8)
+        match = self.boards == expected
+        match[:, :, Cols - 1] = False
+        return np.argmin(match, axis = 2)
+
+    # None => np.ndarray (K, 4, 13)
+    def correct_mask(self):
+        return np.arange(Cols) < self.correct_lengths()[:, :, None]
+
+    # None => np.ndarray (K,)
+    def won(self):
+        return self.correct_lengths().sum(axis = 1) == Cards - 4
+
+    # Recomputes the slots of the cards and the gaps on the given boards. The
+    # Aces are not on the board so their entries in the index are meaningless
+    #
+    # np.ndarray => None
+    def reindex(self, rows):
+        flat = self.flat[rows]
+        cards = np.where(flat == Gap, Cards, flat).astype(np.intp)
+        index = np.zeros((len(rows), Cards + 1), dtype = np.intp)
+        np.put_along_axis(index, cards,
+                          np.broadcast_to(np.arange(Slots), flat.shape),
+                          axis = 1)
+        self.index[rows] = index[:, :Cards]
+        self.gaps[rows] = np.nonzero(flat == Gap)[1].reshape(len(rows), 4)
+
+    # The source and destination slots of every candidate move
+    #
+    # None => (np.ndarray (K, 8), np.ndarray (K, 8))
+    def candidates(self):
+        count = len(self)
+        flat = self.flat
+        index = self.index
+        gaps = self.gaps
+        rows = np.arange(count)[:, None]
+
+        # Successors of the cards to the left of the gaps
+        left = flat[rows, np.maximum(gaps - 1, 0)].astype(np.intp)
+        ok = (gaps % Cols != 0) & (left != Gap) & (left % 13 != 12)
+        succ = np.take_along_axis(index, np.where(ok, left + 1, 0), axis = 1)
+        succ_src = np.where(ok, succ, -1)
+        succ_dst = gaps
+
+        # Twos go to the first empty slot of the first column starting with
+        # the row below their own
+        empty = (flat[:, ::Cols] == Gap) @ (1 << np.arange(Rows))
+        two_src = index[:, Twos]
+        two_dst = TwoDest[empty[:, None], two_src // Cols]
+        two_src = np.where(empty[:, None] != 0, two_src, -1)
+
+        return (np.concatenate([succ_src, two_src], axis = 1),
+                np.concatenate([succ_dst, two_dst], axis = 1))
+
+    # Moves the card at src to dst on every board where src is not -1
+    #
+    # np.ndarray (K,), np.ndarray (K,) => None
+    def move(self, src, dst):
+        flat = self.flat
+        rows = np.nonzero(src >= 0)[0]
+        src = src[rows]
+        dst = dst[rows]
+        cards = flat[rows, src]
+        flat[rows, dst] = cards
+        flat[rows, src] = Gap
+        self.index[rows, cards] = dst
+        gap = np.argmax(self.gaps[rows] == dst[:, None], axis = 1)
+        self.gaps[rows, gap] = src
+
+    # Shuffles the boards where mask is set. Cards in correct sequences stay
+    # where they are. The Aces are put back in the gaps before the shuffle
+    # and taken out again afterwards, just like Game.shuffle.
+    #
+    # np.ndarray (K,) => None
+    def shuffle(self, mask):
+        rows = np.nonzero(mask)[0]
+        if not len(rows):
+            return
+        flat = self.flat[rows]
+        fixed = self.correct_mask()[rows].reshape(len(rows), Slots)
+
+        gaps = np.nonzero(flat == Gap)
+        flat[gaps] = np.tile(Aces, len(rows))
+
+        # Sorting random keys gives a random order of the slots that are not
+        # fixed followed by the fixed slots in order. Sorting the slot numbers
+        # gives the slots that are not fixed in order followed by the fixed
+        # slots in order. Taking cards from the first and putting them in the
+        # second permutes the free slots and leaves the fixed slots alone.
+        keys = np.where(fixed, 2.0, self.rng.random(flat.shape))
+        src = np.argsort(keys, axis = 1, kind = 'stable')
+        dst = np.argsort(fixed, axis = 1, kind = 'stable')
+        shuffled = np.empty_like(flat)
+        np.put_along_axis(shuffled, dst,
+                          np.take_along_axis(flat, src, axis = 1),
+                          axis = 1)
+        shuffled[shuffled % 13 == 0] = Gap
+        self.flat[rows] = shuffled
+        self.reindex(rows)
+
+    # Picks a random candidate on every board, -1 if there is none.
+    #
+    # np.ndarray (K, 8), np.ndarray (K, 8), np.ndarray (K, 4)
+    #   => np.ndarray (K,)
+    def choose_random(self, src, dst, lengths = None):
+        keys = self.rng.integers(0, 1 << 15, size = src.shape,
+                                 dtype = np.int16)
+        keys[src < 0] = -1
+        choice = np.argmax(keys, axis = 1)
+        return np.where(keys.max(axis = 1) >= 0, choice, -1)
+
+    # Prefers candidates that extend a correct sequence, then candidates that
+    # put a card in the column it belongs in. Candidates that break up a
+    # correct sequence are avoided. This is the same as GreedyPolicy. Ties
+    # are broken at random.
+    #
+    # np.ndarray (K, 8), np.ndarray (K, 8), np.ndarray (K, 4)
+    #   => np.ndarray (K,)
+    def choose_greedy(self, src, dst, lengths = None):
+        if lengths is None:
+            lengths = self.correct_lengths()
+        rows = np.arange(len(self))[:, None]
+        valid = src >= 0
+        src = np.maximum(src, 0)
+        cards = self.flat[rows, src]
+        col = dst % Cols
+        score = (col == cards % 13 - 1).astype(np.int8)
+        score[col == lengths[rows, dst // Cols]] = 2
+        score[src % Cols < lengths[rows, src // Cols]] = -1
+        keys = (score + 1) * 8 + self.rng.integers(0, 8, size = src.shape,
+                                                   dtype = np.int8)
+        keys[~valid] = -1
+        choice = np.argmax(keys, axis = 1)
+        return np.where(keys.max(axis = 1) >= 0, choice, -1)
+
+    # np.ndarray => BatchBoard
+    def take(self, rows):
+        other = BatchBoard.__new__(BatchBoard)
+        other.rng = self.rng
+        other.boards = self.boards[rows]
+        other.index = self.index[rows]
+        other.gaps = self.gaps[rows]
+        return other
+
+    # Plays every board until it is won, it is lost or max_moves steps have
+    # been made. A negative number of shuffles means that they are unlimited.
+    # Returns whether each board was won and the number of moves and shuffles
+    # that were used on it. Boards that are finished are dropped from the
+    # working set so that the few long games at the end are cheap to step.
+    #
+    # str, int, int => (np.ndarray, np.ndarray, np.ndarray)
+    def play(self, policy = 'greedy', shuffles = 3, max_moves = 1000):
+        count = len(self)
+        moves = np.zeros(count, dtype = np.int32)
+        used = np.zeros(count, dtype = np.int32)
+        won = np.zeros(count, dtype = bool)
+        active = np.arange(count)
+        work = self.take(active)
+        choose = getattr(work, 'choose_' + policy)
+        for _ in range(0, max_moves):
+            if not len(active):
+                break
+
+            lengths = work.correct_lengths()
+            win = lengths.sum(axis = 1) == Cards - 4
+            src, dst = work.candidates()
+            choice = np.where(win, -1, choose(src, dst, lengths))
+            stuck = ~win & (choice < 0)
+            lost = np.zeros_like(stuck)
+            if shuffles >= 0:
+                lost = stuck & (used[active] >= shuffles)
+                stuck &= ~lost
+            work.shuffle(stuck)
+            used[active] += stuck
+
+            rows = np.arange(len(work))
+            picked = np.maximum(choice, 0)
+            work.move(np.where(choice >= 0, src[rows, picked], -1),
+                      dst[rows, picked])
+            moves[active] += choice >= 0
+            won[active] |= win
+
+            over = win | lost
+            if over.any():
+                self.boards[active[over]] = work.boards[over]
+                active = active[~over]
+                work = work.take(~over)
+                choose = getattr(work, 'choose_' + policy)
+        self.boards[active] = work.boards
+        return (won, moves, used)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from .types import Face, Suit
+
+# The board is kept as small integers so that it can be queried and copied
+# cheaply. A slot is a position on the board, row * 13 + col. A card is
+# (suit - 1) * 13 + (face - 1), so the Aces are the multiples of 13 and the
+# Twos immediately follow them. Empty marks both a slot with no card and a
+# card that is not on the board (the Aces).
+Rows = 4
+Cols = 13
+Slots = Rows * Cols
+Cards = 52
+Empty = 0xff
+
+
+# int, int => int
+def slot_id(row, col):
+    return row * Cols + col
+
+# int => int
+def slot_row(slot):
+    return slot // Cols
+
+# int => int
+def slot_col(slot):
+    return slot % Cols
+
+# Suit, Face => int
+def card_id(suit, face):
+    return (int(suit) - 1) * 13 + (int(face) - 1)
+
+# int => Suit
+def card_suit(card):
+    return Suit(card // 13 + 1)
+
+# int => Face
+def card_face(card):
+    return Face(card % 13 + 1)
+
+
+class BoardState:
+    # None
+    def __init__(self):
+        # Slot => card
+        self.layout = bytearray([Empty] * Slots)
+        # Card => slot
+        self.index = bytearray([Empty] * Cards)
+        # Empty slots. This is a dict used as an ordered set so that slots
+        # can be added and removed in constant time and are iterated in the
+        # order in which they became empty
+        self.gaps = dict.fromkeys(range(0, Slots))
+        # Number of empty slots in the first column
+        self.first_gaps = Rows
+
+    # None => BoardState
+    def copy(self):
+        other = BoardState.__new__(BoardState)
+        other.layout = bytearray(self.layout)
+        other.index = bytearray(self.index)
+        other.gaps = dict(self.gaps)
+        other.first_gaps = self.first_gaps
+        return other
+
+    # None => bytes
+    def key(self):
+        return bytes(self.layout)
+
+    # int => int
+    def card(self, slot):
+        return self.layout[slot]
+
+    # int => int
+    def slot(self, card):
+        return self.index[card]
+
+    # int => bool
+    def is_empty(self, slot):
+        return self.layout[slot] == Empty
+
+    # None => [int]
+    def gap_slots(self):
+        return list(self.gaps)
+
+    # The gaps that a Two can be moved into
+    #
+    # None => [int]
+    def first_column_gaps(self):
+        if not self.first_gaps:
+            return []
+        return [slot for slot in self.gaps if slot % Cols == 0]
+
+    # The gaps that are not in the first column and have a card to their
+    # left. The successor of that card can be moved into them
+    #
+    # None => [int]
+    def open_gaps(self):
+        layout = self.layout
+        return [slot for slot in self.gaps
+                if slot % Cols and layout[slot - 1] != Empty]
+
+    # None => None
+    def clear(self):
+        self.layout[:] = bytes([Empty] * Slots)
+        self.index[:] = bytes([Empty] * Cards)
+        self.gaps = dict.fromkeys(range(0, Slots))
+        self.first_gaps = Rows
+
+    # bytes => None
+    def load(self, layout):
+        self.layout[:] = layout
+        self.index[:] = bytes([Empty] * Cards)
+        self.gaps = dict()
+        for slot, card in enumerate(self.layout):
+            if card == Empty:
+                self.gaps[slot] = None
+            else:
+                self.index[card] = slot
+        self.first_gaps = sum(1 for slot in self.gaps if slot % Cols == 0)
+
+    # int, int => None
+    def place(self, slot, card):
+        old = self.layout[slot]
+        if old != Empty:
+            self.index[old] = Empty
+        else:
+            del self.gaps[slot]
+            if slot % Cols == 0:
+                self.first_gaps = self.first_gaps - 1
+        self.layout[slot] = card
+        self.index[card] = slot
+
+    # int => int
+    def remove(self, slot):
+        card = self.layout[slot]
+        if card != Empty:
+            self.layout[slot] = Empty
+            self.index[card] = Empty
+            self.gaps[slot] = None
+            if slot % Cols == 0:
+                self.first_gaps = self.first_gaps + 1
+        return card
+
+    # int, int => None
+    def move(self, src, dst):
+        self.place(dst, self.remove(src))
+
+    # Puts the given cards back in the given slots. All the slots are
+    # emptied first because the cards may be elsewhere among them.
+    #
+    # [(int, int)] => None
+    def restore(self, cells):
+        for slot, card in cells:
+            self.remove(slot)
+        for slot, card in cells:
+            if card != Empty:
+                self.place(slot, card)
+
+    # Where a movable card goes. A Two goes to the first empty slot in the
+    # first column, starting with the row below its own. Every other card
+    # goes to the right of its predecessor.
+    #
+    # int => int
+    def dest(self, src):
+        card = self.layout[src]
+        if card % 13 == 1:
+            row = slot_row(src)
+            for i in range(1, Rows + 1):
+                dst = ((row + i) % Rows) * Cols
+                if self.layout[dst] == Empty:
+                    return dst
+            # This will only be called if the card is movable
+            return Empty
+        return self.index[card - 1] + 1
+
+    # Number of cards at the start of the row that are in sequence starting
+    # with a Two
+    #
+    # int => int
+    def correct_length(self, row):
+        base = row * Cols
+        layout = self.layout
+        first = layout[base]
+        if first == Empty or first % 13 != 1:
+            return 0
+        for col in range(1, Cols - 1):
+            if layout[base + col] != first + col:
+                return col
+        return Cols - 1
+
+    # None => [int]
+    def correct_slots(self):
+        correct = []
+        for row in range(0, Rows):
+            base = row * Cols
+            correct.extend(range(base, base + self.correct_length(row)))
+        return correct
+
+    # None => int
+    def correct_count(self):
+        return sum(self.correct_length(row) for row in range(0, Rows))
+
+    # The Twos come first if they can be moved, followed by the cards that
+    # can be moved into the other gaps
+    #
+    # None => [int]
+    def movable_slots(self):
+        index = self.index
+        if self.first_gaps:
+            movable = [index[1], index[14], index[27], index[40]]
+        else:
+            movable = []
+
+        # This is open_gaps() written out. Building the list of gaps first
+        # makes this nearly twice as slow, and it is called for every
+        # position that the solver and the hint engine look at
+        layout = self.layout
+        for slot in self.gaps:
+            if slot % Cols:
+                left = layout[slot - 1]
+                if left != Empty and left % 13 != 12:
+                    movable.append(index[left + 1])
+
+        return movable
+
+    # Shuffles every card that is not part of a correct sequence into the
+    # slots that are not part of one. The Aces are then taken off the board
+    # leaving four gaps.
+    #
+    # random.Random => None
+    def shuffle(self, rng):
+        fixed = set(self.correct_slots())
+        cards = [card for card in range(0, Cards)
+                 if self.index[card] not in fixed]
+        slots = [slot for slot in range(0, Slots) if slot not in fixed]
+        rng.shuffle(cards)
+        rng.shuffle(slots)
+
+        for slot in slots:
+            self.remove(slot)
+        for card, slot in zip(cards, slots):
+            if card % 13:
+                self.place(slot, card)
+        # Every slot was a gap for a moment, and a dict does not shrink when
+        # keys are deleted, so the four gaps left would keep the table sized
+        # for 52
+        self.gaps = dict.fromkeys(self.gaps)
+
+    # None => bool
+    def is_won(self):
+        return self.correct_count() == Cards - 4
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from math import factorial
+
+from .board import Cards, Empty, Slots
+
+# A deal is encoded as the rank of a permutation of the 52 cards in the
+# order of the slots. The gaps are filled with the Aces in order of suit, so
+# every layout has exactly one encoding. The rank is computed from the Lehmer
+# code of the permutation and is less than 52!, so it fits in 29 bytes. As a
+# string it is written in base 62 using 38 characters.
+
+Alphabet = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+Length = 38
+Bytes = 29
+
+_Digits = { c: i for i, c in enumerate(Alphabet) }
+_Limit = factorial(Cards)
+_Aces = (0, 13, 26, 39)
+
+
+# bytes => int
+def rank(layout):
+    if len(layout) != Slots:
+        raise RuntimeError('Layout must have {} slots'.format(Slots))
+    perm = list(layout)
+    aces = iter(_Aces)
+    for slot, card in enumerate(perm):
+        if card == Empty:
+            perm[slot] = next(aces, Empty)
+    if sorted(perm) != list(range(0, Cards)):
+        raise RuntimeError('Layout is not a deal: {}'.format(list(layout)))
+
+    code = 0
+    remaining = list(range(0, Cards))
+    for card in perm:
+        i = remaining.index(card)
+        code = code * len(remaining) + i
+        del remaining[i]
+    return code
+
+
+# int => bytearray
+def unrank(code):
+    if not 0 <= code < _Limit:
+        raise RuntimeError('Deal is out of range: {}'.format(code))
+    digits = []
+    for n in range(1, Cards + 1):
+        digits.append(code % n)
+        code = code // n
+
+    remaining = list(range(0, Cards))
+    layout = bytearray(Slots)
+    for slot, i in enumerate(reversed(digits)):
+        card = remaining.pop(i)
+        layout[slot] = card if card % 13 else Empty
+    return layout
+
+
+# bytes => str
+def encode(layout):
+    code = rank(layout)
+    chars = []
+    for _ in range(0, Length):
+        code, digit = divmod(code, len(Alphabet))
+        chars.append(Alphabet[digit])
+    return ''.join(reversed(chars))
+
+
+# str => bytearray
+def decode(deal):
+    if len(deal) != Length:
+        raise RuntimeError('Deal must be {} characters: {}'.format(Length,
+                                                                  deal))
+    code = 0
+    for c in deal:
+        if c not in _Digits:
+            raise RuntimeError('Invalid character in deal: {}'.format(deal))
+        code = code * len(Alphabet) + _Digits[c]
+    return unrank(code)
+
+
+# bytes => bytes
+def encode_bytes(layout):
+    return rank(layout).to_bytes(Bytes, 'big')
+
+
+# bytes => bytearray
+def decode_bytes(deal):
+    if len(deal) != Bytes:
+        raise RuntimeError('Deal must be {} bytes'.format(Bytes))
+    return unrank(int.from_bytes(deal, 'big'))
@@ -17,292 +17,393 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import gi
-gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, Gdk, GLib
-
+import os
 import random
 import sys
-from abc import ABC as AbstractBase, abstractmethod
-from copy import deepcopy
-from threading import Lock, Timer
-from time import sleep
-
-from .types import Card, Face, Suit, Direction, Point, CellFlags
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+
+from .board import BoardState, Empty, Slots
+from .board import card_id, slot_id, slot_row
+from .deal import decode, encode
+from .hint import HintEngine
+from .types import Card, Direction, Point, CellFlags
 from .settings import Settings
 
 
-class UndoAction(AbstractBase):
-    # Game
-    def __init__(self, game):
-        self.game = game
-
-    # None => None
-    @abstractmethod
-    def execute(self):
-        pass
-
-
-class MoveAction(UndoAction):
-    # Game, Point, Point
-    def __init__(self, game, src, dst):
-        super().__init__(game)
-        self.src = src
-        self.dst = dst
-
-    # None => None
-    def execute(self):
-        self.game.move(self.dst, self.src, True)
-
+# The undo history is kept as a stream of bytes and read back from the end.
+# A move is recorded as (src, dst, Move). A shuffle is recorded as the slots
+# that it changed with the cards that were in them before, followed by the
+# slot that was selected, the number of slots and Shuffle. Undoing a shuffle
+# only touches the slots that it changed.
+class UndoJournal:
+    Move = 0
+    Shuffle = 1
 
-class ShuffleAction(UndoAction):
-    # Game
-    def __init__(self, game):
-        super().__init__(game)
-        self.selected = deepcopy(game.selected)
-        self.cards = deepcopy(game.cards)
+    # None
+    def __init__(self):
+        self.data = bytearray()
+        self.count = 0
 
-    # None => None
-    def execute(self):
-        self.game.clear_board()
-        for card, addr in self.cards.items():
-            if addr:
-                self.game.set_card(addr, card)
-        self.game.shuffles_decr()
-        self.game.refresh(self.selected)
-
-
-class Cell:
-    # Game, Point
-    def __init__(self, game, addr):
-        self.game = game
-        self.addr = addr
-        self._card = None
-        self._flags = CellFlags.Normal
+    # None => int
+    def __len__(self):
+        return self.count
 
     # None => None
     def clear(self):
-        card = self.card
-        self._card = None
-        self.clear_flags()
-        if card:
-            self.game.ui.report_cell_card_changed(self.addr, None)
-
-    # None => None
-    def clear_flags(self):
-        self._flags = CellFlags.Normal
-        self.game.ui.report_cell_flags_changed(self.addr, self.flags)
-
-    # None => Card
-    @property
-    def card(self):
-        return self._card
-
-    # None => bool
-    @property
-    def movable(self):
-        return bool(self._flags & CellFlags.Movable)
-
-    # None => bool
-    @property
-    def correct(self):
-        return bool(self._flags & CellFlags.Correct)
-
-    # None => bool
-    @property
-    def selected(self):
-        return bool(self._flags & CellFlags.Selected)
-
-    # None => CellFlags
-    @property
-    def flags(self):
-        return self._flags
-
-    # Card => None
-    def set_card(self, val):
-        if (not self.card) or (self.card != val):
-            self._card = val
-            self.game.ui.report_cell_card_changed(self.addr, self.card)
-
-    # None => None
-    def set_selected(self):
-        if not self.selected:
-            self._flags = self._flags | CellFlags.Selected
-            self.game.ui.report_cell_flags_changed(self.addr, self.flags)
-            
-    # None => None
-    def set_movable(self):
-        if not self.movable:
-            self._flags = self._flags | CellFlags.Movable
-            self.game.ui.report_cell_flags_changed(self.addr, self.flags)
+        self.data.clear()
+        self.count = 0
+
+    # int, int => None
+    def push_move(self, src, dst):
+        self.data.extend((src, dst, UndoJournal.Move))
+        self.count = self.count + 1
+
+    # bytes, bytes, int => None
+    def push_shuffle(self, before, after, selected):
+        changed = 0
+        for slot in range(0, Slots):
+            if before[slot] != after[slot]:
+                self.data.append(slot)
+                self.data.append(before[slot])
+                changed = changed + 1
+        self.data.extend((selected, changed, UndoJournal.Shuffle))
+        self.count = self.count + 1
+
+    # Returns (Move, src, dst) or (Shuffle, [(slot, card)], selected)
+    #
+    # None => tuple
+    def pop(self):
+        data = self.data
+        self.count = self.count - 1
+        if data[-1] == UndoJournal.Move:
+            src, dst = data[-3], data[-2]
+            del data[-3:]
+            return (UndoJournal.Move, src, dst)
+
+        selected, changed = data[-3], data[-2]
+        start = len(data) - 3 - 2 * changed
+        cells = [(data[i], data[i + 1]) for i in range(start, len(data) - 3, 2)]
+        del data[start:]
+        return (UndoJournal.Shuffle, cells, selected)
+
+
+# The order in which the cells are searched for a movable card when the
+# selection moves. Each search is turned into a table of the position of
+# every cell in the order, for every cell that the search can start from, so
+# that the nearest movable card is the one with the lowest position.
+
+# When the board changes, the selection moves to the nearest movable card to
+# the right on the same row, then on the rows below, then to the left on the
+# same row. On the rows below, the nearest card to the left of the column is
+# preferred.
+#
+# int, int => [int]
+def _search_refresh(row, col):
+    order = [slot_id(row, c) for c in range(col, 13)]
+    for r in [(row + i) % 4 for i in range(1, 4)]:
+        order.extend(slot_id(r, c) for c in range(col, -1, -1))
+        order.extend(slot_id(r, c) for c in range(col + 1, 13))
+    order.extend(slot_id(row, c) for c in range(col - 1, -1, -1))
+    return order
+
+# Up and down move to the nearest card on the closest row above or below,
+# preferring the card to the left when two are equally near
+#
+# int, int, int => [int]
+def _search_vertical(row, col, step):
+    cols = sorted(range(0, 13), key = lambda c: (abs(c - col), c > col))
+    order = []
+    for i in range(1, 4):
+        r = (row + step * i) % 4
+        order.extend(slot_id(r, c) for c in cols)
+    return order
+
+# Left and right move along the row and then wrap around to the other rows
+#
+# int, int => [int]
+def _search_left(row, col):
+    order = [slot_id(row, c) for c in range(col - 1, -1, -1)]
+    for r in [(row - i) % 4 for i in range(1, 4)]:
+        order.extend(slot_id(r, c) for c in range(12, -1, -1))
+    order.extend(slot_id(row, c) for c in range(12, col + 1, -1))
+    return order
+
+# int, int => [int]
+def _search_right(row, col):
+    order = [slot_id(row, c) for c in range(col + 1, 13)]
+    for r in [(row + i) % 4 for i in range(1, 4)]:
+        order.extend(slot_id(r, c) for c in range(0, 13))
+    order.extend(slot_id(row, c) for c in range(0, col))
+    return order
+
+# (int, int => [int]) => [{int: int}]
+def _search_table(search):
+    return [{ slot: i for i, slot in enumerate(search(addr.row, addr.col)) }
+            for addr in Point.grid]
+
+_Search = { None: _search_table(_search_refresh),
+            Direction.Up: _search_table(
+                lambda row, col: _search_vertical(row, col, -1)),
+            Direction.Down: _search_table(
+                lambda row, col: _search_vertical(row, col, 1)),
+            Direction.Left: _search_table(_search_left),
+            Direction.Right: _search_table(_search_right) }
+
+
+# [int] => str
+def _format_slots(slots):
+    return ' '.join(str(Point.grid[slot]) for slot in slots)
 
-    # None => None
-    def set_correct(self):
-        if not self.correct:
-            self._flags = self._flags | CellFlags.Correct
-            self.game.ui.report_cell_flags_changed(self.addr, self.flags)
 
-    # None => None
-    def reset_selected(self):
-        if self.selected:
-            self._flags = self._flags & ~CellFlags.Selected
-            self.game.ui.report_cell_flags_changed(self.addr, self.flags)
-            
 class Game:
-    # class, bool
-    def __init__(self, GameUI, debug, **kwargs):
+    # The seed is used for the random number generator that deals and
+    # shuffles the cards. If a deal is given, the first game starts with it
+    # instead of a random deal. If settings are given, the game uses them
+    # instead of its own, which are read from the settings file.
+    #
+    # class, bool, int, str, Settings
+    def __init__(self, GameUI, debug, seed = None, deal = None,
+                 settings = None, **kwargs):
         self.debug = debug
 
-        self.points = []
-        for i in range(0, 4):
-            self.points.append([])
-            for j in range(0, 13):
-                self.points[i].append(Point(self.points, i, j))
-
-        self.all_points = set()
-        for i in range(0, 4):
-            for j in range(0, 13):
-                self.all_points.add(self.points[i][j])
-
-        self.board = []
-        for i in range(0, 4):
-            self.board.append([])
-            for j in range(0, 13):
-                self.board[i].append(Cell(self, self.points[i][j]))
-
-        self.cards = dict()
-        for suit in Suit:
-            for face in Face:
-                self.cards[Card(suit, face)] = None
+        # The Card objects handed out to the UI, indexed by card id
+        self.deck = Card.deck
+
+        self.state = BoardState()
+        self.flags = bytearray(Slots)
+        # Length of the correct sequence in each row
+        self.correct = [0] * 4
+        # Slots with a movable card
+        self.movable = []
+        # Slots whose card or flags have changed in the current batch, and
+        # the cards and flags before the batch started. This is None when
+        # the changes are not being batched
+        self.batched = None
+        self.before = None
+
+        # Each game has its own generator so that deals can be reproduced
+        # and games in the same process do not interfere with each other
+        self.rng = random.Random(seed)
+        self.next_deal = deal
+        self.deal = None
 
         self.lock = Lock()
-        self.timer = None
+        self.started = False
+        # The game clock. elapsed is the time played before the clock was
+        # last started or resumed at clock. clock is None while the clock is
+        # stopped or paused
+        self.clock = None
+        self.elapsed = 0.0
         self.selected = None
         self.shuffles = 0
         self.moves = 0
-        self.undo = []
-        self.empty = []
-
-        self.settings = Settings(self, **kwargs)
+        self.undo = UndoJournal()
+
+        # Set by instrument()
+        self.profiler = None
+        # The ReplayWriter that the games are recorded with, if any
+        self.recorder = None
+        # The StatsStore that finished games are added to, if any
+        self.stats = None
+        # The DealPool that deals of a given difficulty are drawn from, if any
+        self.pool = None
+        # The file that the game is saved to when quitting, if any. See
+        # snapshot.py
+        self.autosave = None
+        self.hints = HintEngine()
+
+        self.settings = settings or Settings(self, **kwargs)
         self.ui = GameUI(self)
 
+    # Arguments that are functions are only called when the message is
+    # printed, so messages that are expensive to build cost nothing when
+    # debugging is off
+    #
     # * => None
     def dbg(self, *args):
         if self.debug:
-            print(*args, file = sys.stderr)
+            print(*[arg() if callable(arg) else arg for arg in args],
+                  file = sys.stderr)
+
+    # Starts counting the calls to the main operations of the game and the
+    # time spent in them. See Profiler for the modes
+    #
+    # str => Profiler
+    def instrument(self, mode = 'counters'):
+        from .instrument import Profiler
+        self.profiler = Profiler(mode)
+        self.profiler.attach(self)
+        return self.profiler
 
     # None => None
     def main(self):
         self.ui.main()
 
+    # Changes to the cells inside a batch are reported to the UI once, when
+    # the outermost batch ends, and only for the cells that ended up with a
+    # different card or different flags. Batches can be nested.
+    #
+    # None => None
+    @contextmanager
+    def batch(self):
+        if self.batched is not None:
+            yield
+            return
+
+        self.batched = set()
+        self.before = bytes(self.state.layout) + bytes(self.flags)
+        try:
+            yield
+        finally:
+            self.flush()
+            self.batched = None
+            self.before = None
+
+    # Reports the cells that have changed so far in the current batch. This
+    # is used before anything that might wait for the user so that the board
+    # is up to date.
+    #
+    # None => None
+    def flush(self):
+        if not self.batched:
+            return
+
+        layout = self.state.layout
+        cells = dict()
+        for slot in sorted(self.batched):
+            card = layout[slot]
+            if card != self.before[slot] \
+               or self.flags[slot] != self.before[Slots + slot]:
+                cells[Point.grid[slot]] = self.get_cell(slot)
+        self.batched = set()
+        self.before = bytes(layout) + bytes(self.flags)
+        if cells:
+            self.ui.report_cells_changed(cells)
+
     # Finds all movable cards and checks if the game is over/stuck.
     # The argument to this function is the last known cursor position.
     #
-    # Point => None
-    def refresh(self, curr):
-        def get_nearest_movable():
-            # First check for cards to the right of the current location
-            # on the same row
-            for col in range(curr.col, 13):
-                if self.is_movable(self.points[curr.row][col]):
-                    return self.points[curr.row][col]
-
-            # Then on rows below the current row, cycling back to the row
-            # above the current row. Look for the nearest card to the left of
-            # the current column and then to the right
-            for row in [(curr.row + i) % 4 for i in range(1, 4)]:
-                for col in range(curr.col, -1, -1):
-                    if self.is_movable(self.points[row][col]):
-                        return self.points[row][col]
-                for col in range(curr.col + 1, 13):
-                    if self.is_movable(self.points[row][col]):
-                        return self.points[row][col]
-
-            # And then cards to the left of the current location on the same row
-            for col in range(curr.col - 1, -1, -1):
-                if self.is_movable(self.points[curr.row][col]):
-                    return self.points[curr.row][col]
-
-            # This will be called only if there is at least one movable card,
-            # so we should never get here
-            return None
-
+    # Only the given rows are checked for changes to the correct cards. If no
+    # rows are given, the whole board is checked.
+    #
+    # Point, [int] => None
+    def refresh(self, curr, rows = None):
         self.do_deselect()
-        for addr in self.all_points:
-            self.clear_flags(addr)
-
-        correct = self.get_correct_points()
-        self.ui.report_correct_changed(len(correct))
-        for addr in correct:
-            self.set_correct(addr)
 
-        if len(correct) == 48:
+        # Only the rows that have changed need to be rescanned for correct
+        # cards. Movable cards are found from the four gaps, so recomputing
+        # them is cheap. Flags are only updated, and reported, for the cells
+        # that could have changed.
+        dirty = set(self.movable)
+        for row in range(0, 4) if rows is None else rows:
+            old = self.correct[row]
+            new = self.state.correct_length(row)
+            if new != old:
+                self.correct[row] = new
+                base = row * 13
+                dirty.update(range(base + min(old, new), base + max(old, new)))
+        self.movable = self.state.movable_slots()
+        dirty.update(self.movable)
+        self.update_flags(dirty)
+
+        correct = sum(self.correct)
+        self.ui.report_correct_changed(correct)
+        if correct == 48:
             self.do_game_over(True)
         else:
-            movable = self.get_movable_points()
+            movable = self.movable
             self.ui.report_movable_changed(len(movable))
             self.dbg('refresh')
-            self.dbg('  movable: ', *movable)
-            self.dbg('  empty: ', *self.empty)
+            self.dbg('  movable: ', lambda: _format_slots(movable))
+            self.dbg('  empty: ',
+                     lambda: _format_slots(self.state.gap_slots()))
             if movable:
-                for addr in movable:
-                    self.set_movable(addr)
                 if curr:
-                    self.do_select(get_nearest_movable())
+                    self.do_select(self.get_nearest_movable(curr, None))
                 else:
-                    self.do_select(movable[0])
+                    self.do_select(Point.grid[movable[0]])
                 self.dbg('  selected:', self.selected)
             else:
                 if self.shuffles >= self.settings.shuffles:
                     self.do_game_over(False)
 
-    # Point, Point, bool => None
+    # Recomputes the correct and movable flags of the given cells and reports
+    # the ones that differ. The selection is left alone.
+    #
+    # {int} => None
+    def update_flags(self, slots):
+        movable = set(self.movable)
+        for slot in slots:
+            flags = self.flags[slot] & CellFlags.Selected
+            if slot in movable:
+                flags |= CellFlags.Movable
+            if slot % 13 < self.correct[slot // 13]:
+                flags |= CellFlags.Correct
+            if flags != self.flags[slot]:
+                self.flags[slot] = flags
+                self.report_flags(slot)
+
+    # int, int, bool => None
     def move(self, src, dst, is_undo = False):
         self.dbg('move card')
-        self.dbg(' ', self.get_card(src), ':', src, '=>', dst)
-        card = self.get_card(src)
-        self.clear_card(src)
-        self.set_card(dst, card)
+        self.dbg(' ', self.deck[self.state.card(src)], ':',
+                 Point.grid[src], '=>', Point.grid[dst])
+        if self.recorder and not is_undo:
+            self.recorder.move(src)
+        card = self.state.card(src)
+        self.remove_card(src)
+        self.place_card(dst, card)
         if not is_undo:
-            self.undo_push(MoveAction(self, src, dst))
+            self.undo.push_move(src, dst)
+            self.ui.report_undo_changed(len(self.undo))
             self.moves_incr()
         else:
             self.moves_decr()
 
-        self.refresh(src)
-
-    # bool => None
-    def shuffle(self, is_undo = False):
-        if self.is_started() and not is_undo:
-            self.undo_push(ShuffleAction(self))
+        self.refresh(Point.grid[src], {slot_row(src), slot_row(dst)})
 
-        correct_points = set(self.get_correct_points())
-        correct_cards = set([self.get_card(addr) for addr in correct_points])
+    # If a layout is given, the cards are placed as in the layout instead of
+    # being shuffled. This is used to replay a recorded shuffle
+    #
+    # bytes => None
+    def shuffle(self, layout = None):
+        self.dbg('shuffle')
+        self.dbg('  points:',
+                 lambda: _format_slots(self.state.correct_slots()))
+        before = bytes(self.state.layout)
+        if layout is None:
+            self.state.shuffle(self.rng)
+        else:
+            self.state.load(layout)
+        self.report_cards(before)
+        if self.is_started():
+            selected = Empty
+            if self.selected:
+                selected = self.selected.id
+            self.undo.push_shuffle(before, self.state.layout, selected)
+            self.ui.report_undo_changed(len(self.undo))
+            if self.recorder:
+                self.recorder.shuffle(self.state.layout)
+        self.dbg('  empty:', lambda: _format_slots(self.state.gap_slots()))
 
-        cards = list(self.cards.keys() - correct_cards)
-        addrs = list(self.all_points - correct_points)
-        random.shuffle(cards)
-        random.shuffle(addrs)
+        self.refresh(self.selected)
 
-        self.dbg('shuffle')
-        self.dbg('  points:', *correct_points)
-        self.dbg('  cards:', *correct_cards)
-        for addr in addrs:
-            self.clear_card(addr)
-        self.empty = []
-        for card, addr in zip(cards, addrs):
-            if card.face != Face.Ace:
-                self.set_card(addr, card)
-            else:
-                self.empty.append(addr)
-        self.dbg('  empty:', *self.empty)
+    # Replaces the cards on the board with the given layout
+    #
+    # bytes => None
+    def load(self, layout):
+        before = bytes(self.state.layout)
+        self.state.load(layout)
+        self.report_cards(before)
 
         self.refresh(self.selected)
 
     # None => None
     def clear_board(self):
-        for addr in self.all_points:
-            self.clear_card(addr)
+        for slot in range(0, Slots):
+            self.remove_card(slot)
 
     # None => None
     def shuffles_decr(self):
@@ -326,122 +427,120 @@ class Game:
         self.moves = self.moves + 1
         self.ui.report_moves_changed(self.moves)
 
-    # UndoAction => None
-    def undo_push(self, action):
-        self.undo.append(action)
-        self.ui.report_undo_changed(len(self.undo))
-
-    # None => UndoAction
-    def undo_pop(self):
-        self.ui.report_undo_changed(len(self.undo) - 1)
-        return self.undo.pop(-1)
-
     # None => None
     def do_update_settings(self):
         if self.is_started():
-            if self.selected:
-                self.refresh(self.selected)
+            with self.batch():
+                if self.selected:
+                    self.refresh(self.selected)
+                else:
+                    self.refresh(Point(0, 0))
+            # The flags have not changed but the way they are displayed may
+            # have, so every cell has to be redrawn
+            self.ui.report_cells_changed(
+                { addr: self.get_cell(slot)
+                  for slot, addr in enumerate(Point.grid) })
+
+    # If a seed is given, the random number generator is reseeded before
+    # dealing. If a deal is given, it is used instead of a random deal.
+    # Otherwise, if a difficulty is given or set in the settings and there is
+    # a deal pool, a deal of that difficulty is drawn from the pool.
+    #
+    # int, str, str => None
+    def do_game_new(self, seed = None, deal = None, difficulty = None):
+        with self.batch():
+            if seed is not None:
+                self.rng.seed(seed)
+            if deal is None:
+                deal = self.next_deal
+            self.next_deal = None
+            if deal is not None:
+                layout = decode(deal)
             else:
-                self.refresh(self.points[0][0])
-
-    # None => None
-    def do_game_new(self):
-        random.seed()
-
-        self.clear_board()
-        self.selected = None
-        self.undo = []
-        self.shuffle()
-        self.shuffles = 0
-        self.timer_start()
-        self.ui.report_game_new()
+                layout = self.draw_deal(difficulty
+                                        or self.settings.difficulty)
+
+            # A game that is still in progress is abandoned. Its clock has to
+            # be stopped before dealing so that the deal is not recorded as a
+            # shuffle that can be undone
+            self.hints.cancel()
+            if self.recorder and self.is_started():
+                self.recorder.end(None)
+            self.timer_stop()
+            self.clear_board()
+            self.do_deselect()
+            self.undo.clear()
+            if layout is None:
+                self.shuffle()
+            else:
+                self.load(layout)
+            self.deal = encode(self.state.layout)
+            if self.recorder:
+                self.recorder.new(self.state.layout)
+            self.shuffles = 0
+            self.timer_start()
+            self.ui.report_game_new()
+
+    # A deal of the given difficulty from the pool. None is returned if there
+    # is no difficulty, no pool or no deal of that difficulty in it
+    #
+    # str => bytearray
+    def draw_deal(self, difficulty):
+        if not difficulty or not self.pool:
+            return None
+        info = self.pool.draw(difficulty, self.rng)
+        if info is None:
+            return None
+        self.dbg('deal:', info)
+        return info.layout
 
     # None => None
     def do_game_over(self, win):
+        # The UI may wait for the user when the game is over, so the board
+        # has to be shown as it is now
+        self.flush()
+        if self.recorder:
+            self.recorder.end(win)
         self.timer_stop()
+        if self.stats:
+            self.stats.add_game(self, win)
         self.shuffles = 0
         self.moves = 0
-        self.undo = []
+        self.undo.clear()
         self.ui.report_game_over(win)
 
     # None => None
     def do_quit(self):
+        self.hints.cancel()
+        if self.recorder:
+            if self.is_started():
+                self.recorder.end(None)
+            self.recorder.flush()
+        if self.stats:
+            self.stats.flush()
+        if self.autosave:
+            self.save_game()
         self.timer_stop()
         self.ui.quit()
 
+    # A game that is in progress is saved so that it can be resumed. There
+    # is nothing to resume otherwise, so an old snapshot is removed
+    #
+    # None => None
+    def save_game(self):
+        from . import snapshot
+        try:
+            if self.is_started():
+                snapshot.save_file(self, self.autosave)
+            elif os.path.exists(self.autosave):
+                os.remove(self.autosave)
+        except OSError as err:
+            print('Error: Cannot save the game: {}'.format(err),
+                  file = sys.stderr)
+
     # Direction => None
     def do_move_selected(self, direction):
-        # int, int => Point
-        def get_nearest_movable_left(row, col):
-            if self.is_movable(self.points[row][col]):
-                return self.points[row][col]
-            for c in range(col - 1, -1, -1):
-                if self.is_movable(self.points[row][c]):
-                    return self.points[row][c]
-            return None
-
-        # int, int => Point
-        def get_nearest_movable_right(row, col):
-            if self.is_movable(self.points[row][col]):
-                return self.points[row][col]
-            for c in range(col + 1, 13):
-                if self.is_movable(self.points[row][c]):
-                    return self.points[row][c]
-            return None
-
-        # int, int => Point
-        def get_nearest_movable(row, col):
-            left = get_nearest_movable_left(row, col)
-            right = get_nearest_movable_right(row, col)
-            if left and right:
-                if (col - left.col) <= (right.col - col):
-                    return left
-                else:
-                    return right
-            elif left:
-                return left
-            elif right:
-                return right
-            return None
-
-        # Direction => Point
-        def get_next_movable_point(direction):
-            rows = [(i + self.selected.row) % 4 for i in range(1, 4)]
-            if direction == Direction.Up:
-                for row in reversed(rows):
-                    addr = get_nearest_movable(row, self.selected.col)
-                    if addr:
-                        return addr
-            elif direction == Direction.Down:
-                for row in rows:
-                    addr = get_nearest_movable(row, self.selected.col)
-                    if addr:
-                        return addr
-            elif direction == Direction.Left:
-                for col in range(self.selected.col - 1, -1, -1):
-                    if self.is_movable(self.points[self.selected.row][col]):
-                        return self.points[self.selected.row][col]
-                for row in reversed(rows):
-                    for col in range(12, -1, -1):
-                        if self.is_movable(self.points[row][col]):
-                            return self.points[row][col]
-                for col in range(12, self.selected.col + 1, -1):
-                    if self.is_movable(self.points[self.selected.row][col]):
-                        return self.points[self.selected.row][col]
-            elif direction == Direction.Right:
-                for col in range(self.selected.col + 1, 13):
-                    if self.is_movable(self.points[self.selected.row][col]):
-                        return self.points[self.selected.row][col]
-                for row in rows:
-                    for col in range(0, 13):
-                        if self.is_movable(self.points[row][col]):
-                            return self.points[row][col]
-                for col in range(0, self.selected.col):
-                    if self.is_movable(self.points[self.selected.row][col]):
-                        return self.points[self.selected.row][col]
-            return None
-
-        addr = get_next_movable_point(direction)
+        addr = self.get_nearest_movable(self.selected, direction)
         self.dbg('change selected')
         self.dbg('  ', direction, self.selected, '=>', addr)
         if addr:
@@ -449,11 +548,12 @@ class Game:
 
     # Point => None
     def do_select(self, addr):
-        self.do_deselect()
-        self.dbg('select:', addr)
-        self.set_selected(addr, True)
-        self.selected = addr
-        self.ui.report_selection_changed(self.selected is not None)
+        with self.batch():
+            self.do_deselect()
+            self.dbg('select:', addr)
+            self.set_selected(addr, True)
+            self.selected = addr
+            self.ui.report_selection_changed(self.selected is not None)
 
     # Point => None
     def do_deselect(self):
@@ -465,153 +565,237 @@ class Game:
 
     # None => None
     def do_undo(self):
-        if self.is_started():
-            if len(self.undo):
-                return self.undo_pop().execute()
+        with self.batch():
+            if self.is_started():
+                if len(self.undo):
+                    record = self.undo.pop()
+                    self.ui.report_undo_changed(len(self.undo))
+                    if self.recorder:
+                        self.recorder.undo()
+                    if record[0] == UndoJournal.Move:
+                        _, src, dst = record
+                        self.move(dst, src, True)
+                    else:
+                        _, cells, selected = record
+                        self.state.restore(cells)
+                        for slot, card in cells:
+                            self.report_card(slot)
+                        self.shuffles_decr()
+                        self.refresh(Point.grid[selected]
+                                     if selected != Empty else None)
 
     # Point => None
     def do_move_card(self, src):
-        # None => Point
-        def get_dest():
-            card = self.get_card(src)
-            if card.face == Face.Two:
-                for i in [(src.row + i + 1) % 4 for i in range(0, 4)]:
-                    if self.is_empty(self.points[i][0]):
-                        return self.points[i][0]
-            else:
-                return self.cards[card.predecessor].right
-
-            # This will only be called if the card is movable
-            return None
+        with self.batch():
+            slot = src.id
+            self.move(slot, self.state.dest(slot))
+
+    # bytes => None
+    def do_shuffle(self, layout = None):
+        with self.batch():
+            if self.is_started():
+                if self.settings.is_unlimited_shuffles() \
+                   or (self.shuffles < self.settings.shuffles):
+                    self.shuffle(layout)
+                    self.shuffles_incr()
+
+    # Selects the card that the hint engine thinks is the best one to move.
+    # If the board has not been seen before, the search is done in the
+    # background and the card is selected when it is done, unless the board
+    # has changed by then
+    #
+    # None => None
+    def do_hint(self):
+        if not self.is_started():
+            return
+        ranked = self.hints.lookup(self.state)
+        if ranked is not None:
+            self.show_hint(ranked)
+        else:
+            self.hints.start(
+                self.state,
+                lambda key, ranked: self.ui.run_in_ui(self.finish_hint,
+                                                      key,
+                                                      ranked))
 
-        dst = get_dest()
-        self.move(src, dst)
+    # This is called by the UI when the search is done
+    #
+    # bytes, [((int, int, int), int)] => None
+    def finish_hint(self, key, ranked):
+        with self.lock:
+            if self.is_started() and self.state.key() == key:
+                self.show_hint(ranked)
+
+    # [((int, int, int), int)] => None
+    def show_hint(self, ranked):
+        addr = None
+        if ranked:
+            addr = Point.grid[ranked[0][1]]
+            self.do_select(addr)
+        self.dbg('hint:', addr)
+        self.ui.report_hint(addr)
 
-    # None => None
-    def do_shuffle(self):
-        if self.is_started():
-            if self.settings.is_unlimited_shuffles() \
-               or (self.shuffles < self.settings.shuffles):
-                self.shuffle()
-                self.shuffles_incr()
+    # The nearest movable card from the given cell when searching in the
+    # given direction. If no direction is given, the search is the one used
+    # to select a card after the board changes.
+    #
+    # Point, Direction => Point
+    def get_nearest_movable(self, addr, direction):
+        order = _Search[direction][addr.id]
+        found = [slot for slot in self.movable if slot in order]
+        if found:
+            return Point.grid[min(found, key = order.get)]
+        return None
 
     # None => [Point]
     def get_correct_points(self):
-        # int, Suit => int
-        def get_correct_length(row, suit):
-            for col in range(0, 12):
-                addr = self.points[row][col]
-                if self.is_empty(addr):
-                    return col
-                card = self.get_card(addr)
-                if (card.suit != suit) or (int(card.face) != col + 2):
-                    return col
-            return 12
-
-        correct = []
-        for row in range(0, 4):
-            addr = self.points[row][0]
-            if not self.is_empty(addr):
-                suit = self.get_card(addr).suit
-                for col in range(0, get_correct_length(row, suit)):
-                    correct.append(self.points[row][col])
-        return correct
+        return [Point.grid[s] for s in self.state.correct_slots()]
 
     # None => [Point]
     def get_movable_points(self):
-        movable = []
-        for addr in self.empty:
-            if addr.col == 0:
-                for suit in Suit:
-                    movable.append(self.cards[Card(suit, Face.Two)])
-                break
-
-        for addr in self.empty:
-            left = addr.left
-            if left and not self.is_empty(left):
-                succ = self.get_card(left).successor
-                if succ:
-                    movable.append(self.cards[succ])
-
-        return movable
+        return [Point.grid[s] for s in self.state.movable_slots()]
+
+    # int => (Card, CellFlags)
+    def get_cell(self, slot):
+        card = self.state.card(slot)
+        return (self.deck[card] if card != Empty else None,
+                CellFlags(self.flags[slot]))
+
+    # int => None
+    def report_card(self, slot):
+        if self.batched is not None:
+            self.batched.add(slot)
+            return
+        card = self.state.card(slot)
+        self.ui.report_cell_card_changed(Point.grid[slot],
+                                         self.deck[card] if card != Empty
+                                         else None)
+
+    # Reports every cell whose card differs from the given layout
+    #
+    # bytes => None
+    def report_cards(self, before):
+        layout = self.state.layout
+        for slot in range(0, Slots):
+            if layout[slot] != before[slot]:
+                self.report_card(slot)
+
+    # int => None
+    def report_flags(self, slot):
+        if self.batched is not None:
+            self.batched.add(slot)
+            return
+        self.ui.report_cell_flags_changed(Point.grid[slot],
+                                          CellFlags(self.flags[slot]))
+
+    # The flags of the cell are left as they are. They are brought up to date
+    # by the refresh that follows every change to the board.
+    #
+    # int => None
+    def remove_card(self, slot):
+        if self.state.remove(slot) != Empty:
+            self.report_card(slot)
+
+    # int, int => None
+    def place_card(self, slot, card):
+        if self.state.card(slot) != card:
+            self.state.place(slot, card)
+            self.report_card(slot)
+
+    # int, CellFlags => None
+    def set_flag(self, slot, flag):
+        if not self.flags[slot] & flag:
+            self.flags[slot] |= flag
+            self.report_flags(slot)
+
+    # int, CellFlags => None
+    def reset_flag(self, slot, flag):
+        if self.flags[slot] & flag:
+            self.flags[slot] &= ~flag
+            self.report_flags(slot)
 
     # Point => None
     def clear_card(self, addr):
-        card = self.get_card(addr)
-        if card:
-            self.cards[card] = None
-            self.empty.append(addr)
-        self.board[addr.row][addr.col].clear()
-
-    # None => None
-    def clear_flags(self, addr):
-        self.board[addr.row][addr.col].clear_flags()
+        self.remove_card(addr.id)
 
     # Point, Card => None
     def set_card(self, addr, card):
-        if addr in self.empty:
-            self.empty.remove(addr)
-        self.board[addr.row][addr.col].set_card(card)
-        self.cards[card] = addr
-
-    # Point, bool => None
-    def set_movable(self, addr, val = True):
-        if val:
-            self.board[addr.row][addr.col].set_movable()
-
-    # Point, bool => None
-    def set_correct(self, addr, val = True):
-        if val:
-            self.board[addr.row][addr.col].set_correct()
+        self.place_card(addr.id,
+                        card_id(card.suit, card.face))
 
     # Point, bool => None
     def set_selected(self, addr, val = True):
         if val:
-            self.board[addr.row][addr.col].set_selected()
+            self.set_flag(addr.id, CellFlags.Selected)
         else:
-            self.board[addr.row][addr.col].reset_selected()
-        
+            self.reset_flag(addr.id, CellFlags.Selected)
+
     # Point => Card
     def get_card(self, addr):
-        if self.board[addr.row][addr.col] is None:
-            raise RuntimeError('Getting card from empty cell: {}', addr)
-        return self.board[addr.row][addr.col].card
+        card = self.state.card(addr.id)
+        if card == Empty:
+            return None
+        return self.deck[card]
 
     # Point => bool
     def is_movable(self, addr):
-        return self.board[addr.row][addr.col].movable
+        return bool(self.flags[addr.id]
+                    & CellFlags.Movable)
 
     # Point => bool
     def is_correct(self, addr):
-        return self.board[addr.row][addr.col].correct
+        return bool(self.flags[addr.id]
+                    & CellFlags.Correct)
 
     # Point => bool
     def is_selected(self, addr):
-        return self.board[addr.row][addr.col].selected
+        return bool(self.flags[addr.id]
+                    & CellFlags.Selected)
 
     # Point => bool
     def is_empty(self, addr):
-        return self.get_card(addr) is None
+        return self.state.is_empty(addr.id)
 
     # None => bool
     def is_started(self):
-        return self.timer is not None
+        return self.started
+
+    # The clock is only read when somebody asks for the time, so nothing runs
+    # in the background while a game is being played. The UIs redraw the time
+    # from their own event loops.
+    #
+    # None => float
+    def get_elapsed(self):
+        if self.clock is None:
+            return self.elapsed
+        return self.elapsed + monotonic() - self.clock
+
+    # None => int
+    @property
+    def ticks(self):
+        return int(self.get_elapsed())
 
     # None => None
     def timer_start(self):
-        self.timer_tick(True)
+        self.started = True
+        self.elapsed = 0.0
+        self.clock = monotonic()
 
     # None => None
     def timer_stop(self):
-        if self.timer:
-            self.timer.cancel()
-        self.timer = None
-
-    # bool => None
-    def timer_tick(self, start = False):
-        if start:
-            self.ticks = 0
-        else:
-            self.ticks = self.ticks + 1
-        self.timer = Timer(1, self.timer_tick)
-        self.timer.start()
+        self.timer_pause()
+        self.started = False
+
+    # The clock can be paused while the game is not being played, for
+    # instance while a dialog is open
+    #
+    # None => None
+    def timer_pause(self):
+        if self.clock is not None:
+            self.elapsed = self.elapsed + monotonic() - self.clock
+            self.clock = None
+
+    # None => None
+    def timer_resume(self):
+        if self.started and self.clock is None:
+            self.clock = monotonic()
@@ -69,6 +69,16 @@ class GameUI(AbstractBase):
     def report_cell_flags_changed(self, addr, flags):
         pass
 
+    # Reports the cells that changed in a batch with their final card and
+    # flags. The card is None if the cell is empty. By default, this reports
+    # the card and flags of each cell separately
+    #
+    # { Point: (Card, IntFlag) } => None
+    def report_cells_changed(self, cells):
+        for addr, (card, flags) in cells.items():
+            self.report_cell_card_changed(addr, card)
+            self.report_cell_flags_changed(addr, flags)
+
     # bool => None
     @abstractmethod
     def report_selection_changed(self, selected):
@@ -109,6 +119,25 @@ class GameUI(AbstractBase):
     def report_game_new(self):
         pass
 
+    # The card that the hint engine suggests moving. It has already been
+    # selected. This is None if no card can be moved
+    #
+    # Point => None
+    def report_hint(self, addr):
+        pass
+
+    # Calls the function on the thread that runs the UI. The hint engine
+    # calls this from its own thread when it is done. A UI without an event
+    # loop just calls the function
+    #
+    # callable, * => None
+    def run_in_ui(self, fn, *args):
+        fn(*args)
+
+    # * => None
+    def action_hint(self, *args):
+        self.game.do_hint()
+
     # * => None
     def action_shuffle(self, *args):
         self.game.do_shuffle()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf, GLib
+
+import hashlib
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from threading import Thread
+
+from ..settings import cache_dir
+from ..types import Face, Suit
+
+# Parsing the card SVGs takes most of the time it takes to start the game.
+# Every card is rendered once for a given size into an atlas, a single image
+# with the cards of a suit in each row. The pixels of the atlas are saved in
+# the cache directory and are loaded directly the next time the game is
+# started at that size.
+#
+# The cache file is named after a hash of the contents of all the SVGs and
+# the size of the cards, so it is never stale. It starts with a header that
+# has the dimensions of the atlas followed by the raw RGBA pixels.
+
+
+class CardAtlas:
+    dirname = cache_dir()
+    cards_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'cards')
+
+    # magic, width, height, rowstride
+    _Header = struct.Struct('<4sIII')
+    _Magic = b'ASCA'
+
+    # Hash of the contents of the SVGs. This is computed once
+    _digest = None
+
+    # The atlas is loaded from the cache if it is there. Otherwise the cards
+    # are rendered one at a time as they are asked for until render() is
+    # called to build the whole atlas.
+    #
+    # int, int, int
+    def __init__(self, width, height, scale = 1):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.pixbuf = None
+        self.cards = dict()
+        self.load()
+
+    # Suit, Face => str
+    @staticmethod
+    def svg(suit, face):
+        return os.path.join(CardAtlas.cards_dir, suit.dirname, face.filename)
+
+    # None => str
+    @staticmethod
+    def get_digest():
+        if not CardAtlas._digest:
+            digest = hashlib.sha1()
+            for s in Suit:
+                for c in Face:
+                    with open(CardAtlas.svg(s, c), 'rb') as f:
+                        digest.update(f.read())
+            CardAtlas._digest = digest.hexdigest()[:16]
+        return CardAtlas._digest
+
+    # None => str
+    def get_filename(self):
+        return os.path.join(CardAtlas.dirname,
+                            'cards-{}-{}x{}@{}.atlas'.format(
+                                CardAtlas.get_digest(),
+                                self.width,
+                                self.height,
+                                self.scale))
+
+    # None => bool
+    def is_complete(self):
+        return self.pixbuf is not None
+
+    # Suit, Face => bool
+    def has(self, suit, face):
+        return (suit, face) in self.cards
+
+    # Suit, Face => GdkPixbuf.Pixbuf
+    def get(self, suit, face):
+        if (suit, face) not in self.cards:
+            self.cards[(suit, face)] = self.render_card(suit, face)
+        return self.cards[(suit, face)]
+
+    # Suit, Face => GdkPixbuf.Pixbuf
+    def render_card(self, suit, face):
+        card = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+            CardAtlas.svg(suit, face),
+            self.width * self.scale,
+            self.height * self.scale,
+            False)
+        if not card.get_has_alpha():
+            card = card.add_alpha(False, 0, 0, 0)
+        return card
+
+    # Renders every card into a new atlas. This does not change the atlas
+    # object, so it can be run in a separate thread. attach() must be called
+    # with the result to use it.
+    #
+    # None => GdkPixbuf.Pixbuf
+    def render(self):
+        cw = self.width * self.scale
+        ch = self.height * self.scale
+        pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB,
+                                      True,
+                                      8,
+                                      cw * len(Face),
+                                      ch * len(Suit))
+        pixbuf.fill(0)
+        for s in Suit:
+            for c in Face:
+                self.render_card(s, c).copy_area(0, 0, cw, ch,
+                                                 pixbuf,
+                                                 (int(c) - 1) * cw,
+                                                 (int(s) - 1) * ch)
+        return pixbuf
+
+    # The cards are replaced with views into the atlas
+    #
+    # GdkPixbuf.Pixbuf => None
+    def attach(self, pixbuf):
+        cw = self.width * self.scale
+        ch = self.height * self.scale
+        self.pixbuf = pixbuf
+        self.cards = dict()
+        for s in Suit:
+            for c in Face:
+                self.cards[(s, c)] = pixbuf.new_subpixbuf(
+                    (int(c) - 1) * cw, (int(s) - 1) * ch, cw, ch)
+
+    # A cache that cannot be read is ignored and the atlas is rendered again
+    #
+    # None => bool
+    def load(self):
+        try:
+            with open(self.get_filename(), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as m:
+                    magic, width, height, rowstride = \
+                        CardAtlas._Header.unpack_from(m)
+                    size = CardAtlas._Header.size + rowstride * height
+                    if magic != CardAtlas._Magic \
+                       or width != self.width * self.scale * len(Face) \
+                       or height != self.height * self.scale * len(Suit) \
+                       or len(m) != size:
+                        return False
+                    pixels = GLib.Bytes.new(m[CardAtlas._Header.size:])
+        except (OSError, ValueError, struct.error):
+            return False
+
+        self.attach(GdkPixbuf.Pixbuf.new_from_bytes(pixels,
+                                                    GdkPixbuf.Colorspace.RGB,
+                                                    True,
+                                                    8,
+                                                    width,
+                                                    height,
+                                                    rowstride))
+        return True
+
+    # The cache is written to a temporary file first so that another instance
+    # of the game never sees a partial atlas. Failing to write it is not an
+    # error, the atlas will just be rendered again the next time.
+    #
+    # GdkPixbuf.Pixbuf => None
+    def save(self, pixbuf):
+        filename = self.get_filename()
+        tmp = '{}.{}'.format(filename, os.getpid())
+        header = CardAtlas._Header.pack(CardAtlas._Magic,
+                                        pixbuf.get_width(),
+                                        pixbuf.get_height(),
+                                        pixbuf.get_rowstride())
+        # The last row of a pixbuf need not be padded to the full rowstride
+        pixels = pixbuf.read_pixel_bytes().get_data()
+        padding = pixbuf.get_rowstride() * pixbuf.get_height() - len(pixels)
+        try:
+            os.makedirs(CardAtlas.dirname, exist_ok = True)
+            with open(tmp, 'wb') as f:
+                f.write(header)
+                f.write(pixels)
+                f.write(bytes(padding))
+            os.replace(tmp, filename)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+# The card images for the sizes that the board has been drawn at. Only the
+# atlases for the last few sizes are kept.
+#
+# A card is rendered from its SVG the first time it is drawn at a size that
+# is not in the cache. While the window is being resized, the image of the
+# card at the last size is scaled instead, which is much cheaper. Once the
+# size has not changed for a while, the whole atlas for the new size is
+# rendered in a separate thread and the board is redrawn when it is ready.
+class CardCache:
+    # Number of sizes that are kept
+    capacity = 3
+    # Milliseconds that the size must not change for before the atlas for it
+    # is rendered
+    delay = 250
+
+    # callable
+    def __init__(self, ready):
+        # Called with no arguments once an atlas has been rendered
+        self.ready = ready
+        # (width, height, scale) => CardAtlas
+        self.atlases = OrderedDict()
+        # (width, height, scale), Suit, Face => GdkPixbuf.Pixbuf
+        # Cards scaled from another size while the atlas is not ready
+        self.scaled = dict()
+        self.pending = None
+        self.source = None
+        self.worker = None
+
+    # Suit, Face, int, int, int => GdkPixbuf.Pixbuf
+    def get(self, suit, face, width, height, scale = 1):
+        key = (width, height, scale)
+        atlas = self.atlases.get(key)
+        if atlas:
+            self.atlases.move_to_end(key)
+        else:
+            atlas = CardAtlas(width, height, scale)
+            self.atlases[key] = atlas
+            while len(self.atlases) > CardCache.capacity:
+                self.atlases.popitem(last = False)
+
+        if atlas.is_complete() or atlas.has(suit, face):
+            return atlas.get(suit, face)
+
+        self.settle(key)
+        if (key, suit, face) in self.scaled:
+            return self.scaled[(key, suit, face)]
+        for other in reversed(self.atlases.values()):
+            if other is not atlas and other.has(suit, face):
+                card = other.get(suit, face).scale_simple(
+                    width * scale,
+                    height * scale,
+                    GdkPixbuf.InterpType.BILINEAR)
+                self.scaled[(key, suit, face)] = card
+                return card
+        return atlas.get(suit, face)
+
+    # Renders the atlas for the given size once the size has not changed for
+    # a while
+    #
+    # (int, int, int) => None
+    def settle(self, key):
+        if self.pending == key:
+            return
+        if self.source:
+            GLib.source_remove(self.source)
+        self.pending = key
+        self.source = GLib.timeout_add(CardCache.delay, self.start)
+
+    # None => bool
+    def start(self):
+        self.source = None
+        if self.worker and self.worker.is_alive():
+            # Try again once the current atlas is done
+            self.source = GLib.timeout_add(CardCache.delay, self.start)
+            return False
+
+        key = self.pending
+        atlas = self.atlases.get(key)
+        if atlas and not atlas.is_complete():
+            self.worker = Thread(target = self.work,
+                                 args = (key, atlas),
+                                 daemon = True)
+            self.worker.start()
+        return False
+
+    # (int, int, int), CardAtlas => None
+    def work(self, key, atlas):
+        pixbuf = atlas.render()
+        atlas.save(pixbuf)
+        GLib.idle_add(self.finish, key, atlas, pixbuf)
+
+    # (int, int, int), CardAtlas, GdkPixbuf.Pixbuf => bool
+    def finish(self, key, atlas, pixbuf):
+        atlas.attach(pixbuf)
+        self.scaled = dict()
+        if self.pending == key:
+            self.pending = None
+        if self.atlases.get(key) is atlas:
+            self.ready()
+        return False
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, Gdk
+
+import cairo
+import math
+
+from .ui import GameGtk
+from ..types import CellFlags, Point
+
+# The board is drawn in a single drawing area instead of one per cell. When
+# a cell changes, only its rectangle is invalidated and only the cells that
+# intersect the area being redrawn are painted.
+#
+# The outline of a cell only depends on its size, so it is computed once for
+# every size and reused for every cell. The colors of the outlines are looked
+# up once for every redraw instead of once for every cell.
+
+
+class GameGtkCanvas(GameGtk):
+    # Same layout as the grid in game.glade
+    margin = 2
+    spacing = 2
+    cell_width = 78
+    cell_height = 106
+
+    # Game
+    def __init__(self, game):
+        self.canvas = None
+        self.cell_size = None
+        self.outline = None
+        super().__init__(game)
+
+    # The grid of drawing areas is replaced with a single drawing area
+    #
+    # None => None
+    def setup_board(self):
+        frm_board = self.builder.get_object('frm_board')
+        frm_board.remove(self.builder.get_object('grd_board'))
+
+        self.canvas = Gtk.DrawingArea.new()
+        self.canvas.set_size_request(
+            13 * self.cell_width + 12 * self.spacing + 2 * self.margin,
+            4 * self.cell_height + 3 * self.spacing + 2 * self.margin)
+        self.canvas.set_hexpand(True)
+        self.canvas.set_vexpand(True)
+        self.canvas.add_events(Gdk.EventMask.BUTTON_PRESS_MASK)
+        self.canvas.connect('draw', self.draw_board)
+        self.canvas.connect('button-press-event', self.action_canvas_press)
+        frm_board.add(self.canvas)
+
+    # The size of every cell including its border. Like the grid, all the
+    # cells are the same size and any space that is left over is not used
+    #
+    # None => (int, int)
+    def get_cell_size(self):
+        width = self.canvas.get_allocated_width() - 2 * self.margin \
+            - 12 * self.spacing
+        height = self.canvas.get_allocated_height() - 2 * self.margin \
+            - 3 * self.spacing
+        return (max(width // 13, 0), max(height // 4, 0))
+
+    # int, int => (int, int, int, int)
+    def get_cell_rect(self, row, col):
+        width, height = self.get_cell_size()
+        return (self.margin + col * (width + self.spacing),
+                self.margin + row * (height + self.spacing),
+                width,
+                height)
+
+    # float, float => Point
+    def get_cell_at(self, x, y):
+        width, height = self.get_cell_size()
+        col = int(x - self.margin) // (width + self.spacing)
+        row = int(y - self.margin) // (height + self.spacing)
+        if 0 <= row < 4 and 0 <= col < 13:
+            left, top, _, _ = self.get_cell_rect(row, col)
+            if x < left + width and y < top + height:
+                return Point(row, col)
+        return None
+
+    # The rounded outline of a cell at the origin
+    #
+    # int, int => cairo.Path
+    def get_outline(self, width, height):
+        if self.cell_size != (width, height):
+            # float => float
+            def radians(angle):
+                return angle * math.pi / 180
+
+            x = 0.5 * self.settings.border
+            y = 0.5 * self.settings.border
+            w = width - self.settings.border
+            h = height - self.settings.border
+            r = self.settings.radius
+
+            cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+            cr.new_sub_path()
+            cr.arc(x + w - r, y + r, r, radians(-90), radians(0))
+            cr.arc(x + w - r, y + h - r, r, radians(0), radians(90))
+            cr.arc(x + r, y + h - r, r, radians(90), radians(180))
+            cr.arc(x + r, y + r, r, radians(180), radians(270))
+            cr.close_path()
+            self.outline = cr.copy_path()
+            self.cell_size = (width, height)
+        return self.outline
+
+    # The color of the outline for each combination of flags
+    #
+    # None => [(float, float, float, float)]
+    def get_colors(self):
+        # Color => (float, float, float, float)
+        def rgba(color):
+            return (color.red(float),
+                    color.green(float),
+                    color.blue(float),
+                    color.alpha(float))
+
+        selected = rgba(self.settings.color_selected)
+        movable = rgba(self.settings.color_movable)
+        correct = rgba(self.settings.color_correct)
+        normal = rgba(self.settings.color_normal)
+        colors = []
+        for flags in range(0, 8):
+            if flags & CellFlags.Selected:
+                colors.append(selected)
+            elif flags & CellFlags.Movable \
+                 and self.settings.highlight_movable:
+                colors.append(movable)
+            elif flags & CellFlags.Correct \
+                 and self.settings.highlight_correct:
+                colors.append(correct)
+            else:
+                colors.append(normal)
+        return colors
+
+    # Gtk.Widget, cairo.Context => bool
+    def draw_board(self, drw, cr):
+        width, height = self.get_cell_size()
+        card_width = width - 2 * self.settings.border
+        card_height = height - 2 * self.settings.border
+        if card_width <= 0 or card_height <= 0:
+            return False
+
+        outline = self.get_outline(width, height)
+        colors = self.get_colors()
+        scale = drw.get_scale_factor()
+        border = self.settings.border
+        _, clip = Gdk.cairo_get_clip_rectangle(cr)
+        cr.set_line_width(border)
+        for row in range(0, 4):
+            for col in range(0, 13):
+                x = self.margin + col * (width + self.spacing)
+                y = self.margin + row * (height + self.spacing)
+                if x + width <= clip.x or x >= clip.x + clip.width \
+                   or y + height <= clip.y or y >= clip.y + clip.height:
+                    continue
+
+                addr = Point(row, col)
+                cr.save()
+                cr.translate(x, y)
+                card = self.game.get_card(addr)
+                if card:
+                    cr.save()
+                    cr.translate(border, border)
+                    cr.scale(1 / scale, 1 / scale)
+                    Gdk.cairo_set_source_pixbuf(cr,
+                                                self.cards.get(card.suit,
+                                                               card.face,
+                                                               card_width,
+                                                               card_height,
+                                                               scale),
+                                                0,
+                                                0)
+                    cr.paint()
+                    cr.restore()
+                cr.append_path(outline)
+                cr.set_source_rgba(*colors[self.game.flags[row * 13 + col]])
+                cr.stroke()
+                cr.restore()
+        return False
+
+    # Gtk.Widget, Gdk.Event => bool
+    def action_canvas_press(self, drw, evt):
+        addr = self.get_cell_at(evt.x, evt.y)
+        if addr:
+            return self.action_button_press(drw, evt, addr)
+        return False
+
+    # None => None
+    def redraw(self):
+        self.canvas.queue_draw()
+
+    # Point => None
+    def redraw_cell(self, addr):
+        self.canvas.queue_draw_area(*self.get_cell_rect(addr.row, addr.col))
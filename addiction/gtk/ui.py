@@ -20,17 +20,17 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GLib
-from gi.repository.GdkPixbuf import Pixbuf as GdkPixbuf
 
 import math
 import os
 
+from .atlas import CardCache
 from .css import CSS
 from .dialog import SettingsGtk
 from .util import as_rgba, as_color
 from ..game_ui import GameUI
 from ..settings import Settings
-from ..types import Suit, Face, Direction, Point, Color
+from ..types import Direction, Point, Color
         
 
 class GameGtk(GameUI):
@@ -76,33 +76,12 @@ class GameGtk(GameUI):
         self.dlg_quit = self.builder.get_object('dlg_quit')
         self.dlg_result = self.builder.get_object('dlg_result')
         
+        self.setup_board()
         self.win_main.show_all()
-        for i in range(0, 4):
-            for j in range(0, 13):
-                drw = self.builder.get_object('drw_{}_{}'.format(i, j))
-                drw.connect('button-press-event',
-                            self.action_button_press,
-                            self.game.points[i][j])
-                drw.connect('draw', self.draw_card, self.game.points[i][j])
-
-                self.board[i][j] = drw
 
-        cards_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            'cards')
-        allocation = self.board[0][0].get_allocation()
-        self.card_width = allocation.width - 2 * self.settings.border
-        self.card_height = allocation.height - 2 * self.settings.border
-        self.cards = dict()
-        for s in Suit:
-            self.cards[s] = dict()
-            for c in Face:
-                filename = os.path.join(cards_dir, s.dirname, c.filename)
-                self.cards[s][c] = \
-                    GdkPixbuf.new_from_file_at_scale(filename,
-                                                     self.card_width,
-                                                     self.card_height,
-                                                     False)
+        # The cards are rendered when they are first drawn at the size of the
+        # widget they are drawn in
+        self.cards = CardCache(self.redraw)
         self.css_win = CSS('label',
                            {'font-weight': 'bold',
                             'color': 'green'}).get_provider()
@@ -113,6 +92,20 @@ class GameGtk(GameUI):
                              {'font-weight': 'bold',
                               'color': 'orange'}).get_provider()
 
+    # Every cell of the board is a separate drawing area
+    #
+    # None => None
+    def setup_board(self):
+        for i in range(0, 4):
+            for j in range(0, 13):
+                drw = self.builder.get_object('drw_{}_{}'.format(i, j))
+                drw.connect('button-press-event',
+                            self.action_button_press,
+                            Point(i, j))
+                drw.connect('draw', self.draw_card, Point(i, j))
+
+                self.board[i][j] = drw
+
     # None => None
     def main(self):
         Gtk.main()
@@ -126,7 +119,9 @@ class GameGtk(GameUI):
 
     # * => None
     def action_about(self, *args):
+        self.game.timer_pause()
         self.dlg_about.run()
+        self.game.timer_resume()
 
     # * => None
     def action_new(self, *args):
@@ -154,7 +149,9 @@ class GameGtk(GameUI):
             
     # * => None
     def action_preferences(self, mitm_game_preferences):
+        self.game.timer_pause()
         SettingsGtk(self.game).run()
+        self.game.timer_resume()
 
     # * => None
     def action_move(self, mitm_actions_move):
@@ -186,6 +183,8 @@ class GameGtk(GameUI):
                 self.action_shuffle()
             elif key in [Gdk.KEY_u]:
                 self.action_undo()
+            elif key in [Gdk.KEY_h]:
+                self.action_hint()
         self.game.dbg('Released lock')
         return False
         
@@ -219,18 +218,34 @@ class GameGtk(GameUI):
             color = self.settings.color_normal
 
 
+        width = drw.get_allocated_width() - 2 * self.settings.border
+        height = drw.get_allocated_height() - 2 * self.settings.border
+        if width <= 0 or height <= 0:
+            return False
+
         if not self.game.is_empty(addr):
             card = self.game.get_card(addr)
+            # The cards are rendered at the scale of the display, so they are
+            # drawn in device pixels
+            scale = drw.get_scale_factor()
+            cr.save()
+            cr.translate(self.settings.border, self.settings.border)
+            cr.scale(1 / scale, 1 / scale)
             Gdk.cairo_set_source_pixbuf(cr,
-                                        self.cards[card.suit][card.face],
-                                        self.settings.border,
-                                        self.settings.border)
+                                        self.cards.get(card.suit,
+                                                       card.face,
+                                                       width,
+                                                       height,
+                                                       scale),
+                                        0,
+                                        0)
             cr.paint()
+            cr.restore()
 
         x = 0.5 * self.settings.border
         y = 0.5 * self.settings.border
-        w = self.card_width + self.settings.border
-        h = self.card_height + self.settings.border
+        w = width + self.settings.border
+        h = height + self.settings.border
         r = self.settings.radius
 
         cr.new_sub_path()
@@ -246,13 +261,28 @@ class GameGtk(GameUI):
         cr.set_line_width(self.settings.border)
         cr.stroke()
         
+    # None => None
+    def redraw(self):
+        for row in self.board:
+            for drw in row:
+                drw.queue_draw()
+
+    # Point => None
+    def redraw_cell(self, addr):
+        self.board[addr.row][addr.col].queue_draw()
+
     # Point, Card => None
     def report_cell_card_changed(self, addr, card):
-        self.board[addr.row][addr.col].queue_draw()
+        self.redraw_cell(addr)
 
     # Point, bool => None
     def report_cell_flags_changed(self, addr, flags):
-        self.board[addr.row][addr.col].queue_draw()
+        self.redraw_cell(addr)
+
+    # { Point: (Card, IntFlag) } => None
+    def report_cells_changed(self, cells):
+        for addr in cells:
+            self.redraw_cell(addr)
 
     # bool => None
     def report_selection_changed(self, selected):
@@ -277,6 +307,17 @@ class GameGtk(GameUI):
     def report_moves_changed(self, moves):
         self.lbl_moves.set_text(str(moves))
                 
+    # callable, * => None
+    def run_in_ui(self, fn, *args):
+        # The function is called once since it does not return True
+        GLib.idle_add(fn, *args)
+
+    # Point => None
+    def report_hint(self, addr):
+        if addr:
+            self.lbl_status.set_text('Hint: {}'.format(
+                self.game.get_card(addr)))
+
     # int => None
     def report_movable_changed(self, movable):
         self.lbl_status.get_style_context().remove_provider(self.css_stuck)
@@ -340,9 +381,20 @@ class GameGtk(GameUI):
         self.lbl_result.get_style_context().remove_provider(self.css_win)
         self.lbl_result.get_style_context().remove_provider(self.css_lose)
         self.lbl_time.set_text('00:00')
-        self.timer = GLib.timeout_add_seconds(1, self.tick)
+        if self.timer:
+            GLib.source_remove(self.timer)
+        self.schedule_tick()
 
+    # The label is updated just after the clock reaches the next whole second
+    # so that it does not drift from the game time
+    #
     # None => None
+    def schedule_tick(self):
+        elapsed = self.game.get_elapsed()
+        delay = int((1 + int(elapsed) - elapsed) * 1000) + 1
+        self.timer = GLib.timeout_add(delay, self.tick)
+
+    # None => bool
     def tick(self):
         ticks = self.game.ticks
         secs = ticks % 60
@@ -353,4 +405,5 @@ class GameGtk(GameUI):
         else:
             self.lbl_time.set_text('{:02}:{:02}'.format(mins, secs))
 
-        return True
+        self.schedule_tick()
+        return False
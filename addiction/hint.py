@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+from threading import Event, Thread
+
+# Suggests which card to move. Every card that can be moved is tried and the
+# positions that can be reached from it in a few more moves are searched.
+# A move is scored by the most correct cards that the search finds after it,
+# then by how soon it finds them and then by the most cards that can be
+# moved in that position. None of this looks at shuffles, which are random.
+#
+# The search runs in a separate thread so that it never holds up the UI.
+# Starting a new search cancels the one that is running. Both the ranked
+# moves for a board and the scores of the positions that were searched are
+# cached by the layout of the board, so asking for a hint again, or after
+# undoing back to a board that has been seen, does not search at all.
+
+
+# Raised in the search thread when the search has been cancelled
+class Cancelled(Exception):
+    pass
+
+
+class HintEngine:
+    # Number of moves that are searched after each candidate move
+    depth = 4
+    # Number of boards for which the ranked moves are kept
+    capacity = 1024
+    # Number of positions for which the scores are kept
+    max_scores = 1 << 16
+
+    # int
+    def __init__(self, depth = None):
+        if depth is not None:
+            self.depth = depth
+        # Board => [(score, slot)]
+        self.ranked = OrderedDict()
+        # (Board, depth) => score
+        self.scores = dict()
+        self.cancelled = None
+        self.worker = None
+
+    # The ranked moves for a board if they have already been found
+    #
+    # BoardState => [((int, int, int), int)]
+    def lookup(self, state):
+        key = state.key()
+        ranked = self.ranked.get(key)
+        if ranked is not None:
+            self.ranked.move_to_end(key)
+        return ranked
+
+    # Ranks the moves on a copy of the board in a separate thread. When it
+    # is done, done is called with the board key and the ranked moves from
+    # the search thread. Nothing is called if the search is cancelled.
+    #
+    # BoardState, callable => None
+    def start(self, state, done):
+        self.cancel()
+        self.cancelled = Event()
+        self.worker = Thread(target = self.work,
+                             args = (state.copy(), done, self.cancelled),
+                             daemon = True)
+        self.worker.start()
+
+    # None => None
+    def cancel(self):
+        if self.cancelled:
+            self.cancelled.set()
+            self.cancelled = None
+
+    # BoardState, callable, Event => None
+    def work(self, state, done, cancelled):
+        try:
+            ranked = self.rank(state, cancelled)
+        except Cancelled:
+            return
+        done(state.key(), ranked)
+
+    # The movable cards, best first. Each comes with its score
+    #
+    # BoardState, Event => [((int, int, int), int)]
+    def rank(self, state, cancelled = None):
+        key = state.key()
+        ranked = self.ranked.get(key)
+        if ranked is not None:
+            return ranked
+
+        ranked = []
+        for src in state.movable_slots():
+            dst = state.dest(src)
+            state.move(src, dst)
+            ranked.append((self.score(state, self.depth, cancelled), src))
+            state.move(dst, src)
+        ranked.sort(key = lambda move: move[0], reverse = True)
+
+        self.ranked[key] = ranked
+        while len(self.ranked) > self.capacity:
+            self.ranked.popitem(last = False)
+        return ranked
+
+    # The best position that can be reached from this one in at most the
+    # given number of moves as (correct cards, moves left, movable cards)
+    #
+    # BoardState, int, Event => (int, int, int)
+    def score(self, state, depth, cancelled):
+        if cancelled and cancelled.is_set():
+            raise Cancelled()
+
+        key = (state.key(), depth)
+        best = self.scores.get(key)
+        if best is not None:
+            return best
+
+        movable = state.movable_slots()
+        best = (state.correct_count(), depth, len(movable))
+        if depth > 0:
+            for src in movable:
+                dst = state.dest(src)
+                state.move(src, dst)
+                best = max(best, self.score(state, depth - 1, cancelled))
+                state.move(dst, src)
+
+        if len(self.scores) >= self.max_scores:
+            self.scores.clear()
+        self.scores[key] = best
+        return best
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cProfile
+import io
+import pstats
+import sys
+import tracemalloc
+from time import perf_counter_ns
+
+# Counts the calls to the main operations of a game and the time spent in
+# them. The methods are wrapped on the game and UI objects themselves, so a
+# game that is not being profiled runs exactly the same code as before. The
+# times are inclusive, so the time for move includes the refresh that it
+# does.
+#
+# The profiler can also run cProfile or tracemalloc for the whole session.
+
+
+class Profiler:
+    Modes = ['counters', 'cprofile', 'tracemalloc']
+
+    # Methods of the game that are timed
+    Methods = ['refresh', 'move', 'shuffle', 'do_undo']
+
+    # str
+    def __init__(self, mode = 'counters'):
+        if mode not in Profiler.Modes:
+            raise RuntimeError('Unknown profiling mode: {}'.format(mode))
+        self.mode = mode
+        # Label => [calls, nanoseconds]
+        self.counters = dict()
+        self.profile = None
+        # False once the profiler has been stopped
+        self.running = True
+        if mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif mode == 'tracemalloc':
+            tracemalloc.start()
+
+    # Replaces the method of the object with one that counts the calls to it
+    # and the time spent in it
+    #
+    # *, str, str => None
+    def wrap(self, obj, name, label):
+        fn = getattr(obj, name)
+        counter = self.counters.setdefault(label, [0, 0])
+
+        # * => *
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                counter[0] = counter[0] + 1
+                counter[1] = counter[1] + perf_counter_ns() - start
+
+        setattr(obj, name, timed)
+
+    # Game => None
+    def attach(self, game):
+        for name in Profiler.Methods:
+            self.wrap(game, name, name)
+        for name in dir(type(game.ui)):
+            if name.startswith('report_'):
+                self.wrap(game.ui, name, 'ui.' + name)
+
+    # None => { str: (int, int) }
+    def get_stats(self):
+        return { label: (calls, ns)
+                 for label, (calls, ns) in self.counters.items() }
+
+    # None => None
+    def reset(self):
+        for counter in self.counters.values():
+            counter[0] = 0
+            counter[1] = 0
+
+    # None => None
+    def stop(self):
+        self.running = False
+        if self.profile:
+            self.profile.disable()
+        elif self.mode == 'tracemalloc' and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # The tracemalloc report needs the tracing that stop() ends, so this has
+    # to be called before stop()
+    #
+    # file => None
+    def dump(self, out = sys.stderr):
+        print('{:<32} {:>10} {:>12} {:>10}'.format('Operation',
+                                                   'Calls',
+                                                   'Total (ms)',
+                                                   'Mean (us)'),
+              file = out)
+        for label, (calls, ns) in sorted(self.counters.items()):
+            if calls:
+                print('{:<32} {:>10} {:>12.3f} {:>10.2f}'.format(
+                    label, calls, ns / 1e6, ns / calls / 1e3),
+                      file = out)
+
+        if self.profile:
+            # The stats cannot be collected while the profiler is running
+            self.profile.disable()
+            text = io.StringIO()
+            pstats.Stats(self.profile, stream = text)\
+                  .sort_stats('cumulative')\
+                  .print_stats(25)
+            print(text.getvalue(), file = out)
+            if self.running:
+                self.profile.enable()
+        elif self.mode == 'tracemalloc' and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            print(file = out)
+            print('Memory: {} KiB, peak {} KiB'.format(current // 1024,
+                                                      peak // 1024),
+                  file = out)
+            snapshot = tracemalloc.take_snapshot()
+            for stat in snapshot.statistics('lineno')[:20]:
+                print('  {}'.format(stat), file = out)
+        out.flush()
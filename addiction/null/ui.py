@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from ..game_ui import GameUI
+
+
+# A UI that displays nothing. This is used to play games programmatically,
+# for instance in batch jobs on machines without a display. The game is
+# driven by calling the do_* functions of the game directly.
+#
+# The result of the last game is kept because the game itself resets the
+# move and shuffle counts when it ends
+class GameNull(GameUI):
+    # Game
+    def __init__(self, game):
+        super().__init__(game)
+
+        self.moves = 0
+        self.shuffles = 0
+        self.result = None
+
+    # None => None
+    def main(self):
+        pass
+
+    # None => None
+    def quit(self):
+        pass
+
+    # * => None
+    def action_key_press(self, *args):
+        pass
+
+    # * => None
+    def action_button_press(self, *args):
+        pass
+
+    # * => None
+    def action_new(self, *args):
+        self.game.do_game_new()
+
+    # * => None
+    def action_quit(self, *args):
+        self.game.do_quit()
+
+    # Point, Card => None
+    def report_cell_card_changed(self, addr, card):
+        pass
+
+    # Point, IntFlag => None
+    def report_cell_flags_changed(self, addr, flags):
+        pass
+
+    # { Point: (Card, IntFlag) } => None
+    def report_cells_changed(self, cells):
+        pass
+
+    # bool => None
+    def report_selection_changed(self, selected):
+        pass
+
+    # int => None
+    def report_undo_changed(self, undos):
+        pass
+
+    # int => None
+    def report_shuffles_changed(self, shuffles):
+        self.shuffles = shuffles
+
+    # int => None
+    def report_moves_changed(self, moves):
+        self.moves = moves
+
+    # int => None
+    def report_correct_changed(self, correct):
+        pass
+
+    # int => None
+    def report_movable_changed(self, movable):
+        pass
+
+    # bool => None
+    def report_game_over(self, win):
+        self.result = win
+
+    # None => None
+    def report_game_new(self):
+        self.moves = 0
+        self.shuffles = 0
+        self.result = None
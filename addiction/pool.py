@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+import os
+import random
+import struct
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from .board import BoardState
+from .deal import decode_bytes, encode_bytes
+from .settings import data_dir
+
+# Classifying a deal takes a fraction of a second, which is too long to do
+# when a game is started, so deals are classified in bulk ahead of time and
+# stored in a pool. A new game of a given difficulty is then drawn from the
+# pool.
+#
+# A deal is classified by trying to solve it without shuffling and by
+# playing it a number of times with the greedy policy and the usual three
+# shuffles. The estimated win probability decides its difficulty, except
+# that a deal that the solver shows can be won without shuffling is never
+# hard.
+#
+# The solver result is best effort. Most deals reach far more positions
+# than the solver is allowed to search (see solver.py), so for most deals
+# it is unknown whether they can be won without shuffling, and how quickly.
+#
+# The pool file has a header, a table with the offset and the number of
+# deals for every level of difficulty, and then the deals of each level, one
+# after another. Every deal takes the same space, so any deal of a level can
+# be read without reading the others. The deals are:
+#
+#   deal     29 bytes  The deal (see deal.py)
+#   flags    1 byte    Solvable, Unsolvable and Minimal
+#   win      2 bytes   The estimated win probability times 65535
+#   moves    2 bytes   The number of moves in the shortest win that was found
+#                      without shuffling, or 65535 if none was found
+
+# A deal with the estimated win probability and its classification.
+# solvable is True if the deal can be won without shuffling, False if it
+# cannot and None if the solver gave up, which is the case for most deals.
+# moves is None if no win without shuffling was found. minimal is True if
+# moves is the least number of moves that the deal can be won in
+DealInfo = namedtuple('DealInfo',
+                      ['layout', 'level', 'solvable', 'minimal', 'win',
+                       'moves'])
+
+# The levels of difficulty with the least estimated win probability for
+# each, easiest first
+Levels = [('easy', 0.1), ('medium', 0.02), ('hard', 0.0)]
+
+Solvable = 0x1
+Unsolvable = 0x2
+Minimal = 0x4
+
+# The least number of playouts for a pool. With fewer, a deal whose win
+# probability is just enough to make it medium is expected to win none of
+# its playouts and would be classified as hard
+MinPlayouts = math.ceil(1 / Levels[-2][1])
+
+# magic, version, size of a deal, number of levels
+_Header = struct.Struct('<4sHHI')
+_Magic = b'ASDP'
+_Version = 1
+# offset, number of deals
+_Level = struct.Struct('<QI')
+# deal, flags, win, moves
+_Deal = struct.Struct('<29sBHH')
+
+_NoMoves = 0xffff
+
+
+# float => int
+def get_level(win):
+    for level, (_, least) in enumerate(Levels):
+        if win >= least:
+            return level
+    return len(Levels) - 1
+
+
+# str => int
+def find_level(name):
+    for level, (other, _) in enumerate(Levels):
+        if other == name:
+            return level
+    raise RuntimeError('Unknown difficulty: {}'.format(name))
+
+
+# Classifies the deal dealt from the seed. The playouts use their own seeds
+# so that the result does not depend on how the seeds are split between
+# processes
+#
+# int, int, int => (int, bytes)
+def classify(seed, playouts, max_nodes):
+    from .simulate import play_state
+    from .solver import solve
+
+    state = BoardState()
+    state.shuffle(random.Random(seed))
+
+    solution = solve(state, True, max_nodes)
+    flags = 0
+    moves = _NoMoves
+    if solution.solvable:
+        flags = flags | Solvable
+        moves = min(len(solution.moves), _NoMoves - 1)
+    elif solution.solvable is False:
+        flags = flags | Unsolvable
+    if solution.minimal:
+        flags = flags | Minimal
+
+    wins = 0
+    for i in range(0, playouts):
+        win, _, _ = play_state(state.copy(),
+                               random.Random((seed << 16) | i),
+                               'greedy',
+                               3,
+                               1000)
+        wins = wins + int(win)
+    win = wins / playouts if playouts else 0.0
+    level = get_level(win)
+    if solution.solvable:
+        level = min(level, len(Levels) - 2)
+    return (level,
+            _Deal.pack(encode_bytes(state.layout),
+                       flags,
+                       round(win * 0xffff),
+                       moves))
+
+
+# Classifies the deals dealt from the seeds in [first, first + count). This
+# is what each worker process runs.
+#
+# int, int, int, int => [(int, bytes)]
+def classify_range(first, count, playouts, max_nodes):
+    return [classify(seed, playouts, max_nodes)
+            for seed in range(first, first + count)]
+
+
+# Classifies the deals dealt from the seeds in [seed, seed + deals) across a
+# pool of processes and writes them to a pool file. The number of deals of
+# each level is returned
+#
+# str, int, int, int, int, int, int, file => [int]
+def build(filename, deals, seed = 0, jobs = None, playouts = 64,
+          max_nodes = 20000, chunk = 100, out = sys.stdout):
+    if playouts < MinPlayouts:
+        raise RuntimeError('At least {} playouts are needed'.format(
+            MinPlayouts))
+    levels = [bytearray() for _ in Levels]
+    done = 0
+    last = time.monotonic()
+    with ProcessPoolExecutor(max_workers = jobs) as executor:
+        firsts = range(seed, seed + deals, chunk)
+        results = executor.map(classify_range,
+                               firsts,
+                               [min(chunk, seed + deals - first)
+                                for first in firsts],
+                               repeat(playouts),
+                               repeat(max_nodes))
+        for result in results:
+            for level, record in result:
+                levels[level].extend(record)
+            done = done + len(result)
+            if out and time.monotonic() - last > 1:
+                print('  {} of {} deals'.format(done, deals), file = out)
+                last = time.monotonic()
+
+    offset = _Header.size + _Level.size * len(Levels)
+    table = []
+    for records in levels:
+        table.append(_Level.pack(offset, len(records) // _Deal.size))
+        offset = offset + len(records)
+
+    # The pool is written to a temporary file first so that a game that is
+    # running never sees a partial pool
+    tmp = '{}.{}'.format(filename, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(_Header.pack(_Magic, _Version, _Deal.size, len(Levels)))
+            for entry in table:
+                f.write(entry)
+            for records in levels:
+                f.write(records)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return [len(records) // _Deal.size for records in levels]
+
+
+class DealPool:
+    dirname = data_dir()
+    filename = data_dir('deals.pool')
+
+    # Only the table of levels is read. The deals are read when they are
+    # drawn
+    #
+    # str
+    def __init__(self, filename = None):
+        self.filename = filename or DealPool.filename
+        self.fd = os.open(self.filename, os.O_RDONLY)
+        try:
+            header = os.pread(self.fd, _Header.size, 0)
+            magic, version, size, count = _Header.unpack(header)
+            if magic != _Magic or version != _Version \
+               or size != _Deal.size or count != len(Levels):
+                raise RuntimeError()
+            table = os.pread(self.fd, _Level.size * count, _Header.size)
+            # Level => (offset, count)
+            self.levels = [_Level.unpack_from(table, i * _Level.size)
+                           for i in range(0, count)]
+        except (RuntimeError, struct.error):
+            os.close(self.fd)
+            raise RuntimeError('Not a deal pool: {}'.format(self.filename))
+
+    # The default pool if it has been built
+    #
+    # None => DealPool
+    @staticmethod
+    def open_default():
+        if os.path.exists(DealPool.filename):
+            return DealPool()
+        return None
+
+    # The number of deals of the given level
+    #
+    # int => int
+    def count(self, level):
+        return self.levels[level][1]
+
+    # int, int => DealInfo
+    def get(self, level, n):
+        offset, count = self.levels[level]
+        if not 0 <= n < count:
+            raise RuntimeError('No deal {} of level {}'.format(n, level))
+        deal, flags, win, moves = _Deal.unpack(
+            os.pread(self.fd, _Deal.size, offset + n * _Deal.size))
+        solvable = None
+        if flags & Solvable:
+            solvable = True
+        elif flags & Unsolvable:
+            solvable = False
+        return DealInfo(decode_bytes(deal),
+                        Levels[level][0],
+                        solvable,
+                        bool(flags & Minimal),
+                        win / 0xffff,
+                        moves if moves != _NoMoves else None)
+
+    # A random deal of the named level. None is returned if there are no
+    # deals of that level
+    #
+    # str, random.Random => DealInfo
+    def draw(self, name, rng):
+        level = find_level(name)
+        if not self.count(level):
+            return None
+        return self.get(level, rng.randrange(self.count(level)))
+
+    # None => None
+    def close(self):
+        os.close(self.fd)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+from .deal import Bytes, decode_bytes, encode, encode_bytes
+from .types import Point
+
+# A replay log is a header followed by the records of any number of games.
+# Records are appended as the games are played. The first byte of a record
+# says what it is:
+#
+#   0-51     A move of the card in that slot. Where it goes follows from the
+#            rules, so it is not recorded
+#   New      A new game. Followed by the deal as 29 bytes (see deal.py)
+#   Shuffle  Followed by the layout after the shuffle as 29 bytes
+#   Undo     The last move or shuffle was undone
+#   Time     Followed by the game clock in seconds as 2 bytes. This is
+#            written before a record whenever the clock has moved on
+#   End      The end of a game. Followed by one byte: Lost, Won or Abandoned
+#
+# A move takes one byte, so a whole game usually takes a few hundred bytes
+# at most.
+
+Magic = b'ASRL\x01'
+
+# Moves are written as the slot itself and are read back as (Move, slot)
+Move = 0
+New = 0x40
+Shuffle = 0x41
+Undo = 0x42
+Time = 0x43
+End = 0x44
+
+Lost = 0
+Won = 1
+Abandoned = 2
+
+# Size of the data after the first byte of each record
+Sizes = { New: Bytes, Shuffle: Bytes, Undo: 0, Time: 2, End: 1 }
+
+_Results = { False: Lost, True: Won, None: Abandoned }
+
+
+# Records the games played by a Game. Set Game.recorder to it to start
+# recording.
+class ReplayWriter:
+    # Game, file
+    def __init__(self, game, f):
+        self.game = game
+        self.file = f
+        self.ticks = 0
+        if f.tell() == 0:
+            f.write(Magic)
+
+    # str => ReplayWriter
+    @staticmethod
+    def open(game, filename):
+        if os.path.exists(filename) and os.path.getsize(filename):
+            with open(filename, 'rb') as f:
+                if f.read(len(Magic)) != Magic:
+                    raise RuntimeError(
+                        'Not a replay log: {}'.format(filename))
+        return ReplayWriter(game, open(filename, 'ab'))
+
+    # The clock is only recorded when it has changed since the last record
+    #
+    # bytes => None
+    def write(self, record):
+        ticks = min(self.game.ticks, 0xffff)
+        if ticks != self.ticks:
+            self.ticks = ticks
+            self.file.write(bytes([Time]) + ticks.to_bytes(2, 'big'))
+        self.file.write(record)
+
+    # bytes => None
+    def new(self, layout):
+        self.ticks = 0
+        self.file.write(bytes([New]) + encode_bytes(layout))
+
+    # int => None
+    def move(self, src):
+        self.write(bytes([src]))
+
+    # bytes => None
+    def shuffle(self, layout):
+        self.write(bytes([Shuffle]) + encode_bytes(layout))
+
+    # None => None
+    def undo(self):
+        self.write(bytes([Undo]))
+
+    # The result is None if the game was abandoned
+    #
+    # bool => None
+    def end(self, win):
+        self.write(bytes([End, _Results[win]]))
+
+    # None => None
+    def flush(self):
+        self.file.flush()
+
+    # None => None
+    def close(self):
+        self.file.close()
+
+
+# Reads the records from a replay log without loading all of it. Each record
+# is a tuple of the record type and its argument: (New, layout),
+# (Move, slot), (Shuffle, layout), (Undo, None), (Time, seconds) or
+# (End, result).
+#
+# file, int => generator
+def read(f, chunk = 1 << 16):
+    if f.read(len(Magic)) != Magic:
+        raise RuntimeError('Not a replay log')
+
+    buf = b''
+    pos = 0
+
+    # int => bool
+    def fill(n):
+        nonlocal buf, pos
+        if len(buf) - pos < n:
+            buf = buf[pos:] + f.read(max(chunk, n))
+            pos = 0
+        return len(buf) - pos >= n
+
+    while fill(1):
+        tag = buf[pos]
+        if tag < New:
+            pos = pos + 1
+            yield (Move, tag)
+            continue
+
+        size = Sizes.get(tag)
+        if size is None:
+            raise RuntimeError('Bad record in replay log: {}'.format(tag))
+        if not fill(1 + size):
+            raise RuntimeError('Replay log is truncated')
+        data = buf[pos + 1:pos + 1 + size]
+        pos = pos + 1 + size
+        if tag in [New, Shuffle]:
+            yield (tag, decode_bytes(data))
+        elif tag == Time:
+            yield (tag, int.from_bytes(data, 'big'))
+        elif tag == End:
+            yield (tag, data[0])
+        else:
+            yield (tag, None)
+
+
+# Plays every game in a replay log again on the given game, which should
+# have a headless UI such as GameNull. The game is yielded at the end of
+# every game, with the recorded result, before the next one is started.
+#
+# Game, file => generator
+def replay(game, f):
+    return play(game, read(f))
+
+
+# Plays the records as returned by read() on the given game
+#
+# Game, iterable => generator
+def play(game, records):
+    for tag, arg in records:
+        if tag == Move:
+            if arg not in game.movable:
+                raise RuntimeError(
+                    'Card in slot {} cannot be moved'.format(arg))
+            game.do_move_card(Point.from_id(arg))
+        elif tag == New:
+            game.do_game_new(deal = encode(arg))
+        elif tag == Shuffle:
+            # The shuffle was allowed when it was recorded. It is not
+            # checked against the shuffle limit of this game, which need not
+            # be the same
+            if not game.is_started():
+                raise RuntimeError('Shuffle when no game is being played')
+            with game.batch():
+                game.shuffle(arg)
+                game.shuffles_incr()
+        elif tag == Undo:
+            game.do_undo()
+        elif tag == End:
+            yield (game, arg)
+
@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import json
+import os
+import random
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .board import Empty, Slots
+from .game import Game
+from .game_ui import GameUI
+from .hint import HintEngine
+from .settings import Settings
+from .snapshot import restore, save
+from .types import Point
+
+# Hosts any number of games in a single process. Every game is a session
+# with an ID and is played by sending commands to the server. The server
+# runs on a single asyncio event loop and the games need no threads of their
+# own: the game clock is only read when it is needed and hints are searched
+# in a single worker thread. If the server is given an eviction time,
+# a session that has not been used for that long is saved to a snapshot in a
+# spool directory and its game is dropped. It is restored from the snapshot
+# when it is used again, which is quick enough to go unnoticed (see
+# snapshot.py).
+#
+# The protocol is line delimited JSON over TCP or a Unix socket. Every
+# request is an object with an "op" and usually a "session". It may have an
+# "id", which is copied to the response. A response has "ok" set to true, or
+# "error" set to a message. Requests:
+#
+#   new      Starts a session. "seed", "deal" and "difficulty" are optional.
+#            The response has the "session" and the whole "state"
+#   attach   Sends the changes to a session made by other connections to
+#            this one as well. The response has the whole "state"
+#   state    The response has the whole "state"
+#   move     Moves the card in "slot"
+#   select   Selects the card in "slot"
+#   undo     Undoes the last move or shuffle
+#   shuffle  Shuffles the cards
+#   deal     Starts a new game in the session. "seed", "deal" and
+#            "difficulty" are optional
+#   hint     Selects the card that the hint engine suggests moving
+#   close    Ends the session
+#
+# The response to a command that changes the game has a "diff" with what
+# changed. It is also pushed to the other connections that are attached to
+# the session as { "session": ..., "diff": ... }. A diff has any of:
+#
+#   cells     { slot: [card, flags] } for the cells that changed. The card is
+#             the card id (see board.py) or null for an empty cell
+#   selected  The selected slot or null
+#   moves, shuffles, undo, correct, movable
+#             The counts shown in the status bar
+#   hint      The slot of the card that was suggested, or null
+#   over      true if the game was won and false if it was lost
+#   deal      The deal of the new game, if a new game was started
+
+
+# Collects what the game reports until the server sends it. Only the slots
+# that changed are kept; their cards and flags are read from the game when
+# the diff is sent, so a cell that changes several times is sent once
+class ServerUI(GameUI):
+    # Game
+    def __init__(self, game):
+        super().__init__(game)
+        self.slots = set()
+        self.diff = dict()
+
+    # The changes since the last call
+    #
+    # None => dict
+    def take(self):
+        diff = self.diff
+        if self.slots:
+            state = self.game.state
+            flags = self.game.flags
+            cells = dict()
+            for slot in sorted(self.slots):
+                card = state.card(slot)
+                cells[slot] = [card if card != Empty else None, flags[slot]]
+            diff['cells'] = cells
+            self.slots = set()
+        if 'selected' in diff:
+            selected = self.game.selected
+            diff['selected'] = selected.id if selected else None
+        self.diff = dict()
+        return diff
+
+    # * => None
+    def main(self):
+        pass
+
+    # * => None
+    def quit(self):
+        pass
+
+    # * => None
+    def action_key_press(self, *args):
+        pass
+
+    # * => None
+    def action_button_press(self, *args):
+        pass
+
+    # * => None
+    def action_new(self, *args):
+        self.game.do_game_new()
+
+    # * => None
+    def action_quit(self, *args):
+        pass
+
+    # Point, Card => None
+    def report_cell_card_changed(self, addr, card):
+        self.slots.add(addr.id)
+
+    # Point, IntFlag => None
+    def report_cell_flags_changed(self, addr, flags):
+        self.slots.add(addr.id)
+
+    # { Point: (Card, IntFlag) } => None
+    def report_cells_changed(self, cells):
+        self.slots.update(addr.id for addr in cells)
+
+    # bool => None
+    def report_selection_changed(self, selected):
+        self.diff['selected'] = None
+
+    # int => None
+    def report_undo_changed(self, undos):
+        self.diff['undo'] = undos
+
+    # int => None
+    def report_shuffles_changed(self, shuffles):
+        self.diff['shuffles'] = shuffles
+
+    # int => None
+    def report_moves_changed(self, moves):
+        self.diff['moves'] = moves
+
+    # int => None
+    def report_correct_changed(self, correct):
+        self.diff['correct'] = correct
+
+    # int => None
+    def report_movable_changed(self, movable):
+        self.diff['movable'] = movable
+
+    # Point => None
+    def report_hint(self, addr):
+        self.diff['hint'] = addr.id if addr else None
+
+    # bool => None
+    def report_game_over(self, win):
+        self.diff['over'] = win
+
+    # None => None
+    def report_game_new(self):
+        self.diff['deal'] = self.game.deal
+
+
+class Session:
+    __slots__ = ('id', 'game', 'watchers', 'used', 'seeded')
+
+    # str, Game
+    def __init__(self, sid, game):
+        self.id = sid
+        # This is None while the session is evicted
+        self.game = game
+        # Connections that are sent the changes to the game
+        self.watchers = set()
+        self.used = time.monotonic()
+        # True if the game has its own random number generator. Its state is
+        # saved with the game when the session is evicted
+        self.seeded = False
+
+    # The whole state of the game
+    #
+    # None => dict
+    def get_state(self):
+        game = self.game
+        state = game.state
+        cells = []
+        for slot in range(0, Slots):
+            card = state.card(slot)
+            cells.append([card if card != Empty else None, game.flags[slot]])
+        return { 'cells': cells,
+                 'selected': game.selected.id if game.selected else None,
+                 'moves': game.moves,
+                 'shuffles': game.shuffles,
+                 'undo': len(game.undo),
+                 'correct': sum(game.correct),
+                 'movable': len(game.movable),
+                 'started': game.is_started(),
+                 'elapsed': game.get_elapsed(),
+                 'deal': game.deal }
+
+
+class GameServer:
+    # Seconds that a session may be idle for before it is closed
+    timeout = 3600
+    # Seconds that a session may be idle for before it is evicted. The
+    # sessions are never evicted if this is None
+    evict = None
+
+    # Settings that every game is created with are passed as keyword
+    # arguments. The games share them and do not read the settings file of
+    # the user that runs the server, so every game has the defaults unless
+    # they are overridden here. The evicted sessions are saved in the spool directory. A
+    # temporary directory is used if none is given
+    #
+    # int, int, int, str, *
+    def __init__(self, max_sessions = 10000, timeout = None, evict = None,
+                 spool = None, **settings):
+        self.max_sessions = max_sessions
+        if timeout is not None:
+            self.timeout = timeout
+        if evict is not None:
+            self.evict = evict
+        self.spool = spool
+        self.own_spool = False
+        if spool:
+            os.makedirs(spool, exist_ok = True)
+        self.settings = Settings(None, False, **settings)
+        # str => Session
+        self.sessions = dict()
+        # Games are dealt from a shared generator. A game that is started
+        # with a seed gets its own
+        self.rng = random.Random()
+        # The hint engine is shared as well. Its caches are keyed by the
+        # board, so the sessions can use each other's results. The engine is
+        # not thread safe, so the searches are run one at a time in a single
+        # thread of their own
+        self.hints = HintEngine()
+        self.searcher = None
+        self.pool = None
+        self.servers = []
+        self.reaper = None
+        self.ops = { 'new': self.op_new,
+                     'attach': self.op_attach,
+                     'state': self.op_state,
+                     'move': self.op_move,
+                     'select': self.op_select,
+                     'undo': self.op_undo,
+                     'shuffle': self.op_shuffle,
+                     'deal': self.op_deal,
+                     'hint': self.op_hint,
+                     'close': self.op_close }
+
+    # Handles a request and returns the response. conn is the connection
+    # that the request came from. It is None for the in-process client
+    #
+    # dict, Connection => dict
+    async def handle(self, request, conn = None):
+        response = dict()
+        if 'id' in request:
+            response['id'] = request['id']
+        op = self.ops.get(request.get('op'))
+        try:
+            if not op:
+                raise RuntimeError('Unknown op: {}'.format(request.get('op')))
+            result = op(request, conn)
+            if asyncio.iscoroutine(result):
+                result = await result
+            response['ok'] = True
+            response.update(result)
+        except (RuntimeError, KeyError, TypeError, ValueError) as err:
+            response['error'] = str(err)
+        return response
+
+    # An evicted session is restored before it is returned
+    #
+    # dict => Session
+    def get_session(self, request):
+        session = self.sessions.get(request.get('session'))
+        if not session:
+            raise RuntimeError('No such session: {}'.format(
+                request.get('session')))
+        session.used = time.monotonic()
+        if session.game is None:
+            self.page_in(session)
+        return session
+
+    # None => Game
+    def create_game(self):
+        game = Game(ServerUI, False, settings = self.settings)
+        game.rng = self.rng
+        game.hints = self.hints
+        game.pool = self.pool
+        return game
+
+    # Session => str
+    def get_spool_path(self, session):
+        if not self.spool:
+            self.spool = tempfile.mkdtemp(prefix = 'addiction-')
+            self.own_spool = True
+        return os.path.join(self.spool, session.id)
+
+    # Saves the game of a session to the spool and drops it. The time that
+    # the session is evicted for is not counted as time played. The game is
+    # kept if it cannot be saved
+    #
+    # Session => None
+    def page_out(self, session):
+        try:
+            with open(self.get_spool_path(session), 'wb') as f:
+                f.write(save(session.game, session.seeded))
+        except OSError as err:
+            print('Cannot evict session {}: {}'.format(session.id, err),
+                  file = sys.stderr)
+            return
+        session.game = None
+
+    # Session => None
+    def page_in(self, session):
+        path = self.get_spool_path(session)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as err:
+            for watcher in session.watchers:
+                watcher.sessions.discard(session.id)
+            del self.sessions[session.id]
+            raise RuntimeError('Session {} was lost: {}'.format(session.id,
+                                                                err))
+        game = self.create_game()
+        if session.seeded:
+            game.rng = random.Random()
+        restore(game, data, False)
+        os.remove(path)
+        session.game = game
+
+    # dict => int
+    @staticmethod
+    def get_slot(request):
+        slot = request['slot']
+        if not isinstance(slot, int) or not 0 <= slot < Slots:
+            raise RuntimeError('Invalid slot: {}'.format(slot))
+        return slot
+
+    # Sends the changes to the game to the other connections watching it and
+    # returns them
+    #
+    # Session, Connection => dict
+    def publish(self, session, conn):
+        diff = session.game.ui.take()
+        if diff:
+            for watcher in session.watchers:
+                if watcher is not conn:
+                    watcher.send({ 'session': session.id, 'diff': diff })
+        return { 'diff': diff }
+
+    # Session, dict => None
+    def deal(self, session, request):
+        game = session.game
+        if request.get('seed') is not None:
+            game.rng = random.Random(request['seed'])
+        elif game.rng is not self.rng:
+            game.rng = self.rng
+        session.seeded = game.rng is not self.rng
+        game.do_game_new(deal = request.get('deal'),
+                         difficulty = request.get('difficulty'))
+
+    # dict, Connection => dict
+    def op_new(self, request, conn):
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError('Too many sessions')
+        game = self.create_game()
+        session = Session(secrets.token_hex(8), game)
+        self.deal(session, request)
+        game.ui.take()
+        self.sessions[session.id] = session
+        if conn:
+            session.watchers.add(conn)
+            conn.sessions.add(session.id)
+        return { 'session': session.id, 'state': session.get_state() }
+
+    # dict, Connection => dict
+    def op_attach(self, request, conn):
+        session = self.get_session(request)
+        if conn:
+            session.watchers.add(conn)
+            conn.sessions.add(session.id)
+        return { 'state': session.get_state() }
+
+    # dict, Connection => dict
+    def op_state(self, request, conn):
+        return { 'state': self.get_session(request).get_state() }
+
+    # dict, Connection => dict
+    def op_move(self, request, conn):
+        session = self.get_session(request)
+        slot = self.get_slot(request)
+        game = session.game
+        if not game.is_started() or slot not in game.movable:
+            raise RuntimeError('Card in slot {} cannot be moved'.format(slot))
+        game.do_move_card(Point.grid[slot])
+        return self.publish(session, conn)
+
+    # dict, Connection => dict
+    def op_select(self, request, conn):
+        session = self.get_session(request)
+        slot = self.get_slot(request)
+        game = session.game
+        if not game.is_started() or slot not in game.movable:
+            raise RuntimeError('Card in slot {} cannot be moved'.format(slot))
+        game.do_select(Point.grid[slot])
+        return self.publish(session, conn)
+
+    # dict, Connection => dict
+    def op_undo(self, request, conn):
+        session = self.get_session(request)
+        session.game.do_undo()
+        return self.publish(session, conn)
+
+    # dict, Connection => dict
+    def op_shuffle(self, request, conn):
+        session = self.get_session(request)
+        session.game.do_shuffle()
+        return self.publish(session, conn)
+
+    # dict, Connection => dict
+    def op_deal(self, request, conn):
+        session = self.get_session(request)
+        self.deal(session, request)
+        return self.publish(session, conn)
+
+    # The search is run in the search thread so that it does not hold up the
+    # other sessions. The hint is only shown if the board has not changed
+    # while it was being searched
+    #
+    # dict, Connection => dict
+    async def op_hint(self, request, conn):
+        session = self.get_session(request)
+        game = session.game
+        if not game.is_started():
+            raise RuntimeError('The game is over')
+        ranked = game.hints.lookup(game.state)
+        if ranked is None:
+            key = game.state.key()
+            if not self.searcher:
+                self.searcher = ThreadPoolExecutor(1)
+            ranked = await asyncio.get_running_loop().run_in_executor(
+                self.searcher, game.hints.rank, game.state.copy())
+            if self.sessions.get(session.id) is not session \
+               or session.game is not game or game.state.key() != key:
+                raise RuntimeError('The board changed')
+        game.show_hint(ranked)
+        return self.publish(session, conn)
+
+    # dict, Connection => dict
+    def op_close(self, request, conn):
+        session = self.get_session(request)
+        self.close_session(session)
+        return dict()
+
+    # Session => None
+    def close_session(self, session):
+        if session.game is None:
+            path = self.get_spool_path(session)
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            session.game.do_quit()
+        for watcher in session.watchers:
+            watcher.sessions.discard(session.id)
+        del self.sessions[session.id]
+
+    # Evicts the sessions that have not been used for a while, if eviction
+    # is turned on, and closes the ones that have not been used for much
+    # longer
+    #
+    # None => None
+    async def reap(self):
+        while True:
+            if self.evict is None:
+                await asyncio.sleep(min(self.timeout, 60))
+            else:
+                await asyncio.sleep(min(self.timeout, self.evict, 60))
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if now - session.used > self.timeout:
+                    self.close_session(session)
+                elif self.evict is not None and session.game \
+                     and now - session.used > self.evict:
+                    self.page_out(session)
+
+    # asyncio.StreamReader, asyncio.StreamWriter => None
+    async def on_connect(self, reader, writer):
+        conn = Connection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('Request must be an object')
+                except ValueError as err:
+                    conn.send({ 'error': 'Bad request: {}'.format(err) })
+                    continue
+                conn.send(await self.handle(request, conn))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for sid in conn.sessions:
+                session = self.sessions.get(sid)
+                if session:
+                    session.watchers.discard(conn)
+            writer.close()
+
+    # Listens on a TCP port, or on a Unix socket if a path is given
+    #
+    # str, int, str => None
+    async def start(self, host = 'localhost', port = 7714, path = None):
+        if path:
+            server = await asyncio.start_unix_server(self.on_connect, path)
+        else:
+            server = await asyncio.start_server(self.on_connect, host, port)
+        self.servers.append(server)
+        if not self.reaper:
+            self.reaper = asyncio.get_running_loop().create_task(self.reap())
+        return server
+
+    # None => None
+    async def stop(self):
+        if self.reaper:
+            self.reaper.cancel()
+            self.reaper = None
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.searcher:
+            self.searcher.shutdown(wait = False)
+            self.searcher = None
+        if self.own_spool:
+            shutil.rmtree(self.spool, ignore_errors = True)
+            self.spool = None
+            self.own_spool = False
+
+
+class Connection:
+    __slots__ = ('writer', 'sessions')
+
+    # asyncio.StreamWriter
+    def __init__(self, writer):
+        self.writer = writer
+        # IDs of the sessions that this connection is watching
+        self.sessions = set()
+
+    # dict => None
+    def send(self, message):
+        self.writer.write(json.dumps(message, separators = (',', ':'))
+                          .encode() + b'\n')
+
+
+# Talks to a server in the same process without a socket. This is used to
+# test the server and to measure it. Nothing is pushed to it.
+class LocalClient:
+    # GameServer
+    def __init__(self, server):
+        self.server = server
+
+    # The response is returned as it would have been decoded from the wire
+    #
+    # str, * => dict
+    async def request(self, op, **args):
+        args['op'] = op
+        return json.loads(json.dumps(await self.server.handle(args)))
+
+
+# Talks to a server over a socket. The changes pushed by the server for the
+# sessions that the client is attached to are put in a queue
+class Client:
+    # None
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.pushed = asyncio.Queue()
+        self.waiting = dict()
+        self.next_id = 0
+        self.task = None
+
+    # Connects over TCP, or to a Unix socket if a path is given
+    #
+    # str, int, str => None
+    async def connect(self, host = 'localhost', port = 7714, path = None):
+        if path:
+            self.reader, self.writer = \
+                await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = \
+                await asyncio.open_connection(host, port)
+        self.task = asyncio.get_running_loop().create_task(self.receive())
+
+    # None => None
+    async def receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            future = self.waiting.pop(message.get('id'), None)
+            if future:
+                future.set_result(message)
+            else:
+                await self.pushed.put(message)
+
+    # str, * => dict
+    async def request(self, op, **args):
+        self.next_id = self.next_id + 1
+        args['op'] = op
+        args['id'] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_id] = future
+        self.writer.write(json.dumps(args, separators = (',', ':')).encode()
+                          + b'\n')
+        return await future
+
+    # None => None
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        if self.task:
+            self.task.cancel()
+
+
+# Runs the server until it is interrupted
+#
+# str, int, str, int, DealPool, int, str => None
+def serve(host, port, path = None, max_sessions = 10000, pool = None,
+          evict = None, spool = None):
+    server = GameServer(max_sessions, evict = evict, spool = spool)
+    server.pool = pool
+
+    # None => None
+    async def run():
+        await server.start(host, port, path)
+        print('Listening on {}'.format(path or '{}:{}'.format(host, port)),
+              file = sys.stderr)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
@@ -24,6 +24,40 @@ import sys
 from .types import Color
 
 
+# FIXME: Make this more platform independent
+#
+# str, [str], str => str
+def _user_dir(variable, default, name):
+    dirname = os.path.join(os.environ.get(variable)
+                           or os.path.join(os.path.expanduser('~'), *default),
+                           'addiction-solitaire')
+    return os.path.join(dirname, name) if name else dirname
+
+
+# The directory that the settings are kept in. If a name is given, it is the
+# path of that file in it
+#
+# str => str
+def config_dir(name = None):
+    return _user_dir('XDG_CONFIG_HOME', ['.config'], name)
+
+
+# The directory that the game's data, such as the statistics and the deal
+# pool, is kept in. If a name is given, it is the path of that file in it
+#
+# str => str
+def data_dir(name = None):
+    return _user_dir('XDG_DATA_HOME', ['.local', 'share'], name)
+
+
+# The directory for files that can always be made again, such as the card
+# images. If a name is given, it is the path of that file in it
+#
+# str => str
+def cache_dir(name = None):
+    return _user_dir('XDG_CACHE_HOME', ['.cache'], name)
+
+
 class SettingsEncoder(json.JSONEncoder):
     #
     def __init__(self, *args, **kwargs):
@@ -53,11 +87,8 @@ class SettingsDecoder(json.JSONDecoder):
 
 
 class Settings:
-    # FIXME: Make this more platform independent
-    dirname = os.path.join(os.path.expanduser('~'),
-                           '.config',
-                           'addiction-solitaire')
-    filename = os.path.join(dirname, 'settings.json')
+    dirname = config_dir()
+    filename = config_dir('settings.json')
 
     # Private constants
     _Unlimited = -1
@@ -70,6 +101,9 @@ class Settings:
     def_shuffles = 3
     def_highlight_movable = True
     def_highlight_correct = True
+    # A deal of this difficulty is drawn from the deal pool for every new
+    # game. If it is None, the cards are dealt at random
+    def_difficulty = None
 
     # Constants.
     # These will not be saved to the settings file 
@@ -80,9 +114,13 @@ class Settings:
     card_space = 2
     board_border = 4
     
-    # Game,
-    def __init__(self, game, **overrides):
+    # If saved is false, the settings file is not read and only the defaults
+    # and the overrides are used
+    #
+    # Game, bool, *
+    def __init__(self, game, saved = True, **overrides):
         self.game = game
+        self.saved = saved
         self.values = dict()
         self.overrides = dict(**overrides)
         self.read()
@@ -90,7 +128,7 @@ class Settings:
     # None => None
     def read(self):
         try:
-            if os.path.exists(Settings.filename):
+            if self.saved and os.path.exists(Settings.filename):
                 with open(Settings.filename) as f:
                     self.values = json.load(f,
                                             cls = SettingsDecoder)
@@ -109,8 +147,7 @@ class Settings:
             
     # None => None
     def write(self):
-        if not os.path.exists(Settings.dirname):
-            os.mkdir(Settings.dirname)
+        os.makedirs(Settings.dirname, exist_ok = True)
         with open(Settings.filename, 'w') as f:
             json.dump(self.values, f, cls = SettingsEncoder)
 
@@ -173,6 +210,11 @@ class Settings:
     def color_normal(self, val):
         self.values['color_normal'] = val
 
+    # None => str
+    @property
+    def difficulty(self):
+        return self.values['difficulty']
+
     # int => None
     @shuffles.setter
     def shuffles(self, val):
@@ -187,3 +229,8 @@ class Settings:
     @highlight_correct.setter
     def highlight_correct(self, val):
         self.values['highlight_correct'] = val
+
+    # str => None
+    @difficulty.setter
+    def difficulty(self, val):
+        self.values['difficulty'] = val
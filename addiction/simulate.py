@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+import sys
+import time
+from abc import ABC as AbstractBase, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .board import BoardState, slot_col, slot_row
+from .solver import solve
+
+# Plays games without a UI to estimate how often they can be won. Every game
+# is dealt from its own seed, so the results do not depend on how the games
+# are split between processes.
+
+
+# A policy decides which card to move. start() is called whenever the
+# board has been dealt or shuffled
+class Policy(AbstractBase):
+    # random.Random
+    def __init__(self, rng):
+        self.rng = rng
+
+    # BoardState => None
+    def start(self, state):
+        pass
+
+    # BoardState, [int] => int
+    @abstractmethod
+    def choose(self, state, movable):
+        pass
+
+
+# Moves any movable card
+class RandomPolicy(Policy):
+    # BoardState, [int] => int
+    def choose(self, state, movable):
+        return self.rng.choice(movable)
+
+
+# Prefers moves that extend a correct sequence, then moves that put a card
+# in the column it belongs in. Moves that break up a correct sequence are
+# avoided
+class GreedyPolicy(Policy):
+    # BoardState, int => int
+    def score(self, state, src):
+        dst = state.dest(src)
+        if slot_col(src) < state.correct_length(slot_row(src)):
+            return -1
+        if slot_col(dst) == state.correct_length(slot_row(dst)):
+            return 2
+        if slot_col(dst) == state.card(src) % 13 - 1:
+            return 1
+        return 0
+
+    # BoardState, [int] => int
+    def choose(self, state, movable):
+        best = []
+        most = -2
+        for src in movable:
+            score = self.score(state, src)
+            if score > most:
+                best = [src]
+                most = score
+            elif score == most:
+                best.append(src)
+        return self.rng.choice(best)
+
+
+# Follows the solver's moves when it can find a win before it runs out of
+# nodes and plays greedily otherwise.
+#
+# Within the node budget, the solver gives up on nearly every board that has
+# only a few correct cards, which includes almost every fresh deal. On
+# those, this policy is the same as the greedy one, but much slower. The
+# solver is therefore only tried on boards with at least min_correct correct
+# cards, which it decides about half the time. What it found for each board
+# is cached, including when it gave up, so the same board is never searched
+# twice in a process.
+class SolverPolicy(GreedyPolicy):
+    max_nodes = 20000
+    min_correct = 5
+    # Number of boards for which the solution is kept
+    capacity = 4096
+    # Board => [int], or None if the solver gave up or there is no win
+    cache = dict()
+
+    # random.Random
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.moves = []
+
+    # BoardState => None
+    def start(self, state):
+        self.moves = []
+        if state.correct_count() < self.min_correct:
+            return
+
+        cache = SolverPolicy.cache
+        key = state.key()
+        if key in cache:
+            moves = cache[key]
+        else:
+            solution = solve(state, False, self.max_nodes)
+            moves = [src for src, dst in reversed(solution.moves)] \
+                if solution.solvable else None
+            if len(cache) >= self.capacity:
+                cache.clear()
+            cache[key] = moves
+        if moves:
+            self.moves = list(moves)
+
+    # BoardState, [int] => int
+    def choose(self, state, movable):
+        if self.moves:
+            return self.moves.pop()
+        return super().choose(state, movable)
+
+
+Policies = { 'random': RandomPolicy,
+             'greedy': GreedyPolicy,
+             'solver': SolverPolicy }
+
+
+class Stats:
+    # None
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.moves = 0
+        self.shuffles = 0
+
+    # bool, int, int => None
+    def add(self, win, moves, shuffles):
+        self.games = self.games + 1
+        self.wins = self.wins + int(win)
+        self.moves = self.moves + moves
+        self.shuffles = self.shuffles + shuffles
+
+    # Stats => None
+    def merge(self, other):
+        self.games = self.games + other.games
+        self.wins = self.wins + other.wins
+        self.moves = self.moves + other.moves
+        self.shuffles = self.shuffles + other.shuffles
+
+    # None => float
+    @property
+    def win_rate(self):
+        return self.wins / self.games if self.games else 0.0
+
+    # None => str
+    def __str__(self):
+        games = max(self.games, 1)
+        return '{} games, {} wins ({:.4%}), {:.1f} moves, {:.2f} shuffles'\
+            .format(self.games,
+                    self.wins,
+                    self.win_rate,
+                    self.moves / games,
+                    self.shuffles / games)
+
+
+# Plays one game until it is won, it is lost or max_moves have been made.
+# Shuffles are only used when no card can be moved. A negative number of
+# shuffles means that they are unlimited.
+#
+# int, str, int, int => (bool, int, int)
+def play(seed, policy, shuffles, max_moves):
+    rng = random.Random(seed)
+    state = BoardState()
+    state.shuffle(rng)
+    return play_state(state, rng, policy, shuffles, max_moves)
+
+
+# Plays a game from the given board. The board is changed
+#
+# BoardState, random.Random, str, int, int => (bool, int, int)
+def play_state(state, rng, policy, shuffles, max_moves):
+    policy = Policies[policy](rng)
+    policy.start(state)
+
+    moves = 0
+    used = 0
+    while moves < max_moves:
+        if state.is_won():
+            return (True, moves, used)
+        movable = state.movable_slots()
+        if movable:
+            src = policy.choose(state, movable)
+            state.move(src, state.dest(src))
+            moves = moves + 1
+        elif shuffles < 0 or used < shuffles:
+            state.shuffle(rng)
+            used = used + 1
+            policy.start(state)
+        else:
+            break
+    return (False, moves, used)
+
+
+# Plays the games dealt from the seeds in [first, first + count). This is
+# what each worker process runs.
+#
+# int, int, str, int, int => Stats
+def play_range(first, count, policy, shuffles, max_moves):
+    stats = Stats()
+    for seed in range(first, first + count):
+        stats.add(*play(seed, policy, shuffles, max_moves))
+    return stats
+
+
+# Plays the games in chunks across a pool of processes. The running totals
+# are printed as the chunks finish.
+#
+# int, str, int, int, int, int, int, file => Stats
+def simulate(games, policy, shuffles, seed = 0, jobs = None, chunk = 1000,
+             max_moves = 1000, out = sys.stdout):
+    stats = Stats()
+    last = time.monotonic()
+    with ProcessPoolExecutor(max_workers = jobs) as executor:
+        futures = [executor.submit(play_range,
+                                   first,
+                                   min(chunk, seed + games - first),
+                                   policy,
+                                   shuffles,
+                                   max_moves)
+                   for first in range(seed, seed + games, chunk)]
+        for future in as_completed(futures):
+            stats.merge(future.result())
+            now = time.monotonic()
+            if now - last >= 1:
+                print('  {}'.format(stats), file = out, flush = True)
+                last = now
+    return stats
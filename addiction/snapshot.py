@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import struct
+from time import monotonic
+
+from .board import Empty, Slots
+from .settings import data_dir
+from .types import CellFlags, Point
+
+# A snapshot is everything needed to carry on playing a game later, as a
+# single blob of bytes. It is used to resume the game that was being played
+# when the program was closed, and by the server to move idle games out of
+# memory.
+#
+# Restoring a snapshot does not replay anything. The board, the undo history
+# and the counters are copied back as they are, and only the flags of the
+# cells are recomputed, so it takes about as long as a single move. The
+# snapshot is little endian:
+#
+#   magic     4 bytes  ASSN
+#   version   2 bytes
+#   flags     1 byte   Started and Random
+#   selected  1 byte   The selected slot, or 255 if there is none
+#   shuffles  4 bytes
+#   moves     4 bytes
+#   elapsed   8 bytes  The time played in seconds as a double
+#   undos     4 bytes  Number of moves and shuffles that can be undone
+#   layout   52 bytes  The card in every slot
+#   gaps      1 byte   Number of empty slots, followed by the slots in the
+#                      order in which they became empty. This decides which
+#                      card is selected after the next move
+#   deal      1 byte   Length of the deal (see deal.py), followed by the deal
+#                      in ASCII. The length is 0 if there is no deal
+#   undo      4 bytes  Length of the undo history, followed by the history
+#                      as it is kept by UndoJournal
+#   random             Only if the Random flag is set. The state of the
+#                      random number generator, as 625 4-byte words, a byte
+#                      that is 1 if there is a saved Gaussian and the
+#                      Gaussian as a double
+
+Magic = b'ASSN'
+Version = 1
+
+Started = 0x1
+Random = 0x2
+
+# magic, version, flags, selected, shuffles, moves, elapsed, undos, layout
+_Header = struct.Struct('<4sHBBIIdI{}s'.format(Slots))
+_Length = struct.Struct('<I')
+_Random = struct.Struct('<625IBd')
+
+# The version of the state returned by random.Random.getstate()
+_RandomVersion = 3
+
+_Correct = bytes([CellFlags.Correct])
+_Movable = int(CellFlags.Movable)
+_Selected = int(CellFlags.Selected)
+
+dirname = data_dir()
+filename = data_dir('game.snapshot')
+
+
+# The game as it is now. The state of the random number generator is left
+# out if rng is false, for instance when the generator is shared with other
+# games
+#
+# Game, bool => bytes
+def save(game, rng = True):
+    flags = Started if game.is_started() else 0
+    if rng:
+        flags = flags | Random
+    state = game.state
+    gaps = state.gap_slots()
+    deal = game.deal.encode('ascii') if game.deal else b''
+    undo = game.undo.data
+    parts = [_Header.pack(Magic,
+                          Version,
+                          flags,
+                          game.selected.id if game.selected else Empty,
+                          game.shuffles,
+                          game.moves,
+                          game.get_elapsed(),
+                          len(game.undo),
+                          bytes(state.layout)),
+             bytes([len(gaps)]),
+             bytes(gaps),
+             bytes([len(deal)]),
+             deal,
+             _Length.pack(len(undo)),
+             bytes(undo)]
+    if rng:
+        version, words, gauss = game.rng.getstate()
+        if version != _RandomVersion:
+            raise RuntimeError(
+                'Cannot save random state version {}'.format(version))
+        parts.append(_Random.pack(*words,
+                                  gauss is not None,
+                                  gauss if gauss is not None else 0.0))
+    return b''.join(parts)
+
+
+# Replaces the game with the one in the snapshot. The game that was being
+# played, if any, is abandoned. The random number generator is only changed
+# if its state was saved. If report is false, nothing is reported to the UI.
+# This is for games that are not being shown, where building the changes
+# would take longer than restoring them
+#
+# Game, bytes, bool => None
+def restore(game, data, report = True):
+    try:
+        magic, version, flags, selected, shuffles, moves, elapsed, undos, \
+            layout = _Header.unpack_from(data)
+    except struct.error:
+        raise RuntimeError('Not a game snapshot')
+    if magic != Magic:
+        raise RuntimeError('Not a game snapshot')
+    if version != Version:
+        raise RuntimeError('Unsupported snapshot version: {}'.format(version))
+
+    try:
+        pos = _Header.size
+        count = data[pos]
+        gaps = data[pos + 1:pos + 1 + count]
+        pos = pos + 1 + count
+        size = data[pos]
+        deal = bytes(data[pos + 1:pos + 1 + size]).decode('ascii')
+        pos = pos + 1 + size
+        size, = _Length.unpack_from(data, pos)
+        pos = pos + _Length.size
+        undo = data[pos:pos + size]
+        pos = pos + size
+        words = None
+        if flags & Random:
+            words = _Random.unpack_from(data, pos)
+            pos = pos + _Random.size
+    except (IndexError, struct.error, UnicodeDecodeError):
+        raise RuntimeError('Game snapshot is truncated')
+    if len(undo) != size or pos != len(data) \
+       or set(gaps) != { slot for slot in range(0, Slots)
+                         if layout[slot] == Empty }:
+        raise RuntimeError('Game snapshot is corrupt')
+
+    # This is the same as abandoning the game for a new one
+    game.hints.cancel()
+    if game.recorder and game.is_started():
+        game.recorder.end(None)
+    game.timer_stop()
+    if not report:
+        _load(game, flags, selected, shuffles, moves, elapsed, undos,
+              layout, gaps, deal, undo, words)
+        return
+
+    with game.batch():
+        game.do_deselect()
+        before = bytes(game.state.layout)
+        old = bytes(game.flags)
+        _load(game, flags, selected, shuffles, moves, elapsed, undos,
+              layout, gaps, deal, undo, words)
+        game.report_cards(before)
+        if old != game.flags:
+            for slot in range(0, Slots):
+                if old[slot] != game.flags[slot]:
+                    game.report_flags(slot)
+
+        if game.started:
+            game.ui.report_game_new()
+        game.ui.report_undo_changed(len(game.undo))
+        game.ui.report_shuffles_changed(game.shuffles)
+        game.ui.report_moves_changed(game.moves)
+        game.ui.report_correct_changed(sum(game.correct))
+        game.ui.report_movable_changed(len(game.movable))
+        game.ui.report_selection_changed(game.selected is not None)
+
+
+# Copies the fields of a snapshot into the game. The flags of the cells are
+# computed as Game.update_flags() would, but with plain ints, which is
+# several times faster than with CellFlags
+#
+# Game, int, int, int, int, float, int, bytes, bytes, str, bytes, tuple
+#     => None
+def _load(game, flags, selected, shuffles, moves, elapsed, undos, layout,
+          gaps, deal, undo, words):
+    state = game.state
+    state.load(layout)
+    state.gaps = dict.fromkeys(gaps)
+
+    game.undo.data[:] = undo
+    game.undo.count = undos
+    game.shuffles = shuffles
+    game.moves = moves
+    game.deal = deal or None
+    if words is not None:
+        game.rng.setstate((_RandomVersion,
+                           words[:625],
+                           words[626] if words[625] else None))
+
+    game.correct = [state.correct_length(row) for row in range(0, 4)]
+    game.movable = state.movable_slots()
+    cells = bytearray(Slots)
+    for row, length in enumerate(game.correct):
+        cells[row * 13:row * 13 + length] = _Correct * length
+    for slot in game.movable:
+        cells[slot] = cells[slot] | _Movable
+    game.selected = None
+    if selected != Empty:
+        game.selected = Point.grid[selected]
+        cells[selected] = cells[selected] | _Selected
+    game.flags[:] = cells
+
+    game.started = bool(flags & Started)
+    game.elapsed = elapsed
+    game.clock = monotonic() if game.started else None
+    # The recording of a resumed game starts from the board as it is now.
+    # It has no record of the moves that were made before, so they cannot
+    # be undone
+    if game.started and game.recorder:
+        game.recorder.new(state.layout)
+        game.undo.clear()
+
+
+# Saves the game to a file. The file is replaced in one go so that a crash
+# while saving leaves the last snapshot as it was
+#
+# Game, str => None
+def save_file(game, path = None):
+    if path is None:
+        os.makedirs(dirname, exist_ok = True)
+        path = filename
+    tmp = '{}.{}'.format(path, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(save(game))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# Restores the game from a file. False is returned if there is no file
+#
+# Game, str => bool
+def restore_file(game, path = None):
+    try:
+        with open(path or filename, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return False
+    restore(game, data)
+    return True
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+from collections import OrderedDict, namedtuple
+
+from .board import BoardState, Cards, Cols, Empty, Slots
+
+# Decides whether a deal can be won without shuffling and finds the shortest
+# sequence of moves that wins it. Shuffles are random, so they are not
+# searched.
+#
+# The search is done in two passes. The first is a depth-first search over
+# every position reachable from the deal, which decides whether it can be
+# won at all. If it can, an iterative deepening A* search looks for a
+# shorter win than the one that was found. The heuristic is the number of
+# cards that are not in the column they will eventually be in, since every
+# one of those has to be moved at least once.
+#
+# Most deals can reach millions of positions without shuffling, far more
+# than can be searched in a second or two, so the solver often gives up on a
+# deal. A deal that can be won is usually found to be winnable sooner than
+# one that cannot is proven not to be.
+#
+# solvable is True if the deal can be won, False if it cannot and None if
+# the search gave up before it could tell. moves is a list of (src, dst)
+# slot pairs. minimal is True if no shorter win exists. nodes is the number
+# of positions that were expanded
+Solution = namedtuple('Solution', ['solvable', 'moves', 'minimal', 'nodes'])
+
+Infinity = float('inf')
+
+# Zobrist keys, one for every card in every slot. The generator is seeded so
+# that keys are the same across processes
+_rng = random.Random(0x5eed)
+Zobrist = [_rng.getrandbits(64) for _ in range(0, Cards * Slots)]
+del _rng
+
+
+# BoardState => int
+def zobrist(state):
+    key = 0
+    for slot, card in enumerate(state.layout):
+        if card != Empty:
+            key ^= Zobrist[card * Slots + slot]
+    return key
+
+
+# BoardState => int
+def misplaced(state):
+    count = 0
+    for slot, card in enumerate(state.layout):
+        if card != Empty and slot % Cols != card % 13 - 1:
+            count = count + 1
+    return count
+
+
+# Maps a position to the number of moves that were searched from it without
+# finding a win. A position that is found again with no more moves left to
+# it than that need not be searched again. The table is bounded. When it is
+# full, the least recently used entry is evicted unless it was searched
+# deeper than the entry that is replacing it, in which case the new entry is
+# dropped instead and the old one is kept
+class TranspositionTable:
+    # int
+    def __init__(self, capacity = 1 << 18):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    # None => int
+    def __len__(self):
+        return len(self.entries)
+
+    # None => None
+    def clear(self):
+        self.entries.clear()
+
+    # int => int
+    def lookup(self, key):
+        depth = self.entries.get(key)
+        if depth is not None:
+            self.entries.move_to_end(key)
+        return depth
+
+    # int, int => None
+    def store(self, key, depth):
+        entries = self.entries
+        old = entries.get(key)
+        if old is not None:
+            if depth > old:
+                entries[key] = depth
+            entries.move_to_end(key)
+            return
+
+        if len(entries) >= self.capacity:
+            victim, deepest = entries.popitem(last = False)
+            if deepest > depth:
+                entries[victim] = deepest
+                return
+        entries[key] = depth
+
+
+# Raised when the search has expanded as many positions as it is allowed to
+class SearchLimit(Exception):
+    pass
+
+
+class Solver:
+    # BoardState, int, TranspositionTable
+    def __init__(self, state, max_nodes = 1000000, table = None):
+        self.state = state.copy()
+        self.max_nodes = max_nodes
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+        self.path = []
+        self.seen = set()
+        # True if the search below the current position skipped a position
+        # because it was on the current path
+        self.cutoff = False
+
+    # bool => Solution
+    def solve(self, minimal = True):
+        try:
+            moves = self.reach()
+        except SearchLimit:
+            return Solution(None, [], False, self.nodes)
+        if moves is None:
+            return Solution(False, [], False, self.nodes)
+        if not minimal:
+            return Solution(True, moves, False, self.nodes)
+
+        try:
+            shortest = self.shorten(len(moves))
+        except SearchLimit:
+            return Solution(True, moves, False, self.nodes)
+        if shortest is None:
+            return Solution(True, moves, True, self.nodes)
+        return Solution(True, shortest, True, self.nodes)
+
+    # The moves that can be made from the current position as
+    # (change in heuristic, src, dst, card), best last
+    #
+    # None => [(int, int, int, int)]
+    def expand(self):
+        state = self.state
+        layout = state.layout
+        moves = []
+        for src in state.movable_slots():
+            dst = state.dest(src)
+            card = layout[src]
+            col = card % 13 - 1
+            dh = (dst % Cols != col) - (src % Cols != col)
+            moves.append((dh, src, dst, card))
+        moves.sort(reverse = True)
+        return moves
+
+    # None => None
+    def count(self):
+        self.nodes = self.nodes + 1
+        if self.nodes > self.max_nodes:
+            raise SearchLimit()
+
+    # Searches every position that can be reached until a win is found.
+    # Positions are marked as visited when they are first seen, so none is
+    # expanded twice. They are kept in a set rather than in the table
+    # because an evicted position would be searched again, along with
+    # everything below it. The set holds at most max_nodes positions.
+    # Returns the moves to the win or None if there is none.
+    #
+    # None => [(int, int)]
+    def reach(self):
+        state = self.state
+        key = zobrist(state)
+        visited = { key }
+        stack = [(key, misplaced(state), self.expand())]
+        path = []
+        while stack:
+            key, h, moves = stack[-1]
+            if h == 0 and state.is_won():
+                moves = list(path)
+                for src, dst in reversed(path):
+                    state.move(dst, src)
+                return moves
+            if not moves:
+                stack.pop()
+                if path:
+                    src, dst = path.pop()
+                    state.move(dst, src)
+                continue
+
+            dh, src, dst, card = moves.pop()
+            child = key ^ Zobrist[card * Slots + src] \
+                ^ Zobrist[card * Slots + dst]
+            if child in visited:
+                continue
+            self.count()
+            visited.add(child)
+            state.move(src, dst)
+            path.append((src, dst))
+            stack.append((child, h + dh, self.expand()))
+        return None
+
+    # Looks for a win that is shorter than the given number of moves.
+    # Returns None if there is none.
+    #
+    # int => [(int, int)]
+    def shorten(self, length):
+        self.table.clear()
+        key = zobrist(self.state)
+        h = misplaced(self.state)
+        bound = h
+        while bound < length:
+            found = self.search(key, h, 0, bound)
+            if found is True:
+                return list(self.path)
+            if found == Infinity:
+                return None
+            bound = found
+        return None
+
+    # Returns True if a win was found within the bound, otherwise the
+    # smallest bound that would let the search go further.
+    #
+    # int, int, int, int => bool|float
+    def search(self, key, h, g, bound):
+        state = self.state
+        if g + h > bound:
+            return g + h
+        if h == 0 and state.is_won():
+            return True
+
+        left = bound - g
+        depth = self.table.lookup(key)
+        if depth is not None and depth >= left:
+            return g + depth + 1
+        self.count()
+
+        cutoff = self.cutoff
+        self.cutoff = False
+        self.seen.add(key)
+        least = Infinity
+        for dh, src, dst, card in reversed(self.expand()):
+            child = key ^ Zobrist[card * Slots + src] \
+                ^ Zobrist[card * Slots + dst]
+            if child in self.seen:
+                self.cutoff = True
+                continue
+            state.move(src, dst)
+            self.path.append((src, dst))
+            found = self.search(child, h + dh, g + 1, bound)
+            if found is True:
+                return True
+            self.path.pop()
+            state.move(dst, src)
+            least = min(least, found)
+        self.seen.discard(key)
+
+        # Nothing was found within the moves that were left. The result is
+        # only stored if no position was skipped for being on the current
+        # path, since otherwise it depends on the path that led here and may
+        # be wrong when the position is reached another way
+        if not self.cutoff:
+            self.table.store(key,
+                             left if least == Infinity else least - g - 1)
+        self.cutoff = self.cutoff or cutoff
+        return least
+
+
+# BoardState, bool, int, TranspositionTable => Solution
+def solve(state, minimal = True, max_nodes = 1000000, table = None):
+    return Solver(state, max_nodes, table).solve(minimal)
+
+
+# Game, bool, int, TranspositionTable => Solution
+def solve_game(game, minimal = True, max_nodes = 1000000, table = None):
+    return solve(game.state, minimal, max_nodes, table)
+
+
+# int, bool, int, TranspositionTable => Solution
+def solve_seed(seed, minimal = True, max_nodes = 1000000, table = None):
+    state = BoardState()
+    state.shuffle(random.Random(seed))
+    return solve(state, minimal, max_nodes, table)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import sqlite3
+import time
+
+from .settings import data_dir
+
+# Every game that is finished is stored in an SQLite database. The database
+# is in WAL mode so that it can be queried while games are being added to
+# it, and games are inserted in batches because every commit syncs the file.
+#
+# Besides the table of games, the number of games and wins for every day are
+# kept up to date as the games are inserted. The win rate over any period is
+# computed from the days, so it does not need to scan the games. The best
+# times are found with an index on the result and duration.
+
+_Schema = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,
+    deal TEXT NOT NULL,
+    won INTEGER NOT NULL,
+    moves INTEGER NOT NULL,
+    shuffles INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    max_shuffles INTEGER NOT NULL,
+    highlight_movable INTEGER NOT NULL,
+    highlight_correct INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_time ON games (time);
+CREATE INDEX IF NOT EXISTS games_result ON games (won, duration);
+CREATE INDEX IF NOT EXISTS games_deal ON games (deal, won, duration);
+CREATE TABLE IF NOT EXISTS days (
+    day TEXT PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+_Insert = '''
+INSERT INTO games (time, deal, won, moves, shuffles, duration,
+                   max_shuffles, highlight_movable, highlight_correct)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_Count = '''
+INSERT INTO days (day, games, wins) VALUES (?, 1, ?)
+ON CONFLICT (day) DO UPDATE SET games = games + 1, wins = wins + excluded.wins
+'''
+
+# The format used to group the days in each period
+_Periods = { 'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m',
+             'year': '%Y' }
+
+
+class StatsStore:
+    dirname = data_dir()
+    filename = data_dir('stats.db')
+
+    # Games are written once this many are waiting
+    batch = 64
+
+    # str, int
+    def __init__(self, filename = None, batch = None):
+        if filename is None:
+            os.makedirs(StatsStore.dirname, exist_ok = True)
+            filename = StatsStore.filename
+        if batch is not None:
+            self.batch = batch
+        self.pending = []
+        try:
+            self.db = sqlite3.connect(filename)
+            self.db.execute('PRAGMA journal_mode = WAL')
+            self.db.execute('PRAGMA synchronous = NORMAL')
+            self.db.executescript(_Schema)
+        except sqlite3.Error as err:
+            raise RuntimeError('Cannot open statistics {}: {}'.format(
+                filename, err))
+
+    # Adds a finished game. The game must not have been reset yet
+    #
+    # Game, bool => None
+    def add_game(self, game, win):
+        self.add(game.deal,
+                 win,
+                 game.moves,
+                 game.shuffles,
+                 game.get_elapsed(),
+                 game.settings.shuffles,
+                 game.settings.highlight_movable,
+                 game.settings.highlight_correct)
+
+    # The time is when the game ended in seconds since the epoch. It is the
+    # current time if it is not given
+    #
+    # str, bool, int, int, float, int, bool, bool, int => None
+    def add(self, deal, win, moves, shuffles, duration,
+            max_shuffles = 3,
+            highlight_movable = True,
+            highlight_correct = True,
+            when = None):
+        if when is None:
+            when = int(time.time())
+        self.pending.append((when, deal, int(win), moves, shuffles,
+                             duration, max_shuffles,
+                             int(highlight_movable), int(highlight_correct)))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    # None => None
+    def flush(self):
+        if not self.pending:
+            return
+        # The days are local so that the games played in an evening are
+        # counted on the same day
+        days = [(datetime.date.fromtimestamp(row[0]).isoformat(), row[2])
+                for row in self.pending]
+        with self.db:
+            self.db.executemany(_Insert, self.pending)
+            self.db.executemany(_Count, days)
+        self.pending = []
+
+    # None => None
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    # The day is a date or a string as returned by date.isoformat()
+    #
+    # * => str
+    @staticmethod
+    def _day(day):
+        if isinstance(day, datetime.date):
+            return day.isoformat()
+        return day
+
+    # The number of games and wins between the given days, inclusive. Either
+    # of them may be None
+    #
+    # date, date => (int, int)
+    def get_totals(self, since = None, until = None):
+        self.flush()
+        games, wins = self.db.execute(
+            'SELECT TOTAL(games), TOTAL(wins) FROM days '
+            'WHERE day >= ? AND day <= ?',
+            (self._day(since) or '', self._day(until) or '~')).fetchone()
+        return (int(games), int(wins))
+
+    # The number of games and wins in each day, week, month or year between
+    # the given days, in order
+    #
+    # str, date, date => [(str, int, int)]
+    def get_win_rates(self, period = 'day', since = None, until = None):
+        if period not in _Periods:
+            raise RuntimeError('Unknown period: {}'.format(period))
+        self.flush()
+        return self.db.execute(
+            'SELECT STRFTIME(?, day) AS period, SUM(games), SUM(wins) '
+            'FROM days WHERE day >= ? AND day <= ? '
+            'GROUP BY period ORDER BY period',
+            (_Periods[period],
+             self._day(since) or '',
+             self._day(until) or '~')).fetchall()
+
+    # The fastest games that were won since the given day. If a deal is
+    # given, only the games with that deal are included
+    #
+    # int, str, date => [(int, str, float, int, int)]
+    def get_best_times(self, limit = 10, deal = None, since = None):
+        self.flush()
+        query = 'SELECT time, deal, duration, moves, shuffles FROM games ' \
+            'WHERE won = 1'
+        params = []
+        if deal is not None:
+            query = query + ' AND deal = ?'
+            params.append(deal)
+        if since is not None:
+            if isinstance(since, str):
+                since = datetime.date.fromisoformat(since)
+            query = query + ' AND time >= ?'
+            params.append(int(time.mktime(since.timetuple())))
+        params.append(limit)
+        return self.db.execute(query + ' ORDER BY duration LIMIT ?',
+                               params).fetchall()
+
+    # The number of times a deal has been played and won
+    #
+    # str => (int, int)
+    def get_deal(self, deal):
+        self.flush()
+        games, wins = self.db.execute(
+            'SELECT COUNT(*), TOTAL(won) FROM games WHERE deal = ?',
+            (deal,)).fetchone()
+        return (games, int(wins))
@@ -17,7 +17,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import os
 import urwid
+from collections import deque
 from enum import Enum, unique, auto
 
 from ..game_ui import GameUI
@@ -163,11 +165,13 @@ class GameText(GameUI):
         key_shuffle = urwid.Text(('bold', 'r'))
         key_undo = urwid.Text(('bold', 'u'))
         key_new = urwid.Text(('bold', 'n'))
+        key_hint = urwid.Text(('bold', 'h'))
         key_quit = urwid.Text(('bold', '<Esc>'))
         
         key_shuffle_do = urwid.Text('Shuffle')
         key_undo_do = urwid.Text('Undo')
         key_new_do = urwid.Text('New game')
+        key_hint_do = urwid.Text('Hint')
         key_quit_do = urwid.Text('Quit game')
         
         helpbox = urwid.LineBox(urwid.Columns(
@@ -178,6 +182,8 @@ class GameText(GameUI):
              urwid.Pile([key_enter_do]),
              (1, urwid.Pile([key_shuffle, key_undo])),
              urwid.Pile([key_shuffle_do, key_undo_do]),
+             (1, urwid.Pile([key_hint])),
+             urwid.Pile([key_hint_do]),
              (5, urwid.Pile([key_new, key_quit])),
              urwid.Pile([key_new_do, key_quit_do])\
             ],
@@ -190,6 +196,10 @@ class GameText(GameUI):
         self.frame = urwid.Frame(self.board, header, footer)
         self.loop = None
         self.timer = None
+        # Functions to be called from the main loop. The pipe is written to
+        # to wake it up
+        self.pending = deque()
+        self.pipe = None
         
     # * => *
     def main(self):
@@ -198,6 +208,10 @@ class GameText(GameUI):
                                    unhandled_input = self.action_key_press,
                                    handle_mouse = False)
         self.loop.screen.set_terminal_properties(colors = 16)
+        self.pipe = self.loop.watch_pipe(self.run_pending)
+        # A game that was resumed before the loop was created has no clock
+        if self.game.is_started() and not self.timer:
+            self.tick(self.loop)
         self.loop.run()
 
     # urwid.MainLoop, * => None
@@ -211,13 +225,28 @@ class GameText(GameUI):
         else:
             self.lbl_time.set_text('{:02}:{:02}'.format(mins, secs))
 
-        self.timer = self.loop.set_alarm_in(1, self.tick)
+        # Wake up just after the clock reaches the next whole second
+        elapsed = self.game.get_elapsed()
+        delay = 1 + int(elapsed) - elapsed + 0.001
+        self.timer = self.loop.set_alarm_in(delay, self.tick)
         
+    # callable, * => None
+    def run_in_ui(self, fn, *args):
+        self.pending.append((fn, args))
+        os.write(self.pipe, b'\0')
+
+    # bytes => bool
+    def run_pending(self, data):
+        while self.pending:
+            fn, args = self.pending.popleft()
+            fn(*args)
+        return True
+
     # * => *
     def quit(self):
         if self.timer:
             self.loop.remove_alarm(self.timer)
-            timer = None
+            self.timer = None
         raise urwid.ExitMainLoop()
     
     # * => None
@@ -262,6 +291,8 @@ class GameText(GameUI):
                 self.action_undo()
             elif key in ['r']:
                 self.action_shuffle()
+            elif key in ['h']:
+                self.action_hint()
         return True
 
     # * => None
@@ -288,6 +319,12 @@ class GameText(GameUI):
         else:
             cell.set_normal()
 
+    # { Point: (Card, Flags) } => None
+    def report_cells_changed(self, cells):
+        for addr, (card, flags) in cells.items():
+            self.cells[addr.row][addr.col].set_card(card)
+            self.report_cell_flags_changed(addr, flags)
+
     # bool => None
     def report_selection_changed(self, selected):
         pass
@@ -311,6 +348,12 @@ class GameText(GameUI):
         else:
             self.lbl_message.set_text(('stuck', 'No moves possible'))
 
+    # Point => None
+    def report_hint(self, addr):
+        if addr:
+            self.lbl_message.set_text('Hint: {}'.format(
+                self.game.get_card(addr)))
+
     # int => None
     def report_correct_changed(self, correct):
         self.lbl_correct.set_text('{} '.format(correct))
@@ -330,4 +373,8 @@ class GameText(GameUI):
     def report_game_new(self):
         self.report_moves_changed(0)
         self.report_shuffles_changed(0)
+        if not self.loop:
+            return
+        if self.timer:
+            self.loop.remove_alarm(self.timer)
         self.tick(self.loop)
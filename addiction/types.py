@@ -91,145 +91,147 @@ class Direction(Enum):
         return str(self)
 
 
+# There are exactly 52 cards. Card(suit, face) returns the one instance of
+# that card, so cards can be compared by identity and hashed by id. Anything
+# about a card that is needed often is computed once when the cards are
+# created. The id of a card is the same as the one used by BoardState.
 class Card:
-    # Suit, Face
-    def __init__(self, suit, face):
-        self.suit = suit
-        self.face = face
+    __slots__ = ('suit', 'face', 'id', 'red', 'successor', 'predecessor',
+                 '_str')
+
+    # Card, indexed by id
+    deck = ()
+
+    # Suit, Face => Card
+    def __new__(cls, suit, face):
+        return Card.deck[(int(suit) - 1) * 13 + (int(face) - 1)]
+
+    # int => Card
+    @staticmethod
+    def from_id(card):
+        return Card.deck[card]
+
+    # None => None
+    @staticmethod
+    def _make_deck():
+        suits = { Suit.Clubs: 'C',
+                  Suit.Diamonds: 'D',
+                  Suit.Hearts: 'H',
+                  Suit.Spades: 'S' }
+        faces = { Face.Ace: 'A',
+                  Face.Jack: 'J',
+                  Face.Queen: 'Q',
+                  Face.King: 'K',
+                  Face.Ten: 'T'}
+        deck = []
+        for suit in Suit:
+            for face in Face:
+                card = object.__new__(Card)
+                card.suit = suit
+                card.face = face
+                card.id = len(deck)
+                card.red = suit in (Suit.Diamonds, Suit.Hearts)
+                card._str = '{}{}'.format(faces.get(face, int(face)),
+                                          suits[suit])
+                deck.append(card)
+        for card in deck:
+            card.successor = deck[card.id + 1] \
+                if card.face < Face.King else None
+            card.predecessor = deck[card.id - 1] \
+                if card.face > Face.Ace else None
+        Card.deck = tuple(deck)
 
     # None => bool
     def is_red(self):
-        return self.suit in [Suit.Diamonds, Suit.Hearts]
+        return self.red
 
     # None => bool
     def is_black(self):
-        return self.suit in [Suit.Clubs, Suit.Spades]
+        return not self.red
         
     # Card => bool
     def is_predecessor(self, other):
-        if other.face == Face.Ace:
-            return False
-        return (self.suit == other.suit) and (self.face == other.face - 1)
+        return other.predecessor is self
 
     # Card => bool
     def is_successor(self, other):
-        if other.face == Face.King:
-            return False
-        return (self.suit == other.suit) and (self.face == other.face + 1)
-
-    # None => Card
-    @property
-    def successor(self):
-        if self.face < Face.King:
-            return Card(self.suit, Face(self.face + 1))
-        return None
-
-    # None => Card
-    @property
-    def predecessor(self):
-        if self.face > Face.Ace:
-            return Card(self.suit, Face(self.face - 1))
-        return None
-    
-    # None => *
-    def __hash__(self):
-        return hash((self.suit, self.face))
+        return other.successor is self
 
-    # None => bool
-    def __eq__(self, other):
-        return (self.suit == other.suit) and (self.face == other.face)
+    # Cards are unpickled and copied as the same instance
+    #
+    # None => (type, tuple)
+    def __reduce__(self):
+        return (Card, (self.suit, self.face))
 
     # None => bool
     def __le__(self, other):
-        if self.suit == other.suit:
-            return self.face <= other.face
-        else:
-            return self.suit <= other.suit
+        return self.id <= other.id
 
     # None => bool
     def __lt__(self, other):
-        if self.suit == other.suit:
-            return self.face < other.face
-        else:
-            return self.suit < other.suit
+        return self.id < other.id
     
     # None => str
     def __str__(self):
-        suits = { Suit.Clubs: 'C',
-                  Suit.Diamonds: 'D',
-                  Suit.Hearts: 'H',
-                  Suit.Spades: 'S' }
-        faces = { Face.Ace: 'A',
-                  Face.Jack: 'J',
-                  Face.Queen: 'Q',
-                  Face.King: 'K',
-                  Face.Ten: 'T'}
-        if self.face in faces:
-            return '{}{}'.format(faces[self.face], suits[self.suit])
-        else:
-            return '{}{}'.format(int(self.face), suits[self.suit])
+        return self._str
 
     # None => str
     def __repr__(self):
-        return str(self)
+        return self._str
+
+Card._make_deck()
 
     
+# There is one Point for every cell on the board. Point(row, col) returns
+# that instance, so points can be compared by identity and hashed by id. The
+# id of a point is the slot used by BoardState. The neighbors of a point are
+# found when the points are created and are None at the edges of the board.
 class Point:
-    # [[Point]], int, int
-    def __init__(self, points, row, col):
-        self.points = points
-        self.row = row
-        self.col = col
-
-    # None => Point
-    @property
-    def left(self):
-        if self.col > 0:
-            return self.points[self.row][self.col - 1]
-        return None
-
-    # None => Point
-    @property
-    def right(self):
-        if self.col < 12:
-            return self.points[self.row][self.col + 1]
-        return None
-
-    # None => Point
-    @property
-    def above(self):
-        if self.row > 0:
-            return self.points[self.row - 1][self.col]
-        return None
-
-    # None => Point
-    @property
-    def below(self):
-        if self.row < 3:
-            return self.points[self.row + 1][self.col]
-        return None
-
-    # None => *
-    def __hash__(self):
-        return hash((self.row, self.col))
-
-    # None => bool
-    def __eq__(self, other):
-        return (self.row == other.row) and (self.col == other.col)
+    __slots__ = ('row', 'col', 'id', 'left', 'right', 'above', 'below')
+
+    # Point, indexed by id
+    grid = ()
+
+    # int, int => Point
+    def __new__(cls, row, col):
+        return Point.grid[row * 13 + col]
+
+    # int => Point
+    @staticmethod
+    def from_id(slot):
+        return Point.grid[slot]
+
+    # None => None
+    @staticmethod
+    def _make_grid():
+        grid = []
+        for row in range(0, 4):
+            for col in range(0, 13):
+                addr = object.__new__(Point)
+                addr.row = row
+                addr.col = col
+                addr.id = len(grid)
+                grid.append(addr)
+        for addr in grid:
+            addr.left = grid[addr.id - 1] if addr.col > 0 else None
+            addr.right = grid[addr.id + 1] if addr.col < 12 else None
+            addr.above = grid[addr.id - 13] if addr.row > 0 else None
+            addr.below = grid[addr.id + 13] if addr.row < 3 else None
+        Point.grid = tuple(grid)
+
+    # Points are unpickled and copied as the same instance
+    #
+    # None => (type, tuple)
+    def __reduce__(self):
+        return (Point, (self.row, self.col))
 
     # None => bool
     def __le__(self, other):
-        if self.row == other.row:
-            return self.col <= other.col
-        else:
-            return self.row <= other.row
+        return self.id <= other.id
     
     # None => bool
     def __lt__(self, other):
-        if self.row == other.row:
-            return self.col < other.col
-        else:
-            return self.row < other.row
+        return self.id < other.id
     
     # None => str
     def __str__(self):
@@ -239,6 +241,8 @@ class Point:
     def __repr__(self):
         return str(self)
 
+Point._make_grid()
+
 
 class Color:
     # int, int, int, float
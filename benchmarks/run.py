@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from addiction.game import Game
+from addiction.null.ui import GameNull
+from addiction.simulate import play
+from addiction.types import Direction
+
+# Benchmarks of the game engine. None of them need a display. Each benchmark
+# is a function that does any setup it needs and returns a function that runs
+# the operation being measured a given number of times. The time reported
+# for a benchmark is the time of a single operation.
+#
+# Run the benchmarks and save the results:
+#
+#   benchmarks/run.py run -o before.json
+#
+# Compare two sets of results:
+#
+#   benchmarks/run.py compare before.json after.json
+
+Benchmarks = dict()
+
+
+# Registers a benchmark under the given name
+#
+# str => (function => function)
+def benchmark(name):
+    def register(fn):
+        Benchmarks[name] = fn
+        return fn
+    return register
+
+
+# A game with no UI that has been played for a few moves so that the board
+# is not a fresh deal
+#
+# int => Game
+def new_game(seed = 1):
+    game = Game(GameNull, False, seed)
+    game.do_game_new()
+    for _ in range(0, 20):
+        if not game.is_started() or not game.selected:
+            break
+        game.do_move_card(game.selected)
+    while not game.is_started() or not game.selected:
+        game.do_game_new()
+    return game
+
+
+@benchmark('refresh')
+def bench_refresh():
+    game = new_game()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            game.refresh(game.selected)
+    return run
+
+
+@benchmark('get_correct_points')
+def bench_get_correct_points():
+    game = new_game()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            game.get_correct_points()
+    return run
+
+
+@benchmark('get_movable_points')
+def bench_get_movable_points():
+    game = new_game()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            game.get_movable_points()
+    return run
+
+
+# The clock is stopped so that the shuffles are not added to the undo
+# history
+@benchmark('shuffle')
+def bench_shuffle():
+    game = new_game()
+    game.timer_stop()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            game.shuffle()
+    return run
+
+
+@benchmark('move_selected')
+def bench_move_selected():
+    game = new_game()
+    directions = list(Direction)
+
+    # int => None
+    def run(n):
+        for i in range(0, n):
+            game.do_move_selected(directions[i % 4])
+    return run
+
+
+@benchmark('move')
+def bench_move():
+    game = new_game()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            if not game.selected:
+                game.do_game_new()
+            game.do_move_card(game.selected)
+            if not game.is_started():
+                game.do_game_new()
+    return run
+
+
+# One operation is a move followed by undoing it. Both the move and the undo
+# refresh the board
+@benchmark('move_undo')
+def bench_move_undo():
+    game = new_game()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            if not game.selected:
+                game.do_game_new()
+            game.do_move_card(game.selected)
+            if game.is_started():
+                game.do_undo()
+            else:
+                game.do_game_new()
+    return run
+
+
+# Ranking the moves for a board that has not been seen before
+@benchmark('hint')
+def bench_hint():
+    from addiction.hint import HintEngine
+    game = new_game()
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            HintEngine().rank(game.state)
+    return run
+
+
+# One operation is a whole game played to the end with random moves
+@benchmark('playout')
+def bench_playout():
+    seeds = iter(range(0, 1 << 30))
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            play(next(seeds), 'random', 3, 1000)
+    return run
+
+
+# One operation is a batch of games played together with the batch engine.
+# The size of the batch is fixed, since the time per game depends on it.
+# This needs numpy
+@benchmark('batch_playout')
+def bench_batch_playout():
+    from addiction.batch import BatchBoard
+    seeds = iter(range(0, 1 << 30))
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            BatchBoard(256, next(seeds)).play('random', 3, 1000)
+    return run
+
+
+# Loading the card images for the Gtk UI, first when nothing is cached and
+# then from the cache. This needs Gtk
+@benchmark('cards_render')
+def bench_cards_render():
+    from addiction.gtk.atlas import CardAtlas
+    CardAtlas.dirname = tempfile.mkdtemp()
+    sizes = iter(range(70, 1 << 30))
+
+    # Every card is rendered at a new size so that nothing is ever loaded
+    # from the cache
+    #
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            atlas = CardAtlas(next(sizes), 98)
+            atlas.save(atlas.render())
+    return run
+
+
+@benchmark('cards_load')
+def bench_cards_load():
+    from addiction.gtk.atlas import CardAtlas
+    CardAtlas.dirname = tempfile.mkdtemp()
+    atlas = CardAtlas(70, 98)
+    atlas.save(atlas.render())
+
+    # int => None
+    def run(n):
+        for _ in range(0, n):
+            CardAtlas(70, 98)
+    return run
+
+
+# Runs the operation enough times to take at least min_time and repeats that
+# a few times. The best and median time of a single operation are reported
+#
+# function, int, float => dict
+def measure(setup, repeat, min_time):
+    run = setup()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        run(number)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = number * 2 if elapsed <= 0 \
+            else max(number * 2, int(number * min_time / elapsed) + 1)
+
+    times = [elapsed / number]
+    for _ in range(1, repeat):
+        start = time.perf_counter()
+        run(number)
+        times.append((time.perf_counter() - start) / number)
+    return { 'number': number,
+             'best': min(times),
+             'median': statistics.median(times),
+             'ops': 1 / min(times) }
+
+
+# None => dict
+def get_metadata():
+    commit = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                cwd = os.path.dirname(__file__),
+                                stdout = subprocess.PIPE,
+                                stderr = subprocess.DEVNULL,
+                                universal_newlines = True).stdout.strip()
+    except OSError:
+        pass
+    return { 'time': datetime.datetime.now().isoformat(timespec = 'seconds'),
+             'commit': commit or None,
+             'python': platform.python_version(),
+             'implementation': platform.python_implementation(),
+             'platform': platform.platform(),
+             'machine': platform.machine(),
+             'processor': platform.processor(),
+             'cpus': os.cpu_count() }
+
+
+# float => str
+def format_time(secs):
+    for unit, scale in [('s', 1), ('ms', 1e3), ('us', 1e6)]:
+        if secs * scale >= 1:
+            return '{:.2f} {}'.format(secs * scale, unit)
+    return '{:.0f} ns'.format(secs * 1e9)
+
+
+# argparse.Namespace => int
+def run(args):
+    names = args.benchmarks or list(Benchmarks)
+    for name in names:
+        if name not in Benchmarks:
+            print('Error: Unknown benchmark: {}'.format(name),
+                  file = sys.stderr)
+            return 1
+
+    results = dict()
+    for name in names:
+        try:
+            result = measure(Benchmarks[name], args.repeat, args.min_time)
+        except ImportError as err:
+            print('{:<20} skipped ({})'.format(name, err))
+            continue
+        results[name] = result
+        print('{:<20} {:>12} {:>14.1f} ops/s'.format(
+            name,
+            format_time(result['best']),
+            result['ops']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({ 'metadata': get_metadata(), 'results': results },
+                      f,
+                      indent = 2)
+    return 0
+
+
+# A benchmark has regressed if its best time is slower than the baseline by
+# more than the threshold
+#
+# argparse.Namespace => int
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    for which, data in [('baseline', baseline), ('current', current)]:
+        meta = data['metadata']
+        print('{:<9} {} {} Python {} on {}'.format(which,
+                                                  meta['time'],
+                                                  (meta['commit'] or '')[:10],
+                                                  meta['python'],
+                                                  meta['platform']))
+    print()
+
+    regressed = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['best'] / baseline['results'][name]['best']
+        status = ''
+        if ratio > 1 + args.threshold:
+            status = 'slower'
+            regressed.append(name)
+        elif ratio < 1 - args.threshold:
+            status = 'faster'
+        print('{:<20} {:>12} {:>12} {:>7.2f}x  {}'.format(
+            name,
+            format_time(baseline['results'][name]['best']),
+            format_time(result['best']),
+            ratio,
+            status))
+
+    if regressed:
+        print()
+        print('Regressions: {}'.format(', '.join(regressed)))
+        return 1
+    return 0
+
+
+# None => int
+def main():
+    parser = argparse.ArgumentParser('Addiction solitaire benchmarks')
+    commands = parser.add_subparsers(dest = 'command')
+    commands.required = True
+
+    cmd_run = commands.add_parser('run', help = 'Run the benchmarks')
+    cmd_run.add_argument('benchmarks', nargs = '*',
+                         help = ('Benchmarks to run. All of them are run if '
+                                 'none are given: {}'.format(
+                                     ', '.join(Benchmarks))))
+    cmd_run.add_argument('-o', '--output', default = None,
+                         help = 'Save the results to this JSON file')
+    cmd_run.add_argument('-r', '--repeat', default = 5, type = int,
+                         help = 'Number of times to repeat each benchmark')
+    cmd_run.add_argument('-t', '--min-time', default = 0.2, type = float,
+                         help = 'Minimum time in seconds for each repeat')
+    cmd_run.set_defaults(func = run)
+
+    cmd_compare = commands.add_parser('compare',
+                                      help = 'Compare two sets of results')
+    cmd_compare.add_argument('baseline', help = 'Results to compare against')
+    cmd_compare.add_argument('current', help = 'New results')
+    cmd_compare.add_argument('--threshold', default = 0.1, type = float,
+                             help = ('Fraction by which a benchmark must be '
+                                     'slower to be a regression'))
+    cmd_compare.set_defaults(func = compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from addiction import replay
+from addiction.archive import Archive, pack
+from addiction.game import Game
+from addiction.null.ui import GameNull
+from addiction.replay import ReplayWriter, read
+from addiction.types import Point
+
+
+# Writes a replay log of a few games and returns the layout at the end of
+# every game and the number of moves in it
+#
+# str, int, int => [(bytes, int)]
+def record(path, seed, games):
+    game = Game(GameNull, False, seed)
+    game.recorder = ReplayWriter.open(game, path)
+    played = []
+    for _ in range(0, games):
+        game.do_game_new()
+        moves = 0
+        for i in range(0, 15):
+            if not game.is_started():
+                break
+            if i == 8:
+                game.do_shuffle()
+            else:
+                game.do_move_card(Point.grid[game.movable[0]])
+                moves = moves + 1
+        played.append((bytes(game.state.layout), moves))
+    game.do_quit()
+    game.recorder.close()
+    return played
+
+
+# Splits the records of a replay log into games
+#
+# str => [[tuple]]
+def games(path):
+    split = [[]]
+    with open(path, 'rb') as f:
+        for record in read(f):
+            split[-1].append(record)
+            if record[0] == replay.End:
+                split.append([])
+    return split[:-1]
+
+
+def test_pack(tmp_path):
+    logs = [str(tmp_path / 'a.log'), str(tmp_path / 'b.log')]
+    played = record(logs[0], 1, 3) + record(logs[1], 2, 2)
+    filename = str(tmp_path / 'games.archive')
+    assert pack(filename, logs) == 5
+
+    expected = games(logs[0]) + games(logs[1])
+    with Archive(filename) as archive:
+        assert len(archive) == 5
+        for n in range(0, 5):
+            assert list(archive.records(n)) == expected[n]
+            assert archive.get_entry(n)[2] == played[n][1]
+            assert len(list(archive.moves(n))) == played[n][1]
+            assert archive.get_result(n) == replay.Abandoned
+            game = Game(GameNull, False)
+            assert archive.replay(game, n) == replay.Abandoned
+            assert bytes(game.state.layout) == played[n][0]
+        index = archive.get_index()
+        assert list(index['moves']) == [moves for _, moves in played]
+        del index
+        with pytest.raises(RuntimeError):
+            archive.get_entry(5)
+
+
+def test_truncated_log(tmp_path):
+    log = str(tmp_path / 'a.log')
+    record(log, 3, 2)
+    with open(log, 'rb') as f:
+        data = f.read()
+    # Cut the log in the middle of the End record of the second game, as
+    # if the program had been killed while writing it
+    with open(log, 'wb') as f:
+        f.write(data[:-1])
+    filename = str(tmp_path / 'games.archive')
+    assert pack(filename, [log]) == 1
+
+
+def test_not_an_archive(tmp_path):
+    filename = str(tmp_path / 'games.archive')
+    for data in [b'', b'ASRA', b'XXXX' + bytes(20)]:
+        with open(filename, 'wb') as f:
+            f.write(data)
+        with pytest.raises(RuntimeError):
+            Archive(filename)
+
+    log = str(tmp_path / 'a.log')
+    with open(log, 'wb') as f:
+        f.write(b'not a log')
+    with pytest.raises(RuntimeError):
+        pack(filename, [log])
+    assert not tmp_path.joinpath('games.archive').exists()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from addiction.batch import BatchBoard, Gap
+from addiction.board import BoardState, Cards, Empty, Slots
+
+
+# The board in the given row as a BoardState
+#
+# BatchBoard, int => BoardState
+def state(batch, row):
+    state = BoardState()
+    state.load(bytes(Empty if card == Gap else card
+                     for card in batch.flat[row]))
+    return state
+
+
+# Checks that the index and the gaps of every board agree with its cards
+#
+# BatchBoard => None
+def check(batch):
+    for row in range(0, len(batch)):
+        flat = batch.flat[row]
+        assert sorted(card for card in flat if card != Gap) \
+            == [card for card in range(0, Cards) if card % 13]
+        for slot, card in enumerate(flat):
+            if card != Gap:
+                assert batch.index[row, card] == slot
+        assert sorted(batch.gaps[row]) \
+            == [slot for slot in range(0, Slots) if flat[slot] == Gap]
+
+
+# Makes a few random moves on every board, checking the candidates against
+# BoardState before every move
+#
+# BatchBoard, int => None
+def walk(batch, steps):
+    for _ in range(0, steps):
+        src, dst = batch.candidates()
+        for row in range(0, len(batch)):
+            expected = state(batch, row)
+            assert { (s, d) for s, d in zip(src[row], dst[row]) if s >= 0 } \
+                == { (s, expected.dest(s)) for s in expected.movable_slots() }
+        choice = batch.choose_random(src, dst)
+        rows = np.arange(len(batch))
+        picked = np.maximum(choice, 0)
+        batch.move(np.where(choice >= 0, src[rows, picked], -1),
+                   dst[rows, picked])
+        check(batch)
+
+
+def test_deal():
+    batch = BatchBoard(50, 0)
+    assert batch.boards.shape == (50, 4, 13)
+    check(batch)
+    assert len({ batch.flat[row].tobytes() for row in range(0, 50) }) == 50
+
+
+def test_candidates():
+    walk(BatchBoard(40, 1), 30)
+
+
+def test_correct_lengths():
+    batch = BatchBoard(40, 2)
+    for _ in range(0, 5):
+        walk(batch, 10)
+        lengths = batch.correct_lengths()
+        for row in range(0, len(batch)):
+            expected = state(batch, row)
+            assert list(lengths[row]) \
+                == [expected.correct_length(r) for r in range(0, 4)]
+            assert batch.won()[row] == expected.is_won()
+
+
+def test_shuffle():
+    batch = BatchBoard(40, 3)
+    walk(batch, 40)
+    before = batch.flat.copy()
+    fixed = batch.correct_mask().reshape(len(batch), Slots)
+    mask = np.arange(len(batch)) % 2 == 0
+    batch.shuffle(mask)
+    check(batch)
+    for row in range(0, len(batch)):
+        if mask[row]:
+            # The correct sequences stay where they are
+            assert (batch.flat[row][fixed[row]] == before[row][fixed[row]]) \
+                .all()
+            assert (batch.correct_mask()[row].reshape(Slots)
+                    >= fixed[row]).all()
+        else:
+            assert (batch.flat[row] == before[row]).all()
+
+
+def test_won_board():
+    batch = BatchBoard(2, 4)
+    for row in range(0, 2):
+        batch.flat[row] = [r * 13 + col + 1 if col < 12 else Gap
+                           for r in range(0, 4) for col in range(0, 13)]
+    batch.reindex(np.arange(2))
+    assert batch.won().all()
+    won, moves, used = batch.play('greedy', 3, 100)
+    assert won.all()
+    assert (moves == 0).all()
+
+
+def test_play():
+    for policy in ['random', 'greedy']:
+        batch = BatchBoard(100, 5)
+        won, moves, used = batch.play(policy, 3, 1000)
+        assert won.shape == moves.shape == used.shape == (100,)
+        assert (used <= 3).all()
+        assert (moves <= 1000).all()
+        for row in range(0, 100):
+            assert state(batch, row).is_won() == won[row]
+        # Every board that was not won ran out of moves and shuffles
+        for row in np.nonzero(~won)[0]:
+            assert used[row] == 3
+            assert not state(batch, row).movable_slots()
+
+        again = BatchBoard(100, 5).play(policy, 3, 1000)
+        assert all((a == b).all() for a, b in zip(again, (won, moves, used)))
+
+
+def test_greedy_wins_more():
+    by_random = BatchBoard(400, 6).play('random', 3, 1000)[0].sum()
+    by_greedy = BatchBoard(400, 6).play('greedy', 3, 1000)[0].sum()
+    assert by_greedy > by_random
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+import sys
+
+from addiction.board import BoardState, Cards, Empty, Slots
+from addiction.board import card_id, card_face, card_suit, slot_id
+
+
+# Checks that the index, the gaps and the count of gaps in the first column
+# agree with the layout
+#
+# BoardState => None
+def check(state):
+    for slot, card in enumerate(state.layout):
+        if card != Empty:
+            assert state.index[card] == slot
+    assert set(state.gaps) == { slot for slot in range(0, Slots)
+                                if state.layout[slot] == Empty }
+    assert state.first_gaps == sum(1 for slot in state.gaps
+                                   if slot % 13 == 0)
+    assert state.first_column_gaps() == [slot for slot in state.gaps
+                                         if slot % 13 == 0]
+    assert state.open_gaps() == [slot for slot in state.gaps if slot % 13
+                                 and state.layout[slot - 1] != Empty]
+
+
+def test_cards():
+    for card in range(0, Cards):
+        assert card_id(card_suit(card), card_face(card)) == card
+
+
+def test_shuffle():
+    state = BoardState()
+    state.shuffle(random.Random(0))
+    check(state)
+    assert len(state.gaps) == 4
+    assert sorted(card for card in state.layout if card != Empty) \
+        == [card for card in range(0, Cards) if card % 13]
+
+
+def test_shuffle_leaves_small_gaps():
+    state = BoardState()
+    state.shuffle(random.Random(0))
+    assert sys.getsizeof(state.gaps) \
+        == sys.getsizeof(dict.fromkeys(state.gaps))
+
+
+def test_moves():
+    rng = random.Random(1)
+    state = BoardState()
+    state.shuffle(rng)
+    for _ in range(0, 200):
+        movable = state.movable_slots()
+        if not movable:
+            state.shuffle(rng)
+            continue
+        src = rng.choice(movable)
+        dst = state.dest(src)
+        card = state.card(src)
+        assert state.is_empty(dst)
+        state.move(src, dst)
+        assert state.card(dst) == card
+        # The gap that the card left is the newest one
+        assert state.gap_slots()[-1] == src
+        check(state)
+
+
+def test_movable():
+    # Every row is in order but the gap of the first row is after the Six,
+    # so only the Seven can be moved. The other gaps follow Kings
+    layout = bytearray()
+    for row, gap in enumerate([5, 12, 12, 12]):
+        cards = [row * 13 + face for face in range(1, 13)]
+        cards.insert(gap, Empty)
+        layout.extend(cards)
+    state = BoardState()
+    state.load(layout)
+    check(state)
+    assert state.movable_slots() == [slot_id(0, 6)]
+    assert state.first_column_gaps() == []
+    assert state.open_gaps() == [slot_id(0, 5), slot_id(1, 12),
+                                 slot_id(2, 12), slot_id(3, 12)]
+    assert state.dest(slot_id(0, 6)) == slot_id(0, 5)
+    assert state.correct_length(0) == 5
+    assert state.correct_count() == 5 + 3 * 12
+    assert not state.is_won()
+
+    # With a gap in the first column, every Two can be moved
+    state.move(slot_id(1, 0), slot_id(1, 12))
+    assert state.first_column_gaps() == [slot_id(1, 0)]
+    assert state.movable_slots()[:4] == [slot_id(0, 0), slot_id(1, 12),
+                                         slot_id(2, 0), slot_id(3, 0)]
+
+
+def test_copy():
+    state = BoardState()
+    state.shuffle(random.Random(2))
+    other = state.copy()
+    src = state.movable_slots()[0]
+    other.move(src, other.dest(src))
+    assert state.key() != other.key()
+    check(state)
+    check(other)
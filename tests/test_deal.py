@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+from math import factorial
+
+import pytest
+
+from addiction.board import BoardState, Cards, Empty, Slots
+from addiction.deal import Bytes, Length
+from addiction.deal import decode, decode_bytes, encode, encode_bytes
+from addiction.deal import rank, unrank
+
+
+# int => bytearray
+def deal(seed):
+    state = BoardState()
+    state.shuffle(random.Random(seed))
+    return state.layout
+
+
+def test_round_trip():
+    for seed in range(0, 20):
+        layout = deal(seed)
+        assert unrank(rank(layout)) == layout
+        assert len(encode(layout)) == Length
+        assert decode(encode(layout)) == layout
+        assert len(encode_bytes(layout)) == Bytes
+        assert decode_bytes(encode_bytes(layout)) == layout
+
+
+def test_extremes():
+    first = unrank(0)
+    assert rank(first) == 0
+    assert encode(first) == '0' * Length
+    assert first.count(Empty) == 4
+    # The Aces are in the wrong order for this to be the encoding of a
+    # layout, but it is still a layout
+    last = unrank(factorial(Cards) - 1)
+    assert last.count(Empty) == 4
+    assert decode(encode(last)) == last
+    with pytest.raises(RuntimeError):
+        unrank(factorial(Cards))
+
+
+def test_distinct():
+    deals = { encode(deal(seed)) for seed in range(0, 100) }
+    assert len(deals) == 100
+
+
+def test_bad_deals():
+    layout = deal(1)
+    with pytest.raises(RuntimeError):
+        rank(layout[:Slots - 1])
+    duplicate = bytearray(layout)
+    duplicate[duplicate.index(Empty)] = 1 if layout[0] != 1 else 2
+    with pytest.raises(RuntimeError):
+        rank(duplicate)
+    with pytest.raises(RuntimeError):
+        decode('0' * (Length - 1))
+    with pytest.raises(RuntimeError):
+        decode('!' * Length)
+    with pytest.raises(RuntimeError):
+        decode('z' * Length)
+    with pytest.raises(RuntimeError):
+        decode_bytes(b'\0' * (Bytes + 1))
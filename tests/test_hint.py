@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+from threading import Event
+
+from addiction.board import BoardState
+from addiction.hint import HintEngine
+
+
+# int => BoardState
+def deal(seed):
+    state = BoardState()
+    state.shuffle(random.Random(seed))
+    return state
+
+
+def test_rank():
+    for seed in range(0, 10):
+        state = deal(seed)
+        layout = bytes(state.layout)
+        engine = HintEngine(3)
+        ranked = engine.rank(state)
+        assert bytes(state.layout) == layout
+        assert sorted(slot for _, slot in ranked) \
+            == sorted(state.movable_slots())
+        scores = [score for score, _ in ranked]
+        assert scores == sorted(scores, reverse = True)
+        assert all(score[0] >= state.correct_count() for score in scores)
+        assert engine.lookup(state) is ranked
+
+
+def test_depth():
+    # A deeper search can only find better positions
+    state = deal(4)
+    shallow = dict((slot, score) for score, slot in HintEngine(1).rank(state))
+    deep = dict((slot, score) for score, slot in HintEngine(3).rank(state))
+    for slot, score in deep.items():
+        assert score[:1] >= shallow[slot][:1]
+
+
+def test_capacity():
+    engine = HintEngine(1)
+    engine.capacity = 3
+    states = [deal(seed) for seed in range(0, 5)]
+    for state in states:
+        engine.rank(state)
+    assert len(engine.ranked) == 3
+    assert engine.lookup(states[0]) is None
+    assert engine.lookup(states[-1]) is not None
+
+
+def test_start():
+    state = deal(7)
+    engine = HintEngine(2)
+    finished = Event()
+    results = []
+
+    # bytes, list => None
+    def done(key, ranked):
+        results.append((key, ranked))
+        finished.set()
+
+    engine.start(state, done)
+    assert finished.wait(10)
+    assert results == [(state.key(), engine.lookup(state))]
+
+
+def test_cancel():
+    engine = HintEngine(2)
+    cancelled = Event()
+    cancelled.set()
+    results = []
+    engine.work(deal(8), lambda key, ranked: results.append(ranked),
+                cancelled)
+    assert results == []
+    assert engine.lookup(deal(8)) is None
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import sys
+
+from addiction.game import Game
+from addiction.instrument import Profiler
+from addiction.null.ui import GameNull
+from addiction.types import Point
+
+
+def test_counters():
+    game = Game(GameNull, False, 1)
+    profiler = game.instrument()
+    game.do_game_new()
+    game.do_move_card(Point.grid[game.movable[0]])
+    game.do_undo()
+    stats = profiler.get_stats()
+    assert stats['move'][0] == 2
+    assert stats['do_undo'][0] == 1
+    out = io.StringIO()
+    profiler.dump(out)
+    assert 'do_undo' in out.getvalue()
+
+
+def test_cprofile_stays_stopped():
+    profiler = Profiler('cprofile')
+    profiler.stop()
+    out = io.StringIO()
+    profiler.dump(out)
+    assert sys.getprofile() is None
+    assert 'function calls' in out.getvalue()
+
+
+def test_cprofile_keeps_running():
+    profiler = Profiler('cprofile')
+    try:
+        profiler.dump(io.StringIO())
+        assert sys.getprofile() is not None
+    finally:
+        profiler.stop()
+    assert sys.getprofile() is None
+
+
+def test_tracemalloc():
+    profiler = Profiler('tracemalloc')
+    out = io.StringIO()
+    profiler.dump(out)
+    profiler.stop()
+    assert 'Memory:' in out.getvalue()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+
+from addiction.board import BoardState
+from addiction.pool import DealPool, Levels, MinPlayouts, build, classify
+from addiction.pool import find_level, get_level
+
+
+def test_levels():
+    assert get_level(1.0) == find_level('easy')
+    assert get_level(0.05) == find_level('medium')
+    assert get_level(0.0) == find_level('hard')
+    try:
+        find_level('impossible')
+    except RuntimeError:
+        return
+    assert False, 'found an unknown level'
+
+
+def test_build(tmp_path):
+    filename = str(tmp_path / 'deals.pool')
+    counts = build(filename, 6, seed = 3, jobs = 1, playouts = MinPlayouts,
+                   max_nodes = 100, chunk = 4, out = None)
+    assert sum(counts) == 6
+
+    pool = DealPool(filename)
+    try:
+        seeds = iter(range(3, 9))
+        layouts = set()
+        for level, (name, _) in enumerate(Levels):
+            assert pool.count(level) == counts[level]
+            for n in range(0, pool.count(level)):
+                info = pool.get(level, n)
+                assert info.level == name
+                assert 0.0 <= info.win <= 1.0
+                assert info.moves is None or info.solvable
+                layouts.add(bytes(info.layout))
+        for seed in seeds:
+            state = BoardState()
+            state.shuffle(random.Random(seed))
+            assert bytes(state.layout) in layouts
+
+        rng = random.Random(0)
+        for name, _ in Levels:
+            info = pool.draw(name, rng)
+            assert (info is None) == (not pool.count(find_level(name)))
+    finally:
+        pool.close()
+
+
+def test_too_few_playouts(tmp_path):
+    try:
+        build(str(tmp_path / 'deals.pool'), 1, playouts = MinPlayouts - 1,
+              out = None)
+    except RuntimeError:
+        return
+    assert False, 'built a pool with too few playouts'
+
+
+def test_not_a_pool(tmp_path):
+    filename = tmp_path / 'deals.pool'
+    filename.write_bytes(b'not a pool at all')
+    try:
+        DealPool(str(filename))
+    except RuntimeError:
+        return
+    assert False, 'opened a file that is not a pool'
+
+
+def test_classify():
+    level, record = classify(0, 10, 100)
+    assert 0 <= level < len(Levels)
+    assert len(record) == 34
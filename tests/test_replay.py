@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+
+import pytest
+
+from addiction import replay
+from addiction.game import Game
+from addiction.null.ui import GameNull
+from addiction.replay import ReplayWriter, read, play
+from addiction.types import Point
+
+
+# Records a few games with moves, shuffles and undos. The layout at the end
+# of every game is returned with the log
+#
+# int => (bytes, [bytes])
+def record(seed):
+    log = io.BytesIO()
+    game = Game(GameNull, False, seed)
+    game.recorder = ReplayWriter(game, log)
+    layouts = []
+    for n in range(0, 3):
+        game.do_game_new()
+        for i in range(0, 20 + n):
+            if not game.is_started():
+                break
+            if i % 7 == 6:
+                game.do_shuffle()
+            elif i % 5 == 4:
+                game.do_undo()
+            else:
+                game.do_move_card(Point.grid[game.movable[-1]])
+        layouts.append(bytes(game.state.layout))
+    game.do_quit()
+    return log.getvalue(), layouts
+
+
+def test_read():
+    data, layouts = record(1)
+    records = list(read(io.BytesIO(data)))
+    tags = [tag for tag, arg in records]
+    assert tags.count(replay.New) == 3
+    assert tags.count(replay.End) == 3
+    assert replay.Shuffle in tags
+    assert replay.Undo in tags
+    assert tags[0] == replay.New
+    assert records[-1] == (replay.End, replay.Abandoned)
+    # Reading in small chunks splits the records across reads
+    assert list(read(io.BytesIO(data), chunk = 3)) == records
+
+
+def test_play():
+    for seed in range(0, 5):
+        data, layouts = record(seed)
+        game = Game(GameNull, False)
+        played = []
+        for other, result in play(game, read(io.BytesIO(data))):
+            assert other is game
+            played.append(bytes(game.state.layout))
+        assert played == layouts
+
+
+def test_play_ignores_shuffle_limit():
+    # The games are recorded with three shuffles and played on a game that
+    # allows none
+    data, layouts = record(6)
+    assert replay.Shuffle in [tag for tag, _ in read(io.BytesIO(data))]
+    game = Game(GameNull, False, shuffles = 0)
+    played = [bytes(game.state.layout)
+              for _ in play(game, read(io.BytesIO(data)))]
+    assert played == layouts
+
+
+def test_bad_logs():
+    data, _ = record(2)
+    with pytest.raises(RuntimeError):
+        list(read(io.BytesIO(b'XXXXX' + data[5:])))
+    with pytest.raises(RuntimeError):
+        list(read(io.BytesIO(data[:len(replay.Magic) + 10])))
+    with pytest.raises(RuntimeError):
+        list(read(io.BytesIO(replay.Magic + b'\xff')))
+
+    # A move that is not allowed is an error when it is played
+    bad = replay.Magic + data[len(replay.Magic):len(replay.Magic) + 30] \
+        + bytes([0])
+    with pytest.raises(RuntimeError):
+        list(play(Game(GameNull, False), read(io.BytesIO(bad))))
+
+
+def test_open(tmp_path):
+    path = str(tmp_path / 'games.log')
+    game = Game(GameNull, False, 3)
+    for _ in range(0, 2):
+        game.recorder = ReplayWriter.open(game, path)
+        game.do_game_new()
+        game.do_move_card(Point.grid[game.movable[0]])
+        game.do_quit()
+        game.recorder.close()
+    with open(path, 'rb') as f:
+        ends = [arg for tag, arg in read(f) if tag == replay.End]
+    assert ends == [replay.Abandoned, replay.Abandoned]
+
+    other = str(tmp_path / 'other')
+    with open(other, 'wb') as f:
+        f.write(b'not a log')
+    with pytest.raises(RuntimeError):
+        ReplayWriter.open(game, other)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import json
+import os
+
+from addiction.server import GameServer, LocalClient
+from addiction.settings import Settings
+
+
+# Runs a coroutine function with a client of a new server and stops the
+# server afterwards
+#
+# function, * => *
+def run(test, **args):
+    # None => *
+    async def main():
+        server = GameServer(**args)
+        try:
+            return await test(server, LocalClient(server))
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+# dict => int
+def movable(state):
+    return next(slot for slot, (card, flags) in enumerate(state['cells'])
+                if flags & 0x2)
+
+
+def test_play():
+    # GameServer, LocalClient => None
+    async def test(server, client):
+        new = await client.request('new', seed = 1)
+        sid = new['session']
+        slot = movable(new['state'])
+        moved = await client.request('move', session = sid, slot = slot)
+        assert moved['ok']
+        assert moved['diff']['moves'] == 1
+        state = (await client.request('state', session = sid))['state']
+        assert state['moves'] == 1
+        assert state['cells'][slot][0] is None
+        bad = await client.request('move', session = sid, slot = 99)
+        assert 'error' in bad
+        assert 'error' in await client.request('state', session = 'none')
+    run(test)
+
+
+def test_no_eviction_by_default():
+    assert GameServer().evict is None
+
+    # Without eviction the reaper only closes the sessions that time out
+    #
+    # GameServer, LocalClient => None
+    async def test(server, client):
+        evicted = []
+        server.page_out = evicted.append
+        sid = (await client.request('new', seed = 1))['session']
+        server.reaper = asyncio.get_running_loop().create_task(server.reap())
+        await asyncio.sleep(0.2)
+        assert sid not in server.sessions
+        assert evicted == []
+    run(test, timeout = 0.05)
+
+
+def test_evict_and_restore():
+    # GameServer, LocalClient => None
+    async def test(server, client):
+        sid = (await client.request('new', seed = 1))['session']
+        state = (await client.request('state', session = sid))['state']
+        slot = movable(state)
+        await client.request('move', session = sid, slot = slot)
+        before = (await client.request('state', session = sid))['state']
+
+        server.reaper = asyncio.get_running_loop().create_task(server.reap())
+        await asyncio.sleep(0.2)
+        session = server.sessions[sid]
+        assert session.game is None
+        assert os.path.exists(server.get_spool_path(session))
+
+        after = (await client.request('state', session = sid))['state']
+        assert session.game is not None
+        assert not os.path.exists(server.get_spool_path(session))
+        del before['elapsed'], after['elapsed']
+        assert after == before
+        undo = await client.request('undo', session = sid)
+        assert undo['diff']['moves'] == 0
+        return server.spool
+    spool = run(test, evict = 0.05)
+    # The temporary spool is removed when the server stops
+    assert not os.path.exists(spool)
+
+
+def test_seeded_session_continues():
+    # A seeded session has its own generator, which is saved when it is
+    # evicted, so its shuffles are the same as if it had stayed in memory
+    #
+    # GameServer, LocalClient, bool => dict
+    async def play(server, client, evict):
+        sid = (await client.request('new', seed = 7))['session']
+        if evict:
+            server.page_out(server.sessions[sid])
+        await client.request('shuffle', session = sid)
+        state = (await client.request('state', session = sid))['state']
+        del state['elapsed']
+        return state
+    assert run(lambda s, c: play(s, c, False)) \
+        == run(lambda s, c: play(s, c, True))
+
+
+def test_close_evicted():
+    # GameServer, LocalClient => None
+    async def test(server, client):
+        sid = (await client.request('new'))['session']
+        session = server.sessions[sid]
+        server.page_out(session)
+        path = server.get_spool_path(session)
+        assert os.path.exists(path)
+        server.close_session(session)
+        assert not os.path.exists(path)
+        assert sid not in server.sessions
+    run(test)
+
+
+def test_settings(monkeypatch, tmp_path):
+    # The settings of the user that runs the server are ignored
+    path = tmp_path / 'settings.json'
+    path.write_text(json.dumps({ 'shuffles': 0 }))
+    monkeypatch.setattr(Settings, 'filename', str(path))
+    assert Settings(None).shuffles == 0
+
+    # GameServer, LocalClient => None
+    async def test(server, client):
+        sids = [(await client.request('new'))['session'] for _ in range(2)]
+        games = [server.sessions[sid].game for sid in sids]
+        assert games[0].settings is games[1].settings
+        assert games[0].settings.shuffles == 3
+        assert server.create_game().settings.highlight_movable is False
+    run(test, highlight_movable = False)
+
+
+def test_hints():
+    # Several hints are searched at once for different sessions
+    #
+    # GameServer, LocalClient => None
+    async def test(server, client):
+        sids = [(await client.request('new', seed = seed))['session']
+                for seed in range(0, 4)]
+        hints = await asyncio.gather(*[client.request('hint', session = sid)
+                                       for sid in sids])
+        for sid, hint in zip(sids, hints):
+            game = server.sessions[sid].game
+            assert hint['ok']
+            assert hint['diff']['hint'] == game.hints.lookup(game.state)[0][1]
+    run(test)
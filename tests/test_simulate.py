@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+import random
+
+from addiction.board import BoardState, Empty
+from addiction.simulate import SolverPolicy, Stats, play, play_state
+from addiction.simulate import simulate
+
+
+def test_play_is_reproducible():
+    for policy in ['random', 'greedy']:
+        assert play(7, policy, 3, 1000) == play(7, policy, 3, 1000)
+
+
+def test_stats():
+    stats = Stats()
+    stats.add(True, 10, 1)
+    other = Stats()
+    other.add(False, 20, 3)
+    stats.merge(other)
+    assert (stats.games, stats.wins, stats.moves, stats.shuffles) \
+        == (2, 1, 30, 4)
+    assert stats.win_rate == 0.5
+
+
+def test_simulate():
+    stats = simulate(20, 'greedy', 3, jobs = 1, chunk = 8, out = io.StringIO())
+    expected = Stats()
+    for seed in range(0, 20):
+        expected.add(*play(seed, 'greedy', 3, 1000))
+    assert str(stats) == str(expected)
+
+
+# Nearly in order, but the Two of Hearts, the Ten of Diamonds and the Two of
+# Clubs are out of place. Greedy play gets stuck on this board whatever
+# moves it picks, but the solver finds a win in 25 moves
+Stuck = [27, 2, 3, 4, 5, 6, 7, 8, Empty, 9, 10, 11, 12,
+         14, 15, 16, Empty, 17, 18, 19, 20, 21, 1, 23, 24, 25,
+         22, 28, 29, 30, 31, 32, 33, 34, Empty, 35, 36, 37, 38,
+         40, 41, 42, 43, 44, 45, Empty, 46, 47, 48, 49, 50, 51]
+
+
+def test_solver_policy():
+    state = BoardState()
+    state.load(bytearray(Stuck))
+    for seed in range(0, 5):
+        assert not play_state(state.copy(), random.Random(seed), 'greedy',
+                              0, 200)[0]
+    assert play_state(state.copy(), random.Random(0), 'solver', 0, 200) \
+        == (True, 25, 0)
+    assert len(SolverPolicy.cache[state.key()]) == 25
+
+    # The win comes from the solver's moves, which are all used up
+    policy = SolverPolicy(random.Random(0))
+    policy.start(state)
+    while policy.moves:
+        src = policy.choose(state, state.movable_slots())
+        state.move(src, state.dest(src))
+    assert state.is_won()
+
+
+def test_solver_policy_skips_fresh_deals():
+    state = BoardState()
+    state.shuffle(random.Random(0))
+    assert state.correct_count() < SolverPolicy.min_correct
+    policy = SolverPolicy(random.Random(0))
+    policy.start(state)
+    assert policy.moves == []
+    assert state.key() not in SolverPolicy.cache
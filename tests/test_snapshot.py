@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import io
+
+from addiction import snapshot
+from addiction.game import Game
+from addiction.null.ui import GameNull
+from addiction.replay import ReplayWriter, read, play
+from addiction.types import Point
+
+
+# Makes the first few moves of a new game
+#
+# int, int => Game
+def start(seed, moves):
+    game = Game(GameNull, False, seed)
+    game.do_game_new()
+    for _ in range(0, moves):
+        game.do_move_card(Point.grid[game.movable[0]])
+    return game
+
+
+# Game => tuple
+def fields(game):
+    return (bytes(game.state.layout),
+            game.state.gap_slots(),
+            bytes(game.flags),
+            game.correct,
+            game.movable,
+            game.selected,
+            game.shuffles,
+            game.moves,
+            bytes(game.undo.data),
+            len(game.undo),
+            game.started,
+            game.deal)
+
+
+def test_round_trip():
+    game = start(1, 10)
+    game.do_shuffle()
+    game.do_move_card(Point.grid[game.movable[-1]])
+    other = Game(GameNull, False, 2)
+    other.do_game_new()
+    snapshot.restore(other, snapshot.save(game))
+    assert fields(other) == fields(game)
+    assert other.rng.getstate() == game.rng.getstate()
+    assert abs(other.get_elapsed() - game.get_elapsed()) < 1
+
+
+def test_round_trip_without_reporting():
+    game = start(3, 5)
+    other = Game(GameNull, False)
+    snapshot.restore(other, snapshot.save(game, False), False)
+    assert fields(other) == fields(game)
+
+
+def test_play_continues_the_same():
+    game = start(4, 8)
+    other = Game(GameNull, False)
+    snapshot.restore(other, snapshot.save(game))
+    for g in [game, other]:
+        g.do_undo()
+        g.do_undo()
+        g.do_shuffle()
+        g.do_move_card(Point.grid[g.movable[0]])
+    assert fields(other) == fields(game)
+
+
+def test_bad_snapshot():
+    data = snapshot.save(start(5, 3))
+    game = Game(GameNull, False)
+    for bad in [b'', b'XXXX' + data[4:], data[:-1], data + b'\0']:
+        try:
+            snapshot.restore(game, bad)
+        except RuntimeError:
+            continue
+        assert False, 'restored a bad snapshot'
+
+
+# A resumed game that is recorded cannot be undone past the point where it
+# was resumed, so the log can always be replayed
+def test_resume_while_recording():
+    data = snapshot.save(start(6, 6))
+    log = io.BytesIO()
+    game = Game(GameNull, False)
+    game.recorder = ReplayWriter(game, log)
+    snapshot.restore(game, data)
+    assert len(game.undo) == 0
+    game.do_move_card(Point.grid[game.movable[0]])
+    game.do_undo()
+    game.do_undo()
+    layout = bytes(game.state.layout)
+    game.do_quit()
+
+    other = Game(GameNull, False)
+    results = list(play(other, read(io.BytesIO(log.getvalue()))))
+    assert len(results) == 1
+    assert bytes(other.state.layout) == layout
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import random
+from collections import deque
+
+from addiction.board import BoardState, Empty
+from addiction.solver import TranspositionTable, solve
+
+
+# A board with every row in order, apart from the gap, which is in the given
+# column of each row
+#
+# [int] => BoardState
+def board(gaps):
+    layout = bytearray()
+    for row, col in enumerate(gaps):
+        cards = [row * 13 + face for face in range(1, 13)]
+        cards.insert(col, Empty)
+        layout.extend(cards)
+    state = BoardState()
+    state.load(layout)
+    return state
+
+
+# The least number of moves that wins, found by a breadth first search, or
+# None if the board cannot be won
+#
+# BoardState => int
+def shortest(state):
+    dist = { state.key(): 0 }
+    queue = deque([state.copy()])
+    while queue:
+        state = queue.popleft()
+        if state.is_won():
+            return dist[state.key()]
+        for src in state.movable_slots():
+            child = state.copy()
+            child.move(src, child.dest(src))
+            if child.key() not in dist:
+                dist[child.key()] = dist[state.key()] + 1
+                queue.append(child)
+    return None
+
+
+# BoardState, [(int, int)] => bool
+def wins(state, moves):
+    state = state.copy()
+    for src, dst in moves:
+        assert src in state.movable_slots()
+        assert state.dest(src) == dst
+        state.move(src, dst)
+    return state.is_won()
+
+
+def test_won():
+    solution = solve(board([12, 12, 12, 12]))
+    assert solution.solvable
+    assert solution.moves == []
+    assert solution.minimal
+
+
+def test_stuck():
+    # The Kings of the first two rows are swapped, so both gaps follow a
+    # King and nothing can be moved
+    state = board([12, 12, 12, 12])
+    layout = bytearray(state.layout)
+    layout[11], layout[24] = layout[24], layout[11]
+    state.load(layout)
+    solution = solve(state)
+    assert solution.solvable is False
+    assert solution.moves == []
+
+
+def test_one_row():
+    # Seven to King each have to move one slot to the left
+    state = board([5, 12, 12, 12])
+    solution = solve(state)
+    assert solution.solvable
+    assert solution.minimal
+    assert len(solution.moves) == 7
+    assert wins(state, solution.moves)
+
+
+def test_shortest():
+    rng = random.Random(1)
+    for _ in range(0, 10):
+        state = board([rng.randrange(1, 13) for _ in range(0, 4)])
+        for _ in range(0, rng.randrange(0, 12)):
+            movable = state.movable_slots()
+            if not movable:
+                break
+            src = rng.choice(movable)
+            state.move(src, state.dest(src))
+        solution = solve(state)
+        assert solution.solvable
+        assert solution.minimal
+        assert len(solution.moves) == shortest(state)
+        assert wins(state, solution.moves)
+
+
+def test_not_minimal():
+    state = board([1, 2, 3, 4])
+    solution = solve(state, False)
+    assert solution.solvable
+    assert not solution.minimal
+    assert wins(state, solution.moves)
+
+
+def test_gives_up():
+    state = BoardState()
+    state.shuffle(random.Random(0))
+    solution = solve(state, max_nodes = 10)
+    assert solution.solvable is None
+    assert solution.nodes == 11
+
+
+def test_table():
+    table = TranspositionTable(2)
+    table.store(1, 5)
+    table.store(2, 3)
+    table.store(2, 1)
+    assert table.lookup(2) == 3
+    # The oldest entry is deeper than the new one, so it is kept
+    table.store(3, 1)
+    assert table.lookup(1) == 5
+    assert table.lookup(3) is None
+    table.store(4, 9)
+    assert len(table) == 2
+    assert table.lookup(2) is None
+    assert table.lookup(4) == 9
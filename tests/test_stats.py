@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import time
+
+import pytest
+
+from addiction.settings import cache_dir, config_dir, data_dir
+from addiction.stats import StatsStore
+
+
+# int, int, int => int
+def when(year, month, day):
+    return int(time.mktime(datetime.date(year, month, day).timetuple())) \
+        + 12 * 3600
+
+
+def test_dirs(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    monkeypatch.delenv('XDG_CACHE_HOME', raising = False)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    assert data_dir() == str(tmp_path / 'data' / 'addiction-solitaire')
+    assert data_dir('stats.db') == os.path.join(data_dir(), 'stats.db')
+    assert cache_dir() == str(tmp_path / '.cache' / 'addiction-solitaire')
+    assert config_dir('settings.json').startswith(str(tmp_path))
+
+
+def test_totals(tmp_path):
+    stats = StatsStore(str(tmp_path / 'stats.db'), batch = 2)
+    stats.add('a', True, 100, 1, 60.0, when = when(2020, 1, 1))
+    stats.add('a', False, 90, 3, 50.0, when = when(2020, 1, 1))
+    stats.add('b', True, 80, 2, 40.0, when = when(2020, 1, 9))
+    assert stats.get_totals() == (3, 2)
+    assert stats.get_totals(since = datetime.date(2020, 1, 2)) == (1, 1)
+    assert stats.get_totals(until = '2020-01-01') == (2, 1)
+    assert stats.get_deal('a') == (2, 1)
+    assert stats.get_deal('c') == (0, 0)
+    stats.close()
+
+
+def test_win_rates(tmp_path):
+    stats = StatsStore(str(tmp_path / 'stats.db'))
+    stats.add('a', True, 100, 1, 60.0, when = when(2020, 1, 1))
+    stats.add('b', False, 100, 1, 60.0, when = when(2020, 1, 2))
+    stats.add('c', True, 100, 1, 60.0, when = when(2020, 2, 1))
+    assert stats.get_win_rates('month') == [('2020-01', 2, 1),
+                                            ('2020-02', 1, 1)]
+    assert len(stats.get_win_rates('day')) == 3
+    with pytest.raises(RuntimeError):
+        stats.get_win_rates('century')
+    stats.close()
+
+
+def test_best_times(tmp_path):
+    path = str(tmp_path / 'stats.db')
+    stats = StatsStore(path)
+    stats.add('a', True, 100, 1, 60.0, when = when(2020, 1, 1))
+    stats.add('a', True, 90, 0, 30.0, when = when(2020, 1, 5))
+    stats.add('b', True, 80, 2, 45.0, when = when(2020, 1, 5))
+    stats.add('b', False, 10, 3, 5.0, when = when(2020, 1, 5))
+    stats.close()
+
+    # The games were written when the store was closed
+    stats = StatsStore(path)
+    assert [row[2] for row in stats.get_best_times()] == [30.0, 45.0, 60.0]
+    assert [row[2] for row in stats.get_best_times(limit = 1)] == [30.0]
+    assert [row[1] for row in stats.get_best_times(deal = 'b')] == ['b']
+    assert len(stats.get_best_times(since = '2020-01-02')) == 2
+    stats.close()
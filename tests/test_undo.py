@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Addiction Solitaire
+#
+# Copyright (C) 2019, Tarun Prabhu <tarun.prabhu@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from addiction.board import Empty, Slots
+from addiction.game import Game, UndoJournal
+from addiction.null.ui import GameNull
+from addiction.types import Point
+
+
+def test_journal():
+    journal = UndoJournal()
+    journal.push_move(3, 17)
+    before = bytes(range(0, Slots))
+    after = bytearray(before)
+    after[5], after[40] = after[40], after[5]
+    journal.push_shuffle(before, after, Empty)
+    journal.push_move(40, 41)
+    assert len(journal) == 3
+
+    assert journal.pop() == (UndoJournal.Move, 40, 41)
+    assert journal.pop() == (UndoJournal.Shuffle, [(5, 5), (40, 40)], Empty)
+    assert journal.pop() == (UndoJournal.Move, 3, 17)
+    assert len(journal) == 0
+    assert journal.data == bytearray()
+
+
+def test_unchanged_shuffle():
+    journal = UndoJournal()
+    layout = bytes(range(0, Slots))
+    journal.push_shuffle(layout, layout, 7)
+    assert journal.pop() == (UndoJournal.Shuffle, [], 7)
+
+
+def test_clear():
+    journal = UndoJournal()
+    journal.push_move(1, 2)
+    journal.clear()
+    assert len(journal) == 0
+    assert journal.data == bytearray()
+
+
+def test_undo_game():
+    game = Game(GameNull, False, 5)
+    game.do_game_new()
+    layouts = []
+    for i in range(0, 30):
+        if not game.is_started():
+            break
+        layouts.append((bytes(game.state.layout), game.state.gap_slots()))
+        if i % 10 == 9:
+            game.do_shuffle()
+        else:
+            game.do_move_card(Point.grid[game.movable[0]])
+    assert len(game.undo) == len(layouts)
+
+    while layouts:
+        game.do_undo()
+        layout, gaps = layouts.pop()
+        assert bytes(game.state.layout) == layout
+        assert sorted(game.state.gap_slots()) == sorted(gaps)
+    assert game.moves == 0
+    assert game.shuffles == 0
+    assert len(game.undo) == 0